@@ -1,14 +1,49 @@
 # auto_reels_wp_publish.py
 # -*- coding: utf-8 -*-
+from __future__ import annotations  # anotações não carregam o PIL na importação
 
-import os, io, time, json, logging, subprocess, textwrap, html, re
-from typing import Optional
-from urllib.parse import urljoin
+import os, io, sys, time, json, math, logging, subprocess, html, re, threading, argparse, hashlib
+import contextvars, signal, hmac, importlib
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+from datetime import datetime, timedelta
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, BrokenExecutor, CancelledError
+from typing import NamedTuple, Optional
 
-import requests
-from requests.adapters import HTTPAdapter, Retry
 from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+
+class _LazyModule:
+    """
+    Módulo que só é importado no primeiro acesso a um atributo; até lá nada
+    dele (nem o pacote pai) entra em sys.modules. Um ciclo sem post novo (o
+    caso comum do --once) não paga PIL nem asyncio; o requests só entra na
+    1ª requisição. O import em si é o normal (com o lock do importlib).
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(importlib.import_module(self._name), attr, value)
+
+requests = _LazyModule("requests")
+Image = _LazyModule("PIL.Image")
+ImageDraw = _LazyModule("PIL.ImageDraw")
+ImageFont = _LazyModule("PIL.ImageFont")
+ImageFile = _LazyModule("PIL.ImageFile")
+asyncio = _LazyModule("asyncio")
+
+def load_media_libs():
+    """
+    Carrega PIL de uma vez, antes de abrir as pools: os workers de arte
+    (fork) já nascem com ele e nenhum post paga o import no meio do ciclo.
+    """
+    for mod in (Image, ImageDraw, ImageFont, ImageFile):
+        mod.__name__  # qualquer atributo dispara o carregamento
 
 # ----------------------- AJUSTES RÁPIDOS --------------------
 CFG = {
@@ -21,6 +56,12 @@ CFG = {
     # ocupa ~60% da altura e corta em "cover"
     "IMG_TOP": 0,
     "IMG_HEIGHT": 1150,   # deixe entre 1080 e 1200 p/ mais/menos imagem
+    "QUALITY_PROFILE": "balanced",  # fast | balanced | best (filtro do resize da capa)
+    "IMG_MAX_BYTES": 15 * 1024 * 1024,  # imagem destacada maior que isso é recusada
+    "IMG_MAX_PIXELS": 40_000_000,       # idem para largura x altura (evita "bomba")
+    "IMG_CHUNK": 64 * 1024,             # leitura em streaming
+    "COVER_CACHE_DIR": "cover_cache",   # capas já recortadas (dentro de OUT_DIR)
+    "COVER_CACHE_MAX_BYTES": 200 * 1024 * 1024,  # LRU por tamanho total
 
     # LOGO (sobre a faixa divisória preta, sem cobrir o vermelho)
     "LOGO_PATH": "logo_boca.png",
@@ -43,9 +84,27 @@ CFG = {
     "TITLE_FONT": "Anton-Regular.ttf",
     "TITLE_FONT_SIZE": 65,    # TAMANHO da fonte do título
     "TITLE_LETTER_SPACING": 0,
+    "TITLE_AUTO_SHRINK": False,  # True = diminui a fonte até caber na caixa (em vez de "…")
+    "TITLE_MIN_FONT_SIZE": 44,   # menor tamanho aceito no auto-shrink
+
+    "ART_REUSE_CANVAS": True,  # 1 canvas por template/worker, restaura só as regiões sujas
+    "TEMPLATE_CACHE_MAX": 16,  # templates prontos em memória (1 por site/marca x formato)
+
+    # Formatos extras da arte. O "reel" é sempre W x H acima; os outros são
+    # derivados dele (medidas escaladas), a partir da mesma capa baixada.
+    "ART_FORMATS": {
+        "portrait": (1080, 1350),  # feed 4:5
+        "feed": (1080, 1080),      # feed quadrado
+    },
+    # formatos gerados por destino; só a união destes é renderizada
+    "ART_DESTINATIONS": {
+        "fb": ["reel"],
+        "ig": ["reel"],
+    },
 
     # @handle (rodapé)
     "HANDLE_TEXT": "@BOCANOTROMBONELITORAL",
+    "CAPTION_FOOTER": "Mais em: jornalvozdolitoral.com",  # linha depois do título na legenda
     "HANDLE_FONT": "Roboto-Bold.ttf",
     "HANDLE_FONT_SIZE": 42,
     "HANDLE_COLOR": (255, 204, 0),
@@ -55,10 +114,82 @@ CFG = {
     "VIDEO_SECONDS": 10,
     "AUDIO_PATH": "audio_fundo.mp3",
     "FFMPEG_BIN": "ffmpeg",
+    "VIDEO_FAST": True,        # encode p/ imagem parada: tune stillimage + GOP longo + áudio AAC em cache
+    "VIDEO_FPS": 25,           # IG Reels exige 23–60 fps, então não baixamos daqui
+    "VIDEO_PRESET": "veryfast",
+    "VIDEO_INPUT": "raw",      # "raw" = frame RGB da arte direto no stdin do ffmpeg; "jpeg" = lê arte_<id>.jpg
+    "ART_REEL_JPEG": False,    # no modo raw, também salva arte_<id>.jpg (só se algum destino usar a imagem)
+    "AUDIO_CACHE_DIR": "audio_cache",  # AAC pré-codificado (dentro de OUT_DIR)
+    "ENCODE_PARALLEL": 0,      # ffmpeg simultâneos (0 = 1 a cada 4 núcleos)
+    "ENCODE_THREADS": 0,       # threads por ffmpeg (0 = núcleos / ENCODE_PARALLEL)
+
+    # Facebook: upload resumível (start/transfer/finish) em vez de 1 POST gigante
+    "FB_RESUMABLE": True,
+    "FB_CHUNK_RETRIES": 5,        # falhas seguidas no mesmo offset antes de desistir
+    "FB_SESSIONS_FILE": "fb_sessions.json",  # sessões abertas (retomar no próximo ciclo)
+
+    # Instagram: um agendador (asyncio) faz o poll de TODOS os containers
+    "IG_POLL_MIN": 3,         # 1º check após N s; cresce x1.5 a cada IN_PROGRESS
+    "IG_POLL_MAX": 20,        # teto do intervalo entre checks de um container
+    "IG_POLL_MAX_WAIT": 150,  # desiste do container (TIMEOUT) após N s
+    "IG_BATCH_STATUS": True,  # junta os checks num POST /?batch= (até 50 por chamada)
+    "IG_UPLOAD_MODE": "cloudinary",  # cloudinary (video_url público) | resumable (bytes direto no rupload)
+
+    # Graph: ritmo por página FB / conta IG, guiado pelos headers de uso
+    # (X-App-Usage, X-Business-Use-Case-Usage) em vez de bater no limite
+    "GRAPH_RATE_PER_MIN": 60,      # chamadas/min por objeto com uso baixo
+    "GRAPH_BURST": 20,             # rajada permitida por objeto
+    "GRAPH_USAGE_SLOW": 75,        # acima deste % de uso, desacelera proporcionalmente
+    "GRAPH_THROTTLE_COOLDOWN": 60, # s parado após erro de limite sem tempo informado
+    "GRAPH_THROTTLE_RETRIES": 2,   # reenvios após erro de limite (nada foi processado)
+    "GRAPH_MAX_WAIT": 300,         # espera máx. por vez (s); acima, a etapa falha e fica p/ o próximo ciclo
+
+    # Métricas por etapa (JSON + textfile do Prometheus, em OUT_DIR/METRICS_DIR)
+    "METRICS_DIR": "metrics",
+    "METRICS_PROM_FILE": "",   # vazio = OUT_DIR/<site>/METRICS_DIR/auto_reels.prom (ou aponte p/ o textfile dir do node_exporter; sites no mesmo arquivo saem juntos, com site="...")
+    "METRICS_HISTORY": 50,     # p50/p95 calculados sobre as últimas N execuções
 
     # Loop/ciclo
     "WP_POSTS": 5,
-    "SLEEP_BETWEEN": 300,  # 5 min
+    "SLEEP_BETWEEN": 300,  # 5 min (intervalo inicial do --daemon)
+    "POLL_MIN": 60,        # --daemon: intervalo mínimo (rajada de notícias)
+    "POLL_MAX": 1800,      # --daemon: intervalo máximo (site parado)
+    "POLL_TARGET_POSTS": 1,  # --daemon: busca quando se espera ~N posts novos
+    "WEBHOOK_HOST": "127.0.0.1",
+    "WEBHOOK_PORT": 0,     # >0 = escuta POST do WordPress (webhook) e busca na hora
+
+    # Ledger de publicação (estado por post/etapa, em OUT_DIR). Só evita
+    # repostar se OUT_DIR sobreviver entre execuções (no GitHub Actions o
+    # workflow restaura/salva out/ com actions/cache; ver README)
+    "LEDGER_FILE": "ledger.jsonl",
+    "LEDGER_MAX_ATTEMPTS": 3,     # desiste da etapa após N falhas
+    "REPUBLISH_ON_EDIT": False,   # True = post editado (modified novo) publica de novo
+
+    # Retenção de artes/reels em OUT_DIR. Arquivo de post com etapa pendente
+    # (retry) nunca é apagado; os demais saem por idade e por tamanho total.
+    "RETENTION_MAX_AGE_H": 48,             # apaga artefato resolvido mais velho que isso
+    "RETENTION_MAX_BYTES": 2 * 1024 ** 3,  # acima disso, apaga os resolvidos mais antigos
+    "RETENTION_TMP_AGE_H": 1,              # .tmp de escrita interrompida (crash)
+
+    # Busca incremental no WP (modified_after + _fields + ETag/If-Modified-Since)
+    "WP_INCREMENTAL": True,
+    "WP_STATE_FILE": "wp_state.json",
+
+    # Pipeline concorrente: limite de workers por etapa
+    "POOL_DOWNLOAD": 4,   # threads p/ baixar imagens
+    "POOL_RENDER": 0,     # processos p/ arte (0 = nº de núcleos; nunca passa disso)
+    "POOL_PUBLISH": 3,    # threads p/ FB/Cloudinary/IG
+
+    # Pools HTTP: uma Session por upstream, conexões mantidas (keep-alive).
+    # maxsize = conexões guardadas por host (acima disso, abre e descarta;
+    # block=True espera uma livre); connect/read = timeouts separados (s),
+    # "read" só vale quando a chamada não passa o seu. client "httpx" = HTTP/2.
+    "HTTP_POOLS": {
+        "wp":     {"maxsize": 4, "connect": 5, "read": 30},
+        "cdn":    {"maxsize": 8, "connect": 5, "read": 30},
+        "graph":  {"maxsize": 8, "connect": 10, "read": 120},
+        "upload": {"maxsize": 4, "connect": 10, "read": 600},
+    },
 }
 
 # ------------------------ LOGGING ---------------------------
@@ -70,49 +201,1063 @@ logging.basicConfig(
 
 # ------------------------ AMBIENTE --------------------------
 load_dotenv()
-OUT_DIR = "out"
-os.makedirs(OUT_DIR, exist_ok=True)
+OUT_DIR = "out"  # criado no 1º uso (site_dir), não na importação
 
 # WP / Graph / Cloudinary
 WP_URL = os.getenv("WP_URL", "").rstrip("/")
 USER_ACCESS_TOKEN = os.getenv("USER_ACCESS_TOKEN", "")
 FACEBOOK_PAGE_ID = os.getenv("FACEBOOK_PAGE_ID", "")
 INSTAGRAM_ID = os.getenv("INSTAGRAM_ID", "")
+GRAPH_BASE = os.getenv("GRAPH_BASE", "https://graph.facebook.com/v23.0").rstrip("/")
+RUPLOAD_BASE = os.getenv("RUPLOAD_BASE", "https://rupload.facebook.com/ig-api-upload/v23.0").rstrip("/")
 
 CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
 CLOUD_KEY  = os.getenv("CLOUDINARY_API_KEY")
 CLOUD_SEC  = os.getenv("CLOUDINARY_API_SECRET")
 
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# ------------------------- SITES ----------------------------
+# Vários sites/marcas num processo só (--sites sites.toml). Cada site tem a
+# sua camada de CFG (layout, handle, logo, fontes...) e os seus destinos
+# (WP_URL, página do FB, conta do IG, Cloudinary); pools, caches de
+# fontes/logo/capas e o ffmpeg são compartilhados. Sem --sites, nada muda.
+_site_ctx: contextvars.ContextVar = contextvars.ContextVar("site", default=None)
+
+# variáveis de AMBIENTE que um site pode sobrepor
+SITE_ENV_KEYS = ("WP_URL", "USER_ACCESS_TOKEN", "FACEBOOK_PAGE_ID", "INSTAGRAM_ID",
+                 "CLOUD_NAME", "CLOUD_KEY", "CLOUD_SEC")
+
+class Site:
+    """Um site/marca: nome, peso no rodízio, overrides da CFG e do ambiente."""
+
+    def __init__(self, name: str, cfg: Optional[dict] = None, env: Optional[dict] = None,
+                 weight: int = 1):
+        self.name = name
+        self.cfg = dict(cfg or {})
+        self.env = dict(env or {})
+        self.weight = max(1, int(weight))
+
+    def __repr__(self):
+        return f"Site({self.name!r})"
+
+class SiteCFG(dict):
+    """CFG em camadas: o valor do site corrente (se houver) vence o padrão."""
+
+    def __getitem__(self, key):
+        site = _site_ctx.get()
+        if site is not None and key in site.cfg:
+            return site.cfg[key]
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+CFG = SiteCFG(CFG)
+
+def current_site() -> Optional[Site]:
+    return _site_ctx.get()
+
+def site_env(name: str):
+    """Valor de ambiente (WP_URL, tokens, IDs...) do site corrente ou o global."""
+    site = _site_ctx.get()
+    if site is not None and site.env.get(name):
+        return site.env[name]
+    return globals()[name]
+
+def site_dir() -> str:
+    """Estado e arquivos do site (ledger, wp_state, artes, reels): OUT_DIR/<site>."""
+    site = _site_ctx.get()
+    path = OUT_DIR if site is None else os.path.join(OUT_DIR, site.name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def call_in_site(site: Optional[Site], fn, *args):
+    """Roda fn com `site` como site corrente (serve também em outro processo)."""
+    token = _site_ctx.set(site)
+    try:
+        return fn(*args)
+    finally:
+        _site_ctx.reset(token)
+
+def _load_config_file(path: str) -> dict:
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("Config YAML precisa do PyYAML (pip install pyyaml) — ou use TOML")
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    import tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def _cfg_value(key: str, value):
+    if key not in CFG:
+        raise ValueError(f"chave desconhecida na CFG: {key}")
+    if isinstance(dict.__getitem__(CFG, key), tuple) and isinstance(value, list):
+        value = tuple(value)  # cores: TOML/YAML só têm listas
+    return value
+
+def load_sites(path: str) -> list:
+    """
+    Lê a lista de sites (TOML; YAML se o PyYAML estiver instalado):
+
+        [defaults]                 # sobrepõe a CFG para todos
+        VIDEO_SECONDS = 10
+
+        [[sites]]
+        name = "boca"
+        weight = 2                 # peso no rodízio entre sites
+        WP_URL = "https://..."
+        FACEBOOK_PAGE_ID = "123"
+        INSTAGRAM_ID = "456"
+        USER_ACCESS_TOKEN = "${BOCA_TOKEN}"   # ${VAR} vem do ambiente/.env
+        [sites.cfg]
+        HANDLE_TEXT = "@BOCA"
+        LOGO_PATH = "marcas/boca/logo.png"
+    """
+    data = _load_config_file(path)
+    for key, value in (data.get("defaults") or {}).items():
+        CFG[key] = _cfg_value(key, value)
+
+    sites, seen = [], set()
+    for raw in data.get("sites") or []:
+        name = str(raw.get("name") or "").strip()
+        if not name or not re.fullmatch(r"[\w.-]+", name) or name in seen:
+            raise ValueError(f"site sem nome válido/único: {name!r}")
+        seen.add(name)
+        env = {k: os.path.expandvars(str(raw[k])) for k in SITE_ENV_KEYS if raw.get(k)}
+        if env.get("WP_URL"):
+            env["WP_URL"] = env["WP_URL"].rstrip("/")
+        cfg = {k: _cfg_value(k, v) for k, v in (raw.get("cfg") or {}).items()}
+        sites.append(Site(name, cfg, env, raw.get("weight", 1)))
+    if not sites:
+        raise ValueError(f"nenhum site em {path}")
+    return sites
+
+def fair_order(batches: list) -> list:
+    """
+    Intercala [(site, [itens])] em rodízio ponderado: a cada volta cada site
+    entra com `weight` itens. Um site com muitos posts novos não passa na
+    frente dos outros nas filas (FIFO) das etapas.
+    """
+    queues = [(site, list(items)) for site, items in batches]
+    out = []
+    while any(items for _, items in queues):
+        for site, items in queues:
+            n = site.weight if site is not None else 1
+            out.extend((site, it) for it in items[:n])
+            del items[:n]
+    return out
+
 # ---------------------- HTTP SESSION ------------------------
-def build_http_session() -> requests.Session:
-    s = requests.Session()
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+HTTP_POOL_DEFAULTS = {"maxsize": 10, "block": False, "connect": 10, "read": 60, "client": "requests"}
+
+def _timeouts(timeout, pool: dict) -> tuple:
+    """timeout da chamada -> (conexão, leitura); número solto = só a leitura."""
+    if timeout is None:
+        return pool["connect"], pool["read"]
+    if isinstance(timeout, tuple):
+        return timeout
+    return pool["connect"], timeout
+
+def _urllib3_adapter(pool: dict):
+    """
+    Cliente padrão (requests/urllib3, HTTP/1.1 com keep-alive). Retry só
+    onde repetir é seguro:
+      - GET/HEAD: 5xx, 429 (respeita Retry-After) e erro de leitura, com backoff
+      - POST: só erro de conexão (a requisição nem saiu). 5xx ou conexão que
+        cai depois do envio voltam para o chamador: repetir às cegas um POST
+        em /videos ou /media pode publicar duas vezes (ver graph_call).
+    """
+    from requests.adapters import HTTPAdapter, Retry
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TunedAdapter(HTTPAdapter):
+        connections_opened = 0  # connect() de verdade (socket novo), não objetos de conexão
+
+        def init_poolmanager(self, *args, **kw):
+            super().init_poolmanager(*args, **kw)
+            adapter, lock = self, threading.Lock()
+
+            def counting(pool_cls):
+                class Conn(pool_cls.ConnectionCls):
+                    def connect(self):
+                        with lock:
+                            adapter.connections_opened += 1
+                        return super().connect()
+                return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": Conn})
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": counting(HTTPConnectionPool), "https": counting(HTTPSConnectionPool)}
+
+        def send(self, request, timeout=None, **kw):
+            return super().send(request, timeout=_timeouts(timeout, pool), **kw)
+
     retries = Retry(
         total=3,
         backoff_factor=0.8,
         status_forcelist=(429, 500, 502, 503, 504),
-        allowed_methods=frozenset(["GET", "POST"])
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
     )
-    adapter = HTTPAdapter(max_retries=retries)
+    return TunedAdapter(pool_maxsize=pool["maxsize"], pool_block=pool["block"], max_retries=retries)
+
+class _HttpxRaw:
+    """Corpo de uma resposta httpx com a cara do urllib3 (o que o requests lê)."""
+
+    def __init__(self, resp):
+        self._resp = resp
+
+    def stream(self, chunk_size: int = 65536, decode_content: bool = True):
+        yield from self._resp.iter_bytes(chunk_size)
+        self._resp.close()
+
+    def read(self, amt=None, decode_content: bool = True) -> bytes:
+        return self._resp.read()
+
+    def close(self):
+        self._resp.close()
+
+def _httpx_adapter(pool: dict):
+    """
+    HTTP/2 pelo httpx (pip install "httpx[http2]"), plugado como transport
+    adapter do requests: quem chama continua com a API do requests. Sem
+    Retry do urllib3 aqui; graph_call e os loops de upload cuidam do resto.
+    """
+    import httpx
+    from requests import exceptions as rexc
+    from requests.adapters import BaseAdapter
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    class HTTP2Adapter(BaseAdapter):
+        def __init__(self):
+            super().__init__()
+            self.client = httpx.Client(http2=True, timeout=httpx.Timeout(pool["read"], connect=pool["connect"]),
+                                       limits=httpx.Limits(max_connections=pool["maxsize"],
+                                                           max_keepalive_connections=pool["maxsize"]))
+            self.h2_responses = 0
+
+        def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+            connect, read = _timeouts(timeout, pool)
+            body = request.body
+            if hasattr(body, "read"):
+                body = iter(partial(request.body.read, 1 << 16), b"")  # arquivo: em pedaços
+            req = self.client.build_request(request.method, request.url, headers=dict(request.headers),
+                                            content=body, timeout=httpx.Timeout(read, connect=connect))
+            try:
+                r = self.client.send(req, stream=True)
+            except httpx.TimeoutException as e:
+                raise rexc.Timeout(e, request=request)
+            except httpx.TransportError as e:
+                raise rexc.ConnectionError(e, request=request)
+            if r.http_version == "HTTP/2":
+                self.h2_responses += 1
+            resp = Response()
+            resp.status_code = r.status_code
+            resp.headers = CaseInsensitiveDict(r.headers)
+            resp.encoding = get_encoding_from_headers(resp.headers)
+            resp.reason = r.reason_phrase
+            resp.url = str(r.url)
+            resp.request = request
+            resp.connection = self
+            resp.raw = _HttpxRaw(r)
+            if not stream:
+                resp.content  # lê tudo e devolve a conexão ao pool
+            return resp
+
+        def close(self):
+            self.client.close()
+
+    return HTTP2Adapter()
+
+# clientes plugáveis: CFG["HTTP_POOLS"][upstream]["client"] escolhe a fábrica
+HTTP_CLIENTS = {"requests": _urllib3_adapter, "httpx": _httpx_adapter}
+
+def build_http_session(upstream: str = "cdn") -> requests.Session:
+    """Session de UM upstream, com o pool/timeouts/cliente de CFG["HTTP_POOLS"]."""
+    pool = {**HTTP_POOL_DEFAULTS, **CFG["HTTP_POOLS"].get(upstream, {})}
+    adapter = None
+    if pool["client"] != "requests":
+        try:
+            adapter = HTTP_CLIENTS[pool["client"]](pool)
+        except (ImportError, KeyError) as e:
+            logging.warning("⚠️  Cliente HTTP %r indisponível p/ %s (%s) — usando requests",
+                            pool["client"], upstream, e)
+    s = requests.Session()
+    adapter = adapter or _urllib3_adapter(pool)
     s.mount("http://", adapter)
     s.mount("https://", adapter)
     return s
 
-http = build_http_session()
+def _connections_opened(session) -> Optional[int]:
+    """Conexões TCP abertas pela Session (None = cliente sem essa conta)."""
+    adapters = {id(a): a for a in session.adapters.values()}.values()
+    counts = [a.connections_opened for a in adapters if hasattr(a, "connections_opened")]
+    return sum(counts) if counts else None
+
+class SessionRegistry:
+    """
+    Uma Session por upstream (wp, cdn, graph, upload), criada no 1º uso,
+    cada uma com o pool de CFG["HTTP_POOLS"]: a API do WP, o CDN das
+    imagens e a Graph não disputam (nem descartam) as conexões umas das
+    outras. Mesma interface da Session (request/get/post); o upstream sai
+    da URL. stats() mostra quanto o keep-alive está reaproveitando.
+    """
+
+    def __init__(self):
+        self._sessions: dict = {}
+        self._requests: dict = {}   # upstream -> requisições feitas
+        self._lock = threading.Lock()
+
+    def upstream(self, url: str) -> str:
+        if url.startswith(GRAPH_BASE):
+            return "graph"
+        if url.startswith(RUPLOAD_BASE):
+            return "upload"
+        if "/wp-json/" in url:
+            return "wp"
+        return "cdn"
+
+    def session(self, name: str) -> requests.Session:
+        with self._lock:
+            s = self._sessions.get(name)
+            if s is None:
+                s = self._sessions[name] = build_http_session(name)
+            return s
+
+    def request(self, method: str, url: str, **kw):
+        name = self.upstream(url)
+        s = self.session(name)
+        with self._lock:
+            self._requests[name] = self._requests.get(name, 0) + 1
+        return s.request(method, url, **kw)
+
+    def get(self, url: str, **kw):
+        return self.request("GET", url, **kw)
+
+    def post(self, url: str, **kw):
+        return self.request("POST", url, **kw)
+
+    def stats(self, since: Optional[dict] = None) -> dict:
+        """
+        Por upstream: requisições, conexões novas e reuso (1 - conexões /
+        requisições). `since` = um stats() anterior: devolve só a diferença.
+        """
+        with self._lock:
+            sessions, reqs = dict(self._sessions), dict(self._requests)
+        out = {}
+        for name, n in reqs.items():
+            conns = _connections_opened(sessions[name])
+            prev = (since or {}).get(name, {})
+            n -= prev.get("requests", 0)
+            if conns is not None:
+                conns -= prev.get("connections") or 0
+            out[name] = {"requests": n, "connections": conns,
+                         "reuse": round(max(0.0, 1 - conns / n), 3) if conns is not None and n else None}
+        return out
+
+    def close(self):
+        with self._lock:
+            for s in self._sessions.values():
+                s.close()
+            self._sessions.clear()
+
+http = SessionRegistry()
+
+# ---------------------- GRAPH: LIMITES DE USO ---------------
+# erros da Graph que significam "limite atingido, nada foi processado"
+GRAPH_THROTTLE_CODES = frozenset({4, 17, 32, 613, 80001, 80002})
+GRAPH_USAGE_KEYS = ("call_count", "total_time", "total_cputime")
+
+class GraphThrottled(RuntimeError):
+    """Limite de uso da Graph: a espera passaria de GRAPH_MAX_WAIT ou os retries acabaram."""
+
+def _usage_pct(entry: dict) -> int:
+    return max(int(entry.get(k) or 0) for k in GRAPH_USAGE_KEYS)
+
+def parse_graph_usage(headers, obj: Optional[str] = None) -> dict:
+    """
+    Headers de uso da Graph -> {objeto: (maior %, minutos até liberar)}.
+    "app" = X-App-Usage; X-Page-Usage conta para `obj`; o
+    X-Business-Use-Case-Usage já vem por objeto (página / conta IG).
+    """
+    out = {}
+    for name, key in (("X-App-Usage", "app"), ("X-Page-Usage", obj)):
+        raw = headers.get(name)
+        if key and raw:
+            try:
+                out[key] = (_usage_pct(json.loads(raw)), 0.0)
+            except (ValueError, TypeError, AttributeError):
+                pass
+    raw = headers.get("X-Business-Use-Case-Usage")
+    try:
+        buc = json.loads(raw) if raw else {}
+    except ValueError:
+        buc = {}
+    for oid, entries in (buc.items() if isinstance(buc, dict) else ()):
+        for e in entries or ():
+            pct, regain = out.get(str(oid), (0, 0.0))
+            out[str(oid)] = (max(pct, _usage_pct(e)),
+                             max(regain, float(e.get("estimated_time_to_regain_access") or 0)))
+    return out
+
+class TokenBucket:
+    """
+    Balde de fichas de UM objeto da Graph: `rate` chamadas/s, rajada de até
+    `burst`. As fichas podem ficar negativas: cada chamada reserva a sua vez
+    e quem chega depois espera mais (ordem de chegada, sem busy-wait).
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.factor = 1.0           # < 1 quando o uso reportado pela Graph sobe
+        self.blocked_until = 0.0    # throttle: ninguém passa antes disso
+
+    def reserve(self, now: float, factor: float = 1.0) -> float:
+        """Reserva 1 ficha; retorna quantos segundos esperar por ela."""
+        rate = self.rate * self.factor * factor
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+        self.tokens -= 1
+        wait = -self.tokens / rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = min(self.tokens, 0.0)  # ao liberar, volta devagar (sem rajada)
+
+class GraphRateLimiter:
+    """
+    Ritmo das chamadas à Graph por página FB / conta IG, guiado pelos
+    headers de uso que a própria Graph devolve. Acima de GRAPH_USAGE_SLOW %
+    o balde do objeto desacelera na proporção do que falta até 100 %; em
+    100 % (ou num erro de limite) o objeto fica parado até a Graph liberar.
+    X-App-Usage vale para todos os objetos.
+    """
+
+    def __init__(self):
+        self._buckets: dict = {}
+        self._lock = threading.Lock()
+        self._app = TokenBucket(float("inf"), 1)  # só factor/blocked_until
+        self.stats: dict = {}   # objeto -> {"usage", "throttled", "waited"}
+
+    def _bucket(self, obj: str) -> TokenBucket:
+        b = self._buckets.get(obj)
+        if b is None:
+            b = self._buckets[obj] = TokenBucket(CFG["GRAPH_RATE_PER_MIN"] / 60.0, CFG["GRAPH_BURST"])
+            self.stats.setdefault(obj, {"usage": 0, "throttled": 0, "waited": 0.0})
+        else:
+            # a CFG pode mudar (site, reload): o balde segue o valor atual
+            b.rate, b.burst = CFG["GRAPH_RATE_PER_MIN"] / 60.0, CFG["GRAPH_BURST"]
+        return b
+
+    def acquire(self, obj: str) -> bool:
+        """Bloqueia até a vez do objeto; False se a espera passaria de GRAPH_MAX_WAIT."""
+        with self._lock:
+            b = self._bucket(obj)
+            now = time.monotonic()
+            wait = max(b.reserve(now, self._app.factor), self._app.blocked_until - now)
+            if wait > CFG["GRAPH_MAX_WAIT"]:
+                b.tokens += 1  # devolve a reserva
+                return False
+            self.stats[obj]["waited"] = round(self.stats[obj]["waited"] + wait, 3)
+            usage = self.stats[obj]["usage"]
+        if wait > 1:
+            logging.info("🚦 Graph %s: aguardando %.1fs (uso %d%%)", obj, wait, usage)
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def _slowdown(self, b: TokenBucket, pct: int, regain_min: float, now: float):
+        slow = CFG["GRAPH_USAGE_SLOW"]
+        b.factor = 1.0 if pct < slow else max(0.05, (100 - pct) / max(1, 100 - slow))
+        if pct >= 100 or regain_min > 0:
+            b.block(now + (regain_min * 60 or CFG["GRAPH_THROTTLE_COOLDOWN"]))
+
+    def observe(self, obj: Optional[str], resp) -> bool:
+        """Aplica os headers de uso da resposta; True = a Graph recusou por limite."""
+        now = time.monotonic()
+        usage = parse_graph_usage(resp.headers, obj)
+        throttled = resp.status_code == 429
+        if not throttled and resp.status_code >= 400:
+            try:
+                throttled = (resp.json().get("error") or {}).get("code") in GRAPH_THROTTLE_CODES
+            except (ValueError, AttributeError):
+                pass
+        with self._lock:
+            for key, (pct, regain) in usage.items():
+                b = self._app if key == "app" else self._bucket(key)
+                self._slowdown(b, pct, regain, now)
+                if key != "app":
+                    self.stats[key]["usage"] = pct
+            if throttled and obj:
+                try:
+                    retry_after = float(resp.headers.get("Retry-After") or 0)
+                except ValueError:
+                    retry_after = 0.0
+                regain = max((r for k, (_, r) in usage.items() if k in (obj, "app")), default=0.0)
+                self._bucket(obj).block(now + (regain * 60 or retry_after
+                                               or CFG["GRAPH_THROTTLE_COOLDOWN"]))
+                self.stats[obj]["throttled"] += 1
+        if throttled:
+            logging.warning("🚦 Graph %s: limite de uso atingido (HTTP %s) — segurando o objeto",
+                            obj, resp.status_code)
+        return throttled
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {obj: dict(st) for obj, st in self.stats.items()}
+
+graph_limiter = GraphRateLimiter()
+
+def _rewind_marks(kw: dict) -> list:
+    """(arquivo, posição) dos corpos em stream, p/ reenviar do mesmo ponto."""
+    bodies = [kw.get("data")] + list((kw.get("files") or {}).values())
+    marks = []
+    for body in bodies:
+        body = body[1] if isinstance(body, tuple) else body
+        if hasattr(body, "seek") and hasattr(body, "tell"):
+            marks.append((body, body.tell()))
+    return marks
+
+def graph_call(method: str, obj: Optional[str], url: str, **kw):
+    """
+    Chamada à Graph passando pelo balde de `obj` (página FB ou conta IG).
+    GET tem os retries da Session. POST só é reenviado aqui quando a Graph
+    recusou por limite de uso (nada foi processado), depois de esperar a
+    liberação; falha ambígua (5xx, conexão caiu) volta para o chamador, que
+    confere pelo post antes de repetir. Retorna a Response (sem raise); se a
+    Graph ainda recusar por limite depois dos retries, levanta GraphThrottled
+    (não é erro da chamada: o chamador só tenta de novo mais tarde).
+    """
+    marks = _rewind_marks(kw)
+    for attempt in range(CFG["GRAPH_THROTTLE_RETRIES"] + 1):
+        if obj and not graph_limiter.acquire(obj):
+            raise GraphThrottled(f"Graph {obj}: limite de uso, espera passaria de {CFG['GRAPH_MAX_WAIT']}s")
+        if attempt:
+            stage_add(retries=1)
+            for f, pos in marks:
+                f.seek(pos)
+        r = http.request(method, url, **kw)
+        if not graph_limiter.observe(obj, r):
+            return r
+    raise GraphThrottled(f"Graph {obj}: limite de uso após {CFG['GRAPH_THROTTLE_RETRIES']} retries "
+                         f"(HTTP {r.status_code})")
+
+# ---------------------- MÉTRICAS ----------------------------
+METRIC_STAGES = ("wp_fetch", "download", "art", "video", "fb", "cloudinary", "ig")
+
+# registro da etapa em andamento (para bytes/retries reportados lá de dentro)
+_stage_ctx = contextvars.ContextVar("stage_rec", default=None)
+
+def stage_add(bytes: int = 0, retries: int = 0, rec: Optional[dict] = None):
+    """Soma bytes/retries na etapa corrente (ou em `rec`). Fora de etapa, ignora."""
+    rec = rec if rec is not None else _stage_ctx.get()
+    if rec is not None:
+        rec["bytes"] += int(bytes)
+        rec["retries"] += int(retries)
+
+def _percentile(values: list, q: float) -> float:
+    """Nearest rank: o menor valor com pelo menos q dos valores <= ele."""
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    rank = math.ceil(round(q * len(vals), 9))  # round: 0.7 * 10 = 7.000000000000001
+    return vals[min(len(vals) - 1, max(0, rank - 1))]
+
+class RunMetrics:
+    """
+    Medições de UM ciclo: por post e etapa guarda tempo de parede, bytes,
+    retries e resultado. No fim grava o resumo JSON, acrescenta a execução
+    ao histórico e reescreve o textfile do Prometheus com p50/p95.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.records = []
+        self._lock = threading.Lock()
+        self._http0 = http.stats()  # o ciclo reporta só o próprio tráfego HTTP
+
+    @contextmanager
+    def stage(self, post_id, stage: str):
+        rec = {"post": post_id, "stage": stage, "seconds": 0.0,
+               "bytes": 0, "retries": 0, "ok": None}
+        token = _stage_ctx.set(rec)
+        t0 = time.perf_counter()
+        cancelled = False
+        try:
+            yield rec
+        except CancelledError:
+            cancelled = True  # encerrando: a etapa nem começou, não é falha
+            raise
+        except Exception:
+            rec["ok"] = False
+            raise
+        finally:
+            rec["seconds"] = round(time.perf_counter() - t0, 4)
+            if rec["ok"] is None:
+                rec["ok"] = True
+            _stage_ctx.reset(token)
+            if not cancelled:
+                with self._lock:
+                    self.records.append(rec)
+
+    def call(self, post_id, stage: str, fn, *args):
+        """Roda fn(*args) medido como `stage`; resultado falso (ou {"ok": False}) = falha."""
+        with self.stage(post_id, stage) as rec:
+            res = fn(*args)
+            rec["ok"] = bool(res["ok"]) if isinstance(res, dict) and "ok" in res else bool(res)
+            return res
+
+    def summary(self, history: list) -> dict:
+        stages = {}
+        for rec in self.records:
+            st = stages.setdefault(rec["stage"], {"count": 0, "ok": 0, "failed": 0, "seconds": 0.0,
+                                                  "bytes": 0, "retries": 0})
+            st["count"] += 1
+            st["ok" if rec["ok"] else "failed"] += 1
+            st["seconds"] = round(st["seconds"] + rec["seconds"], 4)
+            st["bytes"] += rec["bytes"]
+            st["retries"] += rec["retries"]
+        for name in METRIC_STAGES:
+            durations = [d for run in history for d in run.get("stages", {}).get(name, [])]
+            if name in stages or durations:
+                st = stages.setdefault(name, {"count": 0, "ok": 0, "failed": 0, "seconds": 0.0,
+                                              "bytes": 0, "retries": 0})
+                st["p50"] = round(_percentile(durations, 0.50), 4)
+                st["p95"] = round(_percentile(durations, 0.95), 4)
+        return {
+            "started": int(self.started),
+            "seconds": round(time.time() - self.started, 3),
+            "posts": len({r["post"] for r in self.records if r["post"] is not None}),
+            "stages": stages,
+            "graph": graph_limiter.snapshot(),
+            "http": http.stats(self._http0),
+            "records": self.records,
+        }
+
+    def finish(self) -> dict:
+        mdir = os.path.join(site_dir(), CFG["METRICS_DIR"])
+        os.makedirs(mdir, exist_ok=True)
+
+        # histórico: só as durações por etapa de cada execução
+        hist_path = os.path.join(mdir, "history.jsonl")
+        durations = {}
+        for rec in self.records:
+            durations.setdefault(rec["stage"], []).append(rec["seconds"])
+        history = []
+        try:
+            with open(hist_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        history.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        history.append({"ts": int(self.started), "stages": durations})
+        history = history[-CFG["METRICS_HISTORY"]:]
+        _write_atomic(hist_path, "".join(json.dumps(h) + "\n" for h in history))
+
+        summary = self.summary(history)
+        _write_atomic(os.path.join(mdir, "run_summary.json"),
+                      json.dumps(summary, ensure_ascii=False, indent=2))
+        return summary  # o textfile do Prometheus sai no fim do ciclo (write_prometheus)
+
+def _write_atomic(path: str, text: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _prom_labels(site: Optional[Site], **labels) -> str:
+    if site is not None:
+        labels = {"site": site.name, **labels}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+
+def _prom_path() -> str:
+    """Textfile do site corrente: METRICS_PROM_FILE ou OUT_DIR/<site>/METRICS_DIR/auto_reels.prom."""
+    return CFG["METRICS_PROM_FILE"] or os.path.join(site_dir(), CFG["METRICS_DIR"], "auto_reels.prom")
+
+def render_prometheus(summaries: dict, with_http: bool = True) -> str:
+    """
+    Formato textfile-collector (node_exporter). `summaries`: site (None =
+    site único) -> resumo do ciclo. Com --sites, toda série leva site="..."
+    (HELP/TYPE uma vez só), então vários sites podem dividir o arquivo.
+    Graph e HTTP são do processo: Graph sai rotulado pelo site dono da
+    página/conta; HTTP só quando `with_http` (um arquivo por ciclo).
+    """
+    lines = []
+    runs = (
+        ("last_run_seconds", "seconds", "Wall time of the last cycle."),
+        ("last_run_timestamp_seconds", "started", "Start time of the last cycle."),
+        ("last_run_posts", "posts", "Posts that went through at least one stage."),
+    )
+    for name, key, help_ in runs:
+        lines += [f"# HELP auto_reels_{name} {help_}", f"# TYPE auto_reels_{name} gauge"]
+        for site, summary in summaries.items():
+            lines.append(f"auto_reels_{name}{_prom_labels(site)} {summary[key]}")
+    gauges = (
+        ("stage_runs", None, "Stage executions in the last cycle, by outcome."),
+        ("stage_seconds", "seconds", "Total stage wall time in the last cycle."),
+        ("stage_bytes", "bytes", "Bytes transferred by the stage in the last cycle."),
+        ("stage_retries", "retries", "Retries inside the stage in the last cycle."),
+        ("stage_duration_p50_seconds", "p50", "Median stage duration over recent cycles."),
+        ("stage_duration_p95_seconds", "p95", "95th percentile stage duration over recent cycles."),
+    )
+    for name, key, help_ in gauges:
+        lines += [f"# HELP auto_reels_{name} {help_}", f"# TYPE auto_reels_{name} gauge"]
+        for site, summary in summaries.items():
+            for stage, st in summary["stages"].items():
+                if key is None:
+                    for outcome in ("ok", "failed"):
+                        lines.append(f"auto_reels_{name}{_prom_labels(site, stage=stage, outcome=outcome)}"
+                                     f" {st[outcome]}")
+                else:
+                    lines.append(f"auto_reels_{name}{_prom_labels(site, stage=stage)} {st.get(key, 0.0)}")
+
+    # página FB / conta IG -> site dono (o limitador é um só para o processo)
+    owners, usage = {}, {}
+    for site, summary in summaries.items():
+        usage = summary.get("graph") or usage
+        for key in ("FACEBOOK_PAGE_ID", "INSTAGRAM_ID"):
+            obj = call_in_site(site, site_env, key)
+            if obj:
+                owners[str(obj)] = site
+    graph = (
+        ("graph_usage_percent", "usage", "Last Graph API usage reported for the page/IG account."),
+        ("graph_throttled", "throttled", "Graph rate-limit rejections since the process started."),
+        ("graph_wait_seconds", "waited", "Time spent pacing Graph calls since the process started."),
+    )
+    for name, key, help_ in graph:
+        lines += [f"# HELP auto_reels_{name} {help_}", f"# TYPE auto_reels_{name} gauge"]
+        for obj, st in usage.items():
+            if obj in owners:
+                lines.append(f"auto_reels_{name}{_prom_labels(owners[obj], object=obj)} {st[key]}")
+            elif list(summaries) == [None]:
+                lines.append(f"auto_reels_{name}{_prom_labels(None, object=obj)} {st[key]}")
+
+    pools = (
+        ("http_requests", "requests", "HTTP requests in the last cycle, by upstream (whole process)."),
+        ("http_connections_opened", "connections", "New TCP connections in the last cycle, by upstream (whole process)."),
+    )
+    stats = next(iter(summaries.values())).get("http", {}) if with_http and summaries else {}
+    for name, key, help_ in pools if stats else ():
+        lines += [f"# HELP auto_reels_{name} {help_}", f"# TYPE auto_reels_{name} gauge"]
+        for upstream, st in stats.items():
+            if st[key] is not None:
+                lines.append(f'auto_reels_{name}{{upstream="{upstream}"}} {st[key]}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(summaries: dict):
+    """
+    Grava os textfiles do ciclo: sites que apontam para o mesmo arquivo
+    (ex.: METRICS_PROM_FILE no [defaults]) saem juntos num arquivo só, em
+    vez de um sobrescrever o outro. HTTP vai só no arquivo do 1º site.
+    """
+    files = {}
+    for site, summary in summaries.items():
+        files.setdefault(call_in_site(site, _prom_path), {})[site] = summary
+    for i, (path, group) in enumerate(files.items()):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        _write_atomic(path, render_prometheus(group, with_http=i == 0))
+
+# ---------------------- LEDGER DE PUBLICAÇÃO ----------------
+LEDGER_STAGES = ("art", "video", "fb", "cloudinary", "ig")
+PUBLISH_STAGES = ("fb", "ig")
+
+class PublishLedger:
+    """
+    Estado durável por post, em JSON-lines (append-only) dentro de OUT_DIR.
+    Chave = (id do post WP, modified). Cada linha registra o resultado de
+    UMA etapa (download, art, video, fb, cloudinary, ig); no load a última vence.
+    OUT_DIR precisa persistir entre execuções: ledger vazio = tudo é novo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._state: dict = {}      # (pid, modified) -> {stage: {"ok", "value", "attempts"}}
+        self._published: dict = {}  # pid -> {stage} (publicado em QUALQUER versão)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # linha truncada por crash — ignora
+                self._apply(rec)
+
+    def _apply(self, rec: dict):
+        key = (str(rec.get("post")), str(rec.get("modified") or ""))
+        st = self._state.setdefault(key, {}).setdefault(
+            rec.get("stage"), {"ok": False, "value": None, "attempts": 0})
+        st["attempts"] += 1
+        st["ok"] = bool(rec.get("ok"))
+        st["value"] = rec.get("value")
+        if st["ok"] and rec.get("stage") in PUBLISH_STAGES:
+            self._published.setdefault(key[0], set()).add(rec.get("stage"))
+
+    def _stage(self, pid, modified, stage) -> dict:
+        return self._state.get((str(pid), str(modified or "")), {}).get(stage) or {}
+
+    def done(self, pid, modified, stage: str) -> bool:
+        if stage in PUBLISH_STAGES and not CFG["REPUBLISH_ON_EDIT"]:
+            if stage in self._published.get(str(pid), ()):
+                return True
+        return bool(self._stage(pid, modified, stage).get("ok"))
+
+    def value(self, pid, modified, stage: str):
+        st = self._stage(pid, modified, stage)
+        return st.get("value") if st.get("ok") else None
+
+    def gave_up(self, pid, modified, stage: str) -> bool:
+        st = self._stage(pid, modified, stage)
+        return not st.get("ok") and st.get("attempts", 0) >= CFG["LEDGER_MAX_ATTEMPTS"]
+
+    def all_done(self, pid, modified) -> bool:
+        if any(self.gave_up(pid, modified, s) for s in ("download", "art", "video")):
+            return True
+        # IG via Cloudinary: sem URL pública o IG nem é tentado
+        return all(self.done(pid, modified, s) or self.gave_up(pid, modified, s)
+                   or (s == "ig" and self.gave_up(pid, modified, "cloudinary"))
+                   for s in PUBLISH_STAGES)
+
+    def pending_files(self) -> set:
+        """Arquivos (arte/reel) de posts que ainda têm etapa pendente."""
+        keep = set()
+        with self._lock:
+            for (pid, modified), stages in self._state.items():
+                if self.all_done(pid, modified):
+                    continue
+                for stage, st in stages.items():
+                    if (stage == "video" or stage.startswith("art")) and st.get("ok") and st.get("value"):
+                        keep.add(os.path.abspath(st["value"]))
+        return keep
+
+    def record(self, pid, modified, stage: str, ok: bool, value=None):
+        rec = {
+            "ts": int(time.time()),
+            "post": pid,
+            "modified": modified or "",
+            "stage": stage,
+            "ok": bool(ok),
+            "value": value,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(rec)
+
+_ledgers: dict = {}
+_ledgers_lock = threading.Lock()
+
+def get_ledger() -> PublishLedger:
+    """Ledger do site corrente (ids de post só são únicos dentro de um WP)."""
+    path = os.path.join(site_dir(), CFG["LEDGER_FILE"])
+    with _ledgers_lock:
+        led = _ledgers.get(path)
+        if led is None:
+            led = _ledgers[path] = PublishLedger(path)
+        return led
+
+# ---------------------- RETENÇÃO ---------------------------
+ARTIFACT_RE = re.compile(r"^(arte_.+\.jpg|reel_.+\.mp4)$")
+
+def tmp_path(path: str) -> str:
+    """Arquivo temporário ao lado do destino (mesmo disco: os.replace é atômico)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+
+def enforce_retention(now: Optional[float] = None) -> dict:
+    """
+    Limpa o diretório do site corrente: .tmp velhos (escrita interrompida),
+    artes/reels resolvidos acima de RETENTION_MAX_AGE_H e, se ainda passar
+    de RETENTION_MAX_BYTES, os resolvidos mais antigos. O que o ledger diz
+    estar pendente fica, mesmo estourando o orçamento.
+    """
+    now = now or time.time()
+    root = site_dir()
+    keep = get_ledger().pending_files()
+    removable, total, kept_bytes = [], 0, 0
+    stats = {"removed": 0, "freed": 0, "kept_pending": 0}
+
+    def _remove(path: str, size: int):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        stats["removed"] += 1
+        stats["freed"] += size
+
+    for entry in os.scandir(root):
+        if not entry.is_file():
+            continue
+        st = entry.stat()
+        if ".tmp" in entry.name:
+            if now - st.st_mtime > CFG["RETENTION_TMP_AGE_H"] * 3600:
+                _remove(entry.path, st.st_size)
+            continue
+        if not ARTIFACT_RE.match(entry.name):
+            continue
+        total += st.st_size
+        if os.path.abspath(entry.path) in keep:
+            stats["kept_pending"] += 1
+            kept_bytes += st.st_size
+            continue
+        removable.append((st.st_mtime, st.st_size, entry.path))
+
+    removable.sort()
+    max_age = CFG["RETENTION_MAX_AGE_H"] * 3600
+    for mtime, size, path in removable:
+        if now - mtime > max_age or total > CFG["RETENTION_MAX_BYTES"]:
+            _remove(path, size)
+            total -= size
+    if total > CFG["RETENTION_MAX_BYTES"]:
+        logging.warning("⚠️  OUT_DIR acima do orçamento (%.0f MB), mas %d arquivo(s) (%.0f MB) "
+                        "ainda estão pendentes de publicação", total / 1e6,
+                        stats["kept_pending"], kept_bytes / 1e6)
+    if stats["removed"]:
+        logging.info("🧹 Retenção: %d arquivo(s) apagados, %.1f MB liberados",
+                     stats["removed"], stats["freed"] / 1e6)
+    return stats
 
 # ---------------------- FUNÇÕES WP --------------------------
+WP_FIELDS = (
+    "id,date_gmt,modified,modified_gmt,title,link,jetpack_featured_media_url,"
+    "_links.wp:featuredmedia,_links.wp:term,_embedded"
+)
+WP_EMBED = "wp:featuredmedia,wp:term"
+
+def _wp_state_path() -> str:
+    return os.path.join(site_dir(), CFG["WP_STATE_FILE"])
+
+def wp_load_state() -> dict:
+    try:
+        with open(_wp_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def wp_save_state(state: dict):
+    path = _wp_state_path()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
 def wp_fetch_posts(limit: int = 5) -> list:
     """
     Busca posts mais recentes COM EMBED, para obter a imagem destacada.
     Só consideraremos imagem destacada. Sem isso, pulamos.
+
+    Modo incremental (WP_INCREMENTAL): pede só os campos usados, só posts
+    modificados depois da marca d'água salva e manda ETag/If-Modified-Since.
+    Feed sem mudança volta 304 e reaproveitamos a última resposta.
+    Com marca d'água, vêm os MAIS ANTIGOS primeiro (orderby=modified asc):
+    uma rajada maior que `limit` é drenada em ciclos seguidos e a marca
+    nunca passa de um post que ainda não foi devolvido. Os já resolvidos no
+    segundo da marca vão em `exclude` (ver wp_advance_high_water).
     """
-    url = f"{WP_URL}/wp-json/wp/v2/posts?_embed&per_page={limit}&orderby=date"
-    # campos úteis adicionais via _fields podem remover _embed -> então deixo completo
-    r = http.get(url, timeout=30)
+    if not CFG["WP_INCREMENTAL"]:
+        url = f"{site_env('WP_URL')}/wp-json/wp/v2/posts?_embed&per_page={limit}&orderby=date"
+        r = http.get(url, timeout=30)
+        r.raise_for_status()
+        stage_add(bytes=len(r.content))
+        posts = r.json()
+        logging.info("→ Recebidos %d posts", len(posts))
+        return posts
+
+    state = wp_load_state()
+    params = {
+        "_embed": WP_EMBED,
+        "_fields": WP_FIELDS,
+        "per_page": limit,
+        "orderby": "date",
+    }
+    if state.get("modified_after"):
+        # 1ª busca (sem marca) fica com os mais novos: não publica o arquivo todo
+        params.update(modified_after=state["modified_after"], orderby="modified", order="asc")
+        if state.get("exclude"):
+            params["exclude"] = ",".join(str(i) for i in state["exclude"])
+    url = f"{site_env('WP_URL')}/wp-json/wp/v2/posts"
+
+    headers = {}
+    if state.get("params") == params:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    r = http.get(url, params=params, headers=headers, timeout=30)
+    if r.status_code == 304:
+        posts = state.get("posts") or []
+        logging.info("→ Feed sem mudanças (304) — %d posts em cache", len(posts))
+        return posts
     r.raise_for_status()
+    stage_add(bytes=len(r.content))
     posts = r.json()
-    logging.info("→ Recebidos %d posts", len(posts))
+    state.update({
+        "params": params,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "posts": posts,
+    })
+    wp_save_state(state)
+    logging.info("→ Recebidos %d posts (%d bytes)", len(posts), len(r.content))
     return posts
 
+def wp_advance_high_water(posts: list, is_done) -> None:
+    """
+    Avança a marca d'água (campo 'modified', que é a coluna filtrada pelo
+    modified_after do WP) até o post mais novo já resolvido, sem passar de
+    nenhum post pendente — assim etapas que falharam voltam no próximo ciclo.
+    modified_after é exclusivo e tem resolução de 1 s: a marca fica 1 s antes
+    do último resolvido e os já resolvidos daquele segundo vão para
+    `exclude`. Assim um post do mesmo segundo que não coube na página ainda
+    vem, e a página não enche com posts já feitos.
+    """
+    if not CFG["WP_INCREMENTAL"] or not posts:
+        return
+    pending = [p.get("modified") or "" for p in posts if not is_done(p)]
+    done = [p.get("modified") or "" for p in posts if is_done(p)]
+    if pending:
+        floor = min(pending)
+        done = [m for m in done if m < floor]
+    if not done:
+        return
+    state = wp_load_state()
+    hw = max(done)
+    prev = state.get("high_water") or state.get("modified_after") or ""
+    if hw < prev:
+        return
+    seen = {p.get("id") for p in posts if (p.get("modified") or "") == hw and is_done(p)}
+    if hw == prev:
+        old = set(state.get("exclude") or ())
+        if seen <= old:
+            return
+        seen |= old
+    try:
+        mark = (datetime.fromisoformat(hw) - timedelta(seconds=1)).isoformat()
+    except ValueError:
+        mark = hw
+    state.update(modified_after=mark, high_water=hw, exclude=sorted(seen))
+    wp_save_state(state)
+    logging.info("→ Marca d'água WP: %s", hw)
+
 def wp_get_featured_image_url(post: dict) -> Optional[str]:
     """
     Retorna SOMENTE a URL da IMAGEM DESTACADA:
@@ -136,121 +1281,664 @@ def wp_get_featured_image_url(post: dict) -> Optional[str]:
     return None
 
 # ---------------------- ASSETS / FONTS ----------------------
+# fontes e logos carregados uma vez por processo (compartilhados entre sites)
+_fonts: dict = {}
+_logos: dict = {}
+
 def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
-    try:
-        return ImageFont.truetype(path, size)
-    except Exception:
-        logging.warning("⚠️  Fonte %s não encontrada — usando fallback.", path)
-        return ImageFont.load_default()
+    font = _fonts.get((path, size))
+    if font is None:
+        try:
+            font = ImageFont.truetype(path, size)
+        except Exception:
+            logging.warning("⚠️  Fonte %s não encontrada — usando fallback.", path)
+            font = ImageFont.load_default()
+        _fonts[(path, size)] = font
+    return font
+
+def load_logo(path: str, target_w: int) -> Image.Image:
+    """Logo RGB (RGBA achatado sobre branco) já na largura final."""
+    key = (path, target_w, os.path.getmtime(path))
+    logo = _logos.get(key)
+    if logo is None:
+        logo = Image.open(path)
+        if logo.mode == "RGBA":
+            bg_rgb = Image.new("RGB", logo.size, (255, 255, 255))
+            bg_rgb.paste(logo, mask=logo.split()[-1])
+            logo = bg_rgb
+        else:
+            logo = logo.convert("RGB")
+        w0, h0 = logo.size
+        logo = _logos[key] = logo.resize((target_w, int(h0 * target_w / float(w0))), Image.LANCZOS)
+    return logo
+
+class TextMeasurer:
+    """
+    Larguras memoizadas para UMA fonte/tamanho. Cada palavra é medida uma vez
+    (getlength = avanço, já com kerning interno); a largura de uma linha é a
+    soma das palavras + espaços + o ajuste de kerning em cada fronteira
+    "última letra␠primeira letra", também memoizado por par de caracteres.
+    Só palavras entram no memo (LRU de WORDS_MAX): no --daemon o processo
+    vive indefinidamente e cada título novo traria linhas inéditas.
+    """
+
+    WORDS_MAX = 4096
+
+    def __init__(self, font: ImageFont.ImageFont):
+        self.font = font
+        self._words: OrderedDict = OrderedDict()
+        self._pairs: dict = {}
+        self.space = font.getlength(" ")
+        self.calls = 1  # medições reais feitas (p/ benchmark)
+
+    def word(self, w: str) -> float:
+        v = self._words.get(w)
+        if v is None:
+            v = self._words[w] = self.font.getlength(w)
+            self.calls += 1
+            if len(self._words) > self.WORDS_MAX:
+                self._words.popitem(last=False)
+        else:
+            self._words.move_to_end(w)
+        return v
+
+    def line(self, text: str) -> float:
+        """Largura de uma linha já quebrada: soma das palavras + espaços (como no wrap)."""
+        width, prev = 0.0, None
+        for w in text.split():
+            width += self.word(w) if prev is None else self.join_cost(prev, w) + self.word(w)
+            prev = w
+        return width
+
+    def join_cost(self, a: str, b: str) -> float:
+        """Espaço entre a e b, com o kerning real do par a[-1] + " " + b[0]."""
+        key = (a[-1], b[0])
+        v = self._pairs.get(key)
+        if v is None:
+            pair = key[0] + " " + key[1]
+            v = self._pairs[key] = (self.font.getlength(pair)
+                                    - self.word(key[0]) - self.word(key[1]))
+            self.calls += 1
+        return v
+
+    def wrap(self, text: str, max_width: int) -> list:
+        lines = []
+        for paragraph in text.splitlines():
+            if not paragraph.strip():
+                lines.append("")
+                continue
+            # wrap por palavras, somando larguras (sem remedir a linha inteira)
+            line, line_w = [], 0.0
+            for w in paragraph.split():
+                ww = self.word(w)
+                new_w = ww if not line else line_w + self.join_cost(line[-1], w) + ww
+                if new_w <= max_width or not line:
+                    line.append(w)
+                    line_w = new_w
+                else:
+                    lines.append(" ".join(line))
+                    line, line_w = [w], ww
+            if line:
+                lines.append(" ".join(line))
+        return lines
+
+    def truncate(self, line: str, max_width: int, suffix: str = "…") -> str:
+        """Maior prefixo de `line` que cabe com `suffix` (busca binária, mín. 3 chars)."""
+        if self.font.getlength(line + suffix) <= max_width:
+            self.calls += 1
+            return line + suffix
+        lo, hi = min(3, len(line)), len(line) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            self.calls += 1
+            if self.font.getlength(line[:mid] + suffix) <= max_width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return line[:lo] + suffix
+
+_measurers: dict = {}
+
+def get_measurer(font: ImageFont.ImageFont) -> TextMeasurer:
+    key = (getattr(font, "path", None) or id(font), getattr(font, "size", 0))
+    m = _measurers.get(key)
+    if m is None:
+        m = _measurers[key] = TextMeasurer(font)
+    return m
+
+def line_height(font: ImageFont.ImageFont) -> int:
+    ascent, descent = font.getmetrics()
+    return ascent + descent + 6  # um respiro
 
 def text_box_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, max_width: int) -> tuple[list[str], int]:
     """
     Quebra em linhas para caber no max_width.
     Retorna (linhas, altura_total).
     """
-    lines = []
-    for paragraph in text.splitlines():
-        if not paragraph.strip():
-            lines.append("")
-            continue
-        # wrap por palavras
-        words = paragraph.split()
-        line = ""
-        for w in words:
-            test = (line + " " + w).strip()
-            bbox = draw.textbbox((0,0), test, font=font)
-            w_px = bbox[2] - bbox[0]
-            if w_px <= max_width:
-                line = test
-            else:
-                if line:
-                    lines.append(line)
-                line = w
-        if line:
-            lines.append(line)
+    lines = get_measurer(font).wrap(text, max_width)
     # altura total = soma das alturas das linhas (aprox pela métrica do font)
-    ascent, descent = font.getmetrics()
-    line_h = ascent + descent + 6  # um respiro
-    total_h = line_h * len(lines)
+    total_h = line_height(font) * len(lines)
     return lines, total_h
 
+def layout_title(title: str, font_for_size, base_size: int, max_width: int, box_h: int,
+                 min_size: Optional[int] = None) -> tuple:
+    """
+    Título dentro da caixa: (linhas, fonte, altura_da_linha).
+    Com TITLE_AUTO_SHRINK, busca binária no tamanho da fonte (entre
+    TITLE_MIN_FONT_SIZE e base_size) pelo maior que cabe sem cortar;
+    se nem o mínimo couber (ou sem auto-shrink), corta a última linha com "…".
+    """
+    def fits(size: int):
+        font = font_for_size(size)
+        lines = get_measurer(font).wrap(title, max_width)
+        lh = line_height(font)
+        return len(lines) * lh <= box_h, lines, font, lh
+
+    min_size = min(min_size or CFG["TITLE_MIN_FONT_SIZE"], base_size)
+    ok, lines, font, lh = fits(base_size)
+    if not ok and CFG["TITLE_AUTO_SHRINK"]:
+        lo, hi = min_size, base_size - 1
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            res = fits(mid)
+            if res[0]:
+                best, lo = res, mid + 1
+            else:
+                hi = mid - 1
+        if best is None:
+            best = fits(min_size)
+        ok, lines, font, lh = best
+
+    max_lines = max(1, box_h // lh)
+    if len(lines) > max_lines:
+        # reduz e adiciona "…" na última
+        lines = lines[:max_lines]
+        lines[-1] = get_measurer(font).truncate(lines[-1], max_width)
+    return lines, font, lh
+
+# Compositing por região: cantos arredondados pré-renderizados (por raio) e
+# pinturas só no retângulo afetado, sem imagens do tamanho do canvas.
+_corner_masks: dict = {}
+
+def corner_masks(radius: int) -> tuple:
+    """Os 4 cantos (máscaras L) de uma caixa arredondada, renderizados 1x por raio."""
+    cs = _corner_masks.get(radius)
+    if cs is None:
+        n, c = 4 * radius + 4, radius + 1
+        m = Image.new("L", (n, n), 0)
+        ImageDraw.Draw(m).rounded_rectangle((0, 0, n - 1, n - 1), radius=radius, fill=255)
+        cs = _corner_masks[radius] = (m.crop((0, 0, c, c)), m.crop((n - c, 0, n, c)),
+                                      m.crop((n - c, n - c, n, n)), m.crop((0, n - c, c, n)))
+    return cs
+
+def rounded_mask(size: tuple, radius: int) -> Image.Image:
+    """Máscara da caixa (igual à do rounded_rectangle) montada com os cantos do cache."""
+    w, h = size
+    if radius <= 0:
+        return Image.new("L", size, 255)
+    if min(w, h) < 2 * radius + 2:  # cantos se sobrepõem: desenha direto
+        m = Image.new("L", size, 0)
+        ImageDraw.Draw(m).rounded_rectangle((0, 0, w - 1, h - 1), radius=radius, fill=255)
+        return m
+    c = radius + 1
+    m = Image.new("L", size, 255)
+    for corner, pos in zip(corner_masks(radius), ((0, 0), (w - c, 0), (w - c, h - c), (0, h - c))):
+        m.paste(corner, pos)
+    return m
+
 def draw_rounded_rect(im: Image.Image, xy: tuple, radius: int, fill):
+    """Pinta a caixa arredondada xy (inclusivo) só na região dela."""
     x1, y1, x2, y2 = xy
-    corner = Image.new("L", (radius*2, radius*2), 0)
-    draw_c = ImageDraw.Draw(corner)
-    draw_c.pieslice((0,0, radius*2, radius*2), 180, 270, fill=255)
-    alpha = Image.new("L", im.size, 255)
-    alpha_draw = ImageDraw.Draw(alpha)
-    alpha_draw.rectangle((x1+radius, y1, x2-radius, y2), fill=0)
-    alpha_draw.rectangle((x1, y1+radius, x2, y2-radius), fill=0)
-    alpha.paste(corner, (x1, y1))
-    alpha.paste(corner.rotate(90), (x2 - radius*2, y1))
-    alpha.paste(corner.rotate(180), (x2 - radius*2, y2 - radius*2))
-    alpha.paste(corner.rotate(270), (x1, y2 - radius*2))
-    overlay = Image.new("RGB", im.size, fill)
-    im.paste(overlay, mask=alpha)
+    im.paste(fill, (x1, y1, x2 + 1, y2 + 1), rounded_mask((x2 - x1 + 1, y2 - y1 + 1), radius))
 
-# ---------------------- DOWNLOAD / IMAGEM -------------------
-def download_image(url: str) -> Optional[Image.Image]:
-    try:
-        r = http.get(url, timeout=30)
-        r.raise_for_status()
-        img = Image.open(io.BytesIO(r.content))
-        # normaliza para RGB
-        if img.mode == "RGBA":
-            bg = Image.new("RGB", img.size, (255, 255, 255))
-            bg.paste(img, mask=img.split()[-1])
-            img = bg
-        elif img.mode != "RGB":
-            img = img.convert("RGB")
-        return img
-    except Exception as e:
-        logging.warning("⚠️  Falha ao baixar imagem destacada: %s", e)
-        return None
+# ---------------------- TEMPLATE (CACHE) --------------------
+# Chaves da CFG que mudam o template; se alguma mudar, o cache é refeito.
+TEMPLATE_KEYS = (
+    "W", "H", "BG_COLOR", "IMG_TOP", "IMG_HEIGHT",
+    "LOGO_PATH", "LOGO_TARGET_W", "LOGO_Y",
+    "CAT_BAR_H", "CAT_BAR_Y", "CAT_BAR_COLOR", "CAT_FONT", "CAT_FONT_SIZE",
+    "TITLE_BOX_MARGIN_X", "TITLE_BOX_Y", "TITLE_BOX_H", "TITLE_BOX_RADIUS",
+    "TITLE_BOX_COLOR", "TITLE_FONT", "TITLE_FONT_SIZE",
+    "HANDLE_TEXT", "HANDLE_FONT", "HANDLE_FONT_SIZE", "HANDLE_COLOR", "HANDLE_Y",
+)
 
-def cover_resize(src: Image.Image, target_w: int, target_h: int) -> Image.Image:
+class TemplateCache:
     """
-    Redimensiona em "cover": preenche target cortando excesso.
+    Tudo que é igual em toda arte, montado uma vez por processo:
+    fontes carregadas, logo já redimensionado e a "moldura" estática
+    (faixa vermelha, logo, caixa do título, @handle) já composta numa base.
+    Por post só colamos a capa, a categoria e o título.
     """
-    sw, sh = src.size
-    if sw == 0 or sh == 0:
-        return src.resize((target_w, target_h), Image.LANCZOS)
-    scale = max(target_w / sw, target_h / sh)
-    nw, nh = int(sw * scale), int(sh * scale)
-    img = src.resize((nw, nh), Image.LANCZOS)
-    # crop central
-    left = (nw - target_w) // 2
-    top = (nh - target_h) // 2
-    return img.crop((left, top, left + target_w, top + target_h))
 
-# ---------------------- ARTE (MANTENDO SUA CFG) ------------
-def gerar_arte(bg_img: Image.Image, titulo: str, categoria: str, post_id: int) -> str:
-    """
-    Gera a arte seguindo EXATAMENTE a sua configuração aprovada.
-    """
-    W, H = CFG["W"], CFG["H"]
-    base = Image.new("RGB", (W, H), CFG["BG_COLOR"])
-    draw = ImageDraw.Draw(base)
+    def __init__(self, cfg: dict):
+        W, H = cfg["W"], cfg["H"]
+        self.font_cat = load_font(cfg["CAT_FONT"], cfg["CAT_FONT_SIZE"])
+        self.font_title = load_font(cfg["TITLE_FONT"], cfg["TITLE_FONT_SIZE"])
+        self._title_font_path = cfg["TITLE_FONT"]
+        self.font_handle = load_font(cfg["HANDLE_FONT"], cfg["HANDLE_FONT_SIZE"])
 
-    # 1) Imagem topo (cover)
-    img_h = CFG["IMG_HEIGHT"]
-    img_top = CFG["IMG_TOP"]
-    bg_cover = cover_resize(bg_img, W, img_h)
-    base.paste(bg_cover, (0, img_top))
+        # peças da moldura, na ordem de desenho: (posição, imagem, máscara)
+        self.pieces = []
+
+        # faixa vermelha da categoria
+        bar = Image.new("RGB", (W, cfg["CAT_BAR_H"] + 1), cfg["CAT_BAR_COLOR"])
+        self.pieces.append(((0, cfg["CAT_BAR_Y"]), bar, None))
+
+        # logo (RGBA achatado sobre branco, como antes)
+        try:
+            logo = load_logo(cfg["LOGO_PATH"], cfg["LOGO_TARGET_W"])
+            self.pieces.append((((W - logo.size[0]) // 2, cfg["LOGO_Y"]), logo, None))
+        except Exception as e:
+            logging.warning("⚠️  Logo falhou: %s", e)
+
+        # caixa branca do título (cantos arredondados via máscara)
+        margin_x = cfg["TITLE_BOX_MARGIN_X"]
+        self.box = (margin_x, cfg["TITLE_BOX_Y"], W - margin_x, cfg["TITLE_BOX_Y"] + cfg["TITLE_BOX_H"])
+        bw, bh = self.box[2] - self.box[0] + 1, self.box[3] - self.box[1] + 1
+        box_mask = rounded_mask((bw, bh), cfg["TITLE_BOX_RADIUS"])
+        box_img = Image.new("RGB", (bw, bh), cfg["TITLE_BOX_COLOR"])
+        self.pieces.append(((self.box[0], self.box[1]), box_img, box_mask))
+
+        # @handle (rodapé): máscara do texto + cor sólida
+        handle = cfg["HANDLE_TEXT"]
+        hb = self.font_handle.getbbox(handle)
+        if hb[2] > 0 and hb[3] > 0:
+            h_mask = Image.new("L", (hb[2], hb[3]), 0)
+            ImageDraw.Draw(h_mask).text((0, 0), handle, font=self.font_handle, fill=255)
+            h_img = Image.new("RGB", h_mask.size, cfg["HANDLE_COLOR"])
+            handle_x = (W - (hb[2] - hb[0])) // 2
+            self.pieces.append(((handle_x, cfg["HANDLE_Y"]), h_img, h_mask))
+
+        # base estática = fundo + moldura inteira
+        self.base = Image.new("RGB", (W, H), cfg["BG_COLOR"])
+        for pos, im, mask in self.pieces:
+            self.base.paste(im, pos, mask)
+
+        # peças que a capa cobre precisam ser recoladas por cima dela
+        top, bottom = cfg["IMG_TOP"], cfg["IMG_TOP"] + cfg["IMG_HEIGHT"]
+        self.over_cover = [
+            (pos, im, mask) for pos, im, mask in self.pieces
+            if pos[1] < bottom and pos[1] + im.size[1] > top
+        ]
+
+        # canvas reaproveitado entre posts (ART_REUSE_CANVAS): em vez de copiar
+        # a base inteira, só as regiões que o post anterior sujou voltam dela
+        self.canvas = None
+        self.dirty = []
+        self.lock = threading.Lock()
+
+    def begin_canvas(self) -> Image.Image:
+        """Canvas limpo (= base) para o próximo post; chamar com self.lock."""
+        if not CFG["ART_REUSE_CANVAS"]:
+            return self.base.copy()
+        if self.canvas is None:
+            self.canvas = self.base.copy()
+        else:
+            for rect in self.dirty:
+                self.canvas.paste(self.base.crop(rect), rect[:2])
+        self.dirty = []
+        return self.canvas
+
+    def mark_dirty(self, x1: int, y1: int, x2: int, y2: int, pad: int = 2):
+        W, H = self.base.size
+        rect = (max(0, x1 - pad), max(0, y1 - pad), min(W, x2 + pad), min(H, y2 + pad))
+        if rect[0] < rect[2] and rect[1] < rect[3]:
+            self.dirty.append(rect)
+
+    def title_font(self, size: int) -> ImageFont.ImageFont:
+        """Fonte do título em outro tamanho (auto-shrink)."""
+        return load_font(self._title_font_path, size)
+
+# Layout independente de resolução: as medidas da CFG valem para o canvas
+# W x H (reel); cada formato as escala (y pela altura, x pela largura,
+# fontes/logo/raio pelo menor dos dois fatores).
+LAYOUT_Y_KEYS = ("IMG_TOP", "IMG_HEIGHT", "LOGO_Y", "CAT_BAR_H", "CAT_BAR_Y",
+                 "TITLE_BOX_Y", "TITLE_BOX_H", "HANDLE_Y")
+LAYOUT_X_KEYS = ("TITLE_BOX_MARGIN_X",)
+LAYOUT_SIZE_KEYS = ("LOGO_TARGET_W", "CAT_FONT_SIZE", "TITLE_FONT_SIZE", "TITLE_MIN_FONT_SIZE",
+                    "HANDLE_FONT_SIZE", "TITLE_BOX_RADIUS")
+
+def art_formats() -> list:
+    """Formatos a renderizar: união dos destinos, com o "reel" (vídeo) sempre primeiro."""
+    fmts = ["reel"]
+    for names in CFG["ART_DESTINATIONS"].values():
+        for fmt in names:
+            if fmt not in fmts:
+                if fmt not in CFG["ART_FORMATS"]:
+                    raise ValueError(f"formato de arte desconhecido: {fmt}")
+                fmts.append(fmt)
+    return fmts
+
+def art_layout(fmt: str = "reel") -> dict:
+    """Medidas do template para o formato (o "reel" é a própria CFG)."""
+    lay = {k: CFG[k] for k in TEMPLATE_KEYS + LAYOUT_SIZE_KEYS}
+    if fmt == "reel":
+        return lay
+    w, h = CFG["ART_FORMATS"][fmt]
+    sx, sy = w / CFG["W"], h / CFG["H"]
+    sf = min(sx, sy)
+    lay["W"], lay["H"] = w, h
+    for keys, factor in ((LAYOUT_Y_KEYS, sy), (LAYOUT_X_KEYS, sx), (LAYOUT_SIZE_KEYS, sf)):
+        for k in keys:
+            lay[k] = max(1, round(CFG[k] * factor)) if CFG[k] else CFG[k]
+    return lay
+
+_template_cache: dict = {}
+
+def _template_key(lay: dict) -> tuple:
+    key = [repr(lay[k]) for k in TEMPLATE_KEYS]
+    # arquivo trocado no disco (mesmo nome) também invalida
+    for k in ("LOGO_PATH", "CAT_FONT", "TITLE_FONT", "HANDLE_FONT"):
+        try:
+            key.append(os.path.getmtime(lay[k]))
+        except OSError:
+            key.append(None)
+    return tuple(key)
+
+def get_template(lay: Optional[dict] = None) -> TemplateCache:
+    lay = lay if lay is not None else art_layout()
+    key = _template_key(lay)
+    tpl = _template_cache.get(key)
+    if tpl is None:
+        # um template por site/formato; versões antigas da CFG saem pela mais velha
+        while len(_template_cache) >= CFG["TEMPLATE_CACHE_MAX"]:
+            _template_cache.pop(next(iter(_template_cache)))
+        tpl = _template_cache[key] = TemplateCache(lay)
+    return tpl
+
+# ---------------------- DOWNLOAD / IMAGEM -------------------
+# Perfis de qualidade do resize da capa:
+#   resample     -> filtro final
+#   reducing_gap -> reduz antes em passos inteiros (rápido) e só o resto vai no filtro
+#   draft        -> deixa o decoder JPEG já reduzir por DCT (1/2, 1/4, 1/8)
+QUALITY_PROFILES = {
+    "fast":     {"resample": "BILINEAR", "reducing_gap": 2.0,  "draft": True},
+    "balanced": {"resample": "LANCZOS",  "reducing_gap": 3.0,  "draft": True},
+    "best":     {"resample": "LANCZOS",  "reducing_gap": None, "draft": False},
+}
+
+def quality_profile() -> dict:
+    return QUALITY_PROFILES.get(CFG["QUALITY_PROFILE"], QUALITY_PROFILES["balanced"])
+
+def _download_image_bytes(url: str, headers: Optional[dict] = None) -> tuple:
+    """
+    Baixa em streaming para UM buffer, respeitando IMG_MAX_BYTES.
+    Os primeiros chunks passam pelo ImageFile.Parser só até o cabeçalho:
+    se largura x altura passar de IMG_MAX_PIXELS, paramos de ler ali mesmo.
+    Retorna (status, buffer ou None, headers da resposta).
+    """
+    max_bytes = CFG["IMG_MAX_BYTES"]
+    max_pixels = CFG["IMG_MAX_PIXELS"]
+    with http.get(url, timeout=30, stream=True, headers=headers or {}) as r:
+        if r.status_code == 304:
+            return 304, None, r.headers
+        r.raise_for_status()
+        declared = r.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            logging.warning("⚠️  Imagem grande demais (%s bytes) — pulando", declared)
+            return r.status_code, None, r.headers
+
+        buf = io.BytesIO()
+        parser = ImageFile.Parser()
+        header_ok = False
+        for chunk in r.iter_content(CFG["IMG_CHUNK"]):
+            buf.write(chunk)
+            if buf.tell() > max_bytes:
+                logging.warning("⚠️  Imagem passou de %d bytes — abortando download", max_bytes)
+                return r.status_code, None, r.headers
+            if not header_ok:
+                parser.feed(chunk)
+                if parser.image is not None:
+                    w, h = parser.image.size
+                    if w * h > max_pixels:
+                        logging.warning("⚠️  Imagem %dx%d passa de %d pixels — abortando download",
+                                        w, h, max_pixels)
+                        return r.status_code, None, r.headers
+                    header_ok = True
+                    parser = None  # o resto não precisa passar pelo parser
+    if not header_ok:
+        logging.warning("⚠️  Conteúdo não reconhecido como imagem: %s", url)
+        return r.status_code, None, r.headers
+    stage_add(bytes=buf.tell())
+    buf.seek(0)
+    return r.status_code, buf, r.headers
+
+def _decode_image(buf: io.BytesIO, target: Optional[tuple] = None) -> Image.Image:
+    img = Image.open(buf)
+    if quality_profile()["draft"]:
+        img.draft("RGB", target or (CFG["W"], CFG["IMG_HEIGHT"]))
+    # decodifica já (o open é preguiçoso): imagem truncada/corrompida falha
+    # aqui, dentro do download, e não mais tarde no resize
+    img.load()
+    # normaliza para RGB
+    if img.mode == "RGBA":
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.split()[-1])
+        img = bg
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+def download_image(url: str, target: Optional[tuple] = None) -> Optional[Image.Image]:
+    """
+    Baixa e decodifica a imagem destacada.
+    target = menor tamanho que ainda precisamos (padrão: a capa W x IMG_HEIGHT);
+    com draft, JPEG grande já sai do decoder reduzido, sem passar desse mínimo.
+    """
+    try:
+        _, buf, _ = _download_image_bytes(url)
+        if buf is None:
+            return None
+        return _decode_image(buf, target)
+    except Exception as e:
+        logging.warning("⚠️  Falha ao baixar imagem destacada: %s", e)
+        return None
+
+class CoverCache:
+    """
+    Cache em disco das capas JÁ RECORTADAS (W x IMG_HEIGHT), chaveado por
+    URL + tamanho + perfil de qualidade, guardando ETag/Last-Modified da
+    origem. Com validador salvo, mandamos GET condicional: 304 = nem baixa.
+    Despejo LRU (mtime = último uso) por tamanho total do diretório.
+    """
 
-    # Divisória preta fina entre imagem e faixa? (opcional)
-    # draw.rectangle((0, img_h-3, W, img_h), fill=(0,0,0))
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
 
-    # 2) Faixa vermelha da categoria
-    cat_bar_h = CFG["CAT_BAR_H"]
-    cat_bar_y = CFG["CAT_BAR_Y"]
-    draw.rectangle(
-        (0, cat_bar_y, W, cat_bar_y + cat_bar_h),
-        fill=CFG["CAT_BAR_COLOR"]
+    def key(self, url: str, size: tuple) -> str:
+        raw = f"{url}|{size[0]}x{size[1]}|{CFG['QUALITY_PROFILE']}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        return (os.path.join(self.root, key + ".jpg"),
+                os.path.join(self.root, key + ".json"))
+
+    def meta(self, key: str) -> Optional[dict]:
+        img_path, meta_path = self._paths(key)
+        if not os.path.isfile(img_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, key: str) -> Optional[Image.Image]:
+        img_path, meta_path = self._paths(key)
+        try:
+            img = Image.open(img_path)
+            img.load()
+        except OSError:
+            return None
+        now = time.time()
+        for p in (img_path, meta_path):
+            try:
+                os.utime(p, (now, now))
+            except OSError:
+                pass
+        return img
+
+    def store(self, key: str, url: str, img: Image.Image, headers) -> None:
+        img_path, meta_path = self._paths(key)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        os.makedirs(self.root, exist_ok=True)
+        # subsampling=0 + q95: praticamente sem perda na segunda compressão
+        img.save(img_path + ".tmp", "JPEG", quality=95, subsampling=0)
+        os.replace(img_path + ".tmp", img_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self.evict()
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                p = os.path.join(self.root, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, p = entries.pop(0)
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+                total -= size
+
+cover_cache = CoverCache(os.path.join(OUT_DIR, CFG["COVER_CACHE_DIR"]),
+                         CFG["COVER_CACHE_MAX_BYTES"])
+
+def download_cover(url: str) -> Optional[Image.Image]:
+    """
+    Capa pronta (W x IMG_HEIGHT) para a arte, passando pelo CoverCache.
+    Se a origem confirmar que não mudou (304), usa a capa salva sem baixar.
+    """
+    size = (CFG["W"], CFG["IMG_HEIGHT"])
+    key = cover_cache.key(url, size)
+    meta = cover_cache.meta(key)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        status, buf, resp_headers = _download_image_bytes(url, headers if headers else None)
+        if status == 304:
+            cover = cover_cache.load(key)
+            if cover is not None:
+                logging.info("♻️  Capa em cache (304): %s", url)
+                return cover
+            status, buf, resp_headers = _download_image_bytes(url)
+        if buf is None:
+            return None
+        cover = cover_resize(_decode_image(buf, size), *size)
+    except Exception as e:
+        logging.warning("⚠️  Falha ao baixar imagem destacada: %s", e)
+        return None
+    if resp_headers.get("ETag") or resp_headers.get("Last-Modified"):
+        try:
+            cover_cache.store(key, url, cover, resp_headers)
+        except OSError as e:
+            logging.warning("⚠️  Cache de capa falhou: %s", e)
+    return cover
+
+def cover_resize(src: Image.Image, target_w: int, target_h: int) -> Image.Image:
+    """
+    Redimensiona em "cover": preenche target cortando excesso.
+    Calcula o recorte central primeiro e reamostra só essa região.
+    """
+    prof = quality_profile()
+    sw, sh = src.size
+    if (sw, sh) == (target_w, target_h):
+        return src  # já é a capa recortada (ex.: veio do CoverCache)
+    if sw == 0 or sh == 0:
+        return src.resize((target_w, target_h), getattr(Image, prof["resample"]))
+    scale = max(target_w / sw, target_h / sh)
+    # crop central (em coordenadas da imagem original)
+    cw, ch = min(sw, target_w / scale), min(sh, target_h / scale)
+    left = max(0.0, (sw - cw) / 2)
+    top = max(0.0, (sh - ch) / 2)
+    return src.resize(
+        (target_w, target_h),
+        getattr(Image, prof["resample"]),
+        box=(left, top, left + cw, top + ch),
+        reducing_gap=prof["reducing_gap"],
     )
 
-    # Categoria (centralizado na faixa)
-    font_cat = load_font(CFG["CAT_FONT"], CFG["CAT_FONT_SIZE"])
+# ---------------------- ARTE (MANTENDO SUA CFG) ------------
+class RawFrame(NamedTuple):
+    """Arte já composta, em RGB cru, pronta p/ o stdin do ffmpeg."""
+    size: tuple
+    data: bytes
+    path: Optional[str] = None  # JPEG salvo junto (ART_REEL_JPEG), se houver
+
+def gerar_arte(bg_img: Image.Image, titulo: str, categoria: str, post_id: int,
+               fmt: str = "reel", raw: bool = False):
+    """
+    Gera a arte seguindo EXATAMENTE a sua configuração aprovada.
+    Outros formatos (fmt) usam o mesmo layout, escalado (art_layout).
+    raw=True devolve um RawFrame (sem JPEG, salvo se ART_REEL_JPEG);
+    senão, o caminho do JPEG.
+    """
+    lay = art_layout(fmt)
+    tpl = get_template(lay)
+    name = f"arte_{post_id}.jpg" if fmt == "reel" else f"arte_{post_id}_{fmt}.jpg"
+    out_path = os.path.join(site_dir(), name)
+    with tpl.lock:
+        try:
+            canvas = _compose_arte(tpl, lay, bg_img, titulo, categoria)
+            frame = canvas.tobytes() if raw else None
+            if not raw or CFG["ART_REEL_JPEG"]:
+                save_jpeg(canvas, out_path)
+            else:
+                out_path = None
+        except Exception:
+            tpl.canvas = None  # estado incerto: o próximo post parte da base de novo
+            raise
+    if not raw:
+        logging.info("✅ Arte pronta: %s", out_path)
+        return out_path
+    logging.info("✅ Arte pronta: frame %dx%d%s", lay["W"], lay["H"],
+                 f" + {out_path}" if out_path else "")
+    return RawFrame((lay["W"], lay["H"]), frame, out_path)
+
+def save_jpeg(im: Image.Image, out_path: str):
+    tmp = tmp_path(out_path)
+    im.save(tmp, "JPEG", quality=92, optimize=True, progressive=True)
+    os.replace(tmp, out_path)  # nunca fica JPEG pela metade com o nome final
+
+def _compose_arte(tpl: TemplateCache, lay: dict, bg_img: Image.Image, titulo: str,
+                  categoria: str) -> Image.Image:
+    W = lay["W"]
+    base = tpl.begin_canvas()
+    draw = ImageDraw.Draw(base)
+
+    # 1) Imagem topo (cover) + moldura que fica por cima dela
+    img_h = lay["IMG_HEIGHT"]
+    img_top = lay["IMG_TOP"]
+    bg_cover = cover_resize(bg_img, W, img_h)
+    base.paste(bg_cover, (0, img_top))
+    for pos, im, mask in tpl.over_cover:
+        base.paste(im, pos, mask)
+
+    # 2) Categoria (centralizado na faixa)
+    cat_bar_h = lay["CAT_BAR_H"]
+    cat_bar_y = lay["CAT_BAR_Y"]
+    font_cat = tpl.font_cat
     cat_text = (categoria or "").upper()
     bbox = draw.textbbox((0, 0), cat_text, font=font_cat)
     cat_w = bbox[2] - bbox[0]
@@ -258,132 +1946,130 @@ def gerar_arte(bg_img: Image.Image, titulo: str, categoria: str, post_id: int) -
     cat_x = (W - cat_w) // 2
     cat_y = cat_bar_y + (cat_bar_h - cat_h) // 2
     draw.text((cat_x, cat_y), cat_text, font=font_cat, fill=(255, 255, 255))
+    tpl.mark_dirty(cat_x + bbox[0], cat_y + bbox[1], cat_x + bbox[2], cat_y + bbox[3])
 
-    # 3) LOGO (sem cobrir o vermelho: sua Y está acima da faixa)
-    try:
-        logo = Image.open(CFG["LOGO_PATH"])
-        if logo.mode == "RGBA":
-            # converte para RGB com fundo branco
-            bg_rgb = Image.new("RGB", logo.size, (255, 255, 255))
-            bg_rgb.paste(logo, mask=logo.split()[-1])
-            logo = bg_rgb
-        else:
-            logo = logo.convert("RGB")
-        target_w = CFG["LOGO_TARGET_W"]
-        w0, h0 = logo.size
-        ratio = target_w / float(w0)
-        new_size = (target_w, int(h0 * ratio))
-        logo = logo.resize(new_size, Image.LANCZOS)
-        logo_x = (W - logo.size[0]) // 2
-        logo_y = CFG["LOGO_Y"]
-        base.paste(logo, (logo_x, logo_y))
-    except Exception as e:
-        logging.warning("⚠️  Logo falhou: %s", e)
-
-    # 4) Caixa branca do TÍTULO
+    # 3) TÍTULO (caixa branca já está na moldura)
     title = (html.unescape(titulo or "")).strip()
-    font_title = load_font(CFG["TITLE_FONT"], CFG["TITLE_FONT_SIZE"])
-
-    box_y = CFG["TITLE_BOX_Y"]
-    box_h = CFG["TITLE_BOX_H"]
-    margin_x = CFG["TITLE_BOX_MARGIN_X"]
-    box_x1 = margin_x
-    box_x2 = W - margin_x
-    box_y1 = box_y
-    box_y2 = box_y + box_h
-
-    # desenha caixa arredondada branca
-    # (para performance, desenhamos shape manual simples)
-    radius = CFG["TITLE_BOX_RADIUS"]
-    # forma simplificada (sem alpha): retângulo + cantos aproximados
-    draw.rounded_rectangle(
-        (box_x1, box_y1, box_x2, box_y2),
-        radius=radius,
-        fill=CFG["TITLE_BOX_COLOR"]
-    )
+    font_title = tpl.font_title
+    box_x1, box_y1, box_x2, box_y2 = tpl.box
+    box_h = lay["TITLE_BOX_H"]
 
-    # quebra do título para caber na caixa
+    # quebra do título para caber na caixa (encolhe a fonte ou corta com "…")
     max_text_w = (box_x2 - box_x1) - 40
-    lines, total_h = text_box_size(draw, title, font_title, max_text_w)
-
-    # se altura estourar, corta linhas pelo fim
-    ascent, descent = font_title.getmetrics()
-    line_h = ascent + descent + 6
-    max_lines = max(1, box_h // line_h)
-    if len(lines) > max_lines:
-        # reduz e adiciona "…"
-        lines = lines[:max_lines]
-        if lines:
-            # garante reticências na última
-            last = lines[-1]
-            # cabe "…"? se não, corta 3 chars
-            while True:
-                bbox = draw.textbbox((0,0), last + "…", font=font_title)
-                if (bbox[2]-bbox[0]) <= max_text_w or len(last) <= 3:
-                    lines[-1] = last + "…"
-                    break
-                last = last[:-1]
+    lines, font_title, line_h = layout_title(
+        title, tpl.title_font, lay["TITLE_FONT_SIZE"], max_text_w, box_h,
+        lay["TITLE_MIN_FONT_SIZE"])
 
     # escreve centralizado verticalmente na caixa
     cur_y = box_y1 + (box_h - (line_h * len(lines))) // 2
     for ln in lines:
-        bbox_ln = draw.textbbox((0,0), ln, font=font_title)
-        ln_w = bbox_ln[2] - bbox_ln[0]
+        ln_w = get_measurer(font_title).line(ln) if ln else 0
         x = box_x1 + ( (box_x2 - box_x1) - ln_w ) // 2
         draw.text((x, cur_y), ln, fill=(0,0,0), font=font_title)
+        # avanço + folga: glifos podem passar um pouco da largura medida
+        tpl.mark_dirty(int(x), cur_y, int(x + ln_w) + 1, cur_y + line_h, pad=8)
         cur_y += line_h
+    return base
 
-    # 5) @handle (rodapé)
-    font_handle = load_font(CFG["HANDLE_FONT"], CFG["HANDLE_FONT_SIZE"])
-    handle = CFG["HANDLE_TEXT"]
-    hb = draw.textbbox((0,0), handle, font=font_handle)
-    handle_w = hb[2]-hb[0]
-    handle_x = (W - handle_w)//2
-    handle_y = CFG["HANDLE_Y"]
-    draw.text((handle_x, handle_y), handle, font=font_handle, fill=CFG["HANDLE_COLOR"])
-
-    # salva
-    out_path = os.path.join(OUT_DIR, f"arte_{post_id}.jpg")
-    base.save(out_path, "JPEG", quality=92, optimize=True, progressive=True)
-    logging.info("✅ Arte pronta: %s", out_path)
-    return out_path
+def render_formats(submit, bg_img: Image.Image, titulo: str, categoria: str, post_id: int) -> dict:
+    """
+    Todas as artes do post a partir da MESMA capa já decodificada: um job
+    por formato em `submit` (pool de render, um processo por núcleo), em
+    paralelo. Retorna {formato: caminho}; no modo VIDEO_INPUT="raw" o
+    "reel" vem como RawFrame (vai direto p/ o ffmpeg).
+    """
+    raw = CFG["VIDEO_INPUT"] == "raw"
+    futs = {fmt: submit(gerar_arte, bg_img, titulo, categoria, post_id, fmt, raw and fmt == "reel")
+            for fmt in art_formats()}
+    return {fmt: fut.result() for fmt, fut in futs.items()}
 
 # ---------------------- VÍDEO (FFMPEG) ----------------------
-def make_video_from_image(img_path: str, out_mp4: str, seconds: int, audio_path: Optional[str]) -> bool:
+VIDEO_SIZE = (1080, 1920)
+VIDEO_VF = "format=yuv420p,scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2"
+
+def cached_audio_aac(audio_path: str, seconds: int) -> Optional[str]:
     """
-    Gera MP4 vertical 9:16, H.264 + AAC, com imagem estática.
-    Se tiver áudio, mixa.
+    Converte o áudio de fundo p/ AAC (já cortado em `seconds`) UMA vez e
+    guarda em OUT_DIR/AUDIO_CACHE_DIR; os reels só fazem stream copy.
+    A chave inclui mtime/tamanho do arquivo, então trocar o mp3 refaz o cache.
+    """
+    try:
+        st = os.stat(audio_path)
+    except OSError:
+        return None
+    raw = f"{os.path.abspath(audio_path)}|{st.st_mtime_ns}|{st.st_size}|{seconds}"
+    key = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    cache_dir = os.path.join(OUT_DIR, CFG["AUDIO_CACHE_DIR"])
+    os.makedirs(cache_dir, exist_ok=True)
+    out = os.path.join(cache_dir, f"bg_{key}.m4a")
+    if os.path.isfile(out):
+        return out
+    tmp = tmp_path(out)
+    cmd = [
+        CFG["FFMPEG_BIN"], "-y",
+        "-i", audio_path,
+        "-t", str(seconds),
+        "-vn",
+        "-c:a", "aac",
+        "-b:a", "128k",
+        tmp,
+    ]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.replace(tmp, out)
+        return out
+    except Exception as e:
+        logging.warning("⚠️  Cache de áudio falhou (%s) — vou codificar por reel", e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return None
+
+def _image_size(img_path: str) -> Optional[tuple]:
+    try:
+        with Image.open(img_path) as im:
+            return im.size  # só lê o cabeçalho
+    except OSError:
+        return None
+
+def _still_input(img_path: Optional[str], seconds: int, fps: int,
+                 frame_size: Optional[tuple]) -> tuple:
+    """
+    Entrada de imagem parada -> (args de entrada, filtros). Com frame_size,
+    lê UM frame RGB cru do stdin e o filtro loop o repete pelo vídeo todo.
+    """
+    if frame_size is None:
+        return ["-loop", "1", "-framerate", str(fps), "-t", str(seconds), "-i", img_path], []
+    w, h = frame_size
+    return (["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}",
+             "-framerate", str(fps), "-i", "pipe:0"],
+            [f"loop=loop={fps * int(seconds) - 1}:size=1"])
+
+def build_ffmpeg_cmd(img_path: Optional[str], out_mp4: str, seconds: int, audio_path: Optional[str],
+                     fast: Optional[bool] = None, frame_size: Optional[tuple] = None) -> list:
+    """
+    Monta o comando ffmpeg. fast=None usa CFG["VIDEO_FAST"].
+      - legado: 250 frames em preset medium, filtro scale/pad sempre, AAC por reel
+      - fast:   entrada a 1 fps, -tune stillimage, GOP = vídeo inteiro, sem filtro se a arte já é
+                1080x1920, áudio AAC pré-codificado copiado (-c:a copy)
+    frame_size=(w, h): a arte chega crua (rgb24) no stdin em vez de img_path.
     """
     ffmpeg = CFG["FFMPEG_BIN"]
-    if audio_path and os.path.isfile(audio_path):
-        cmd = [
-            ffmpeg,
-            "-y",
-            "-loop", "1",
-            "-t", str(seconds),
-            "-i", img_path,
-            "-i", audio_path,
-            "-vf", "format=yuv420p,scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2",
-            "-r", "25",
-            "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
-            "-profile:v", "high",
-            "-level", "4.0",
-            "-preset", "medium",
-            "-crf", "23",
-            "-c:a", "aac",
-            "-b:a", "128k",
-            "-shortest",
-            out_mp4
-        ]
-    else:
-        cmd = [
-            ffmpeg,
-            "-y",
-            "-loop", "1",
-            "-t", str(seconds),
-            "-i", img_path,
-            "-vf", "format=yuv420p,scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2",
+    has_audio = bool(audio_path and os.path.isfile(audio_path))
+    if fast is None:
+        fast = CFG["VIDEO_FAST"]
+
+    if not fast:
+        if frame_size is None:
+            cmd, vf = [ffmpeg, "-y", "-loop", "1", "-t", str(seconds), "-i", img_path], []
+        else:
+            src, vf = _still_input(None, seconds, 25, frame_size)
+            cmd = [ffmpeg, "-y"] + src
+        if has_audio:
+            cmd += ["-i", audio_path]
+        cmd += [
+            "-vf", ",".join(vf + [VIDEO_VF]),
             "-r", "25",
             "-c:v", "libx264",
             "-pix_fmt", "yuv420p",
@@ -391,149 +2077,698 @@ def make_video_from_image(img_path: str, out_mp4: str, seconds: int, audio_path:
             "-level", "4.0",
             "-preset", "medium",
             "-crf", "23",
-            out_mp4
         ]
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return True
-    except Exception as e:
-        logging.error("❌ ffmpeg falhou: %s", e)
-        return False
+        if has_audio:
+            cmd += ["-c:a", "aac", "-b:a", "128k", "-shortest"]
+        return cmd + [out_mp4]
+
+    fps = CFG["VIDEO_FPS"]
+    # entrada a 1 fps: a arte é decodificada 1x por segundo e o -r de saída
+    # só duplica frames (idênticos) até VIDEO_FPS
+    src, vf = _still_input(img_path, seconds, 1, frame_size)
+    cmd = [ffmpeg, "-y"] + src
+    aac = cached_audio_aac(audio_path, seconds) if has_audio else None
+    if aac:
+        cmd += ["-i", aac]
+    elif has_audio:
+        cmd += ["-i", audio_path]
+    if (frame_size or _image_size(img_path)) != VIDEO_SIZE:
+        vf.append(VIDEO_VF)
+    if vf:
+        cmd += ["-vf", ",".join(vf)]
+    cmd += [
+        "-r", str(fps),
+        "-c:v", "libx264",
+        "-pix_fmt", "yuv420p",
+        "-profile:v", "high",
+        "-level", "4.0",
+        "-preset", CFG["VIDEO_PRESET"],
+        "-tune", "stillimage",
+        "-crf", "23",
+        "-g", str(fps * max(1, int(seconds))),
+        "-movflags", "+faststart",
+    ]
+    if aac:
+        cmd += ["-c:a", "copy", "-shortest"]
+    elif has_audio:
+        cmd += ["-c:a", "aac", "-b:a", "128k", "-shortest"]
+    return cmd + [out_mp4]
+
+class EncoderService:
+    """
+    Fila de encodes (imagem, duração, áudio) -> MP4.
+    Roda até `parallel` ffmpeg ao mesmo tempo, cada um com `threads` fixas,
+    para que encodes em paralelo não disputem os mesmos núcleos. Lê o
+    `-progress` do ffmpeg e devolve, por job, frames, fps e tempo de encode.
+    """
+
+    def __init__(self, parallel: int = 0, threads: int = 0):
+        cores = os.cpu_count() or 1
+        self.parallel = max(1, min(parallel or CFG["ENCODE_PARALLEL"] or cores // 4, cores))
+        self.threads = max(1, threads or CFG["ENCODE_THREADS"] or cores // self.parallel)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._procs = set()  # ffmpeg rodando agora (kill() no 2º sinal)
+
+    def submit(self, img_path: Optional[str], out_mp4: str, seconds: int, audio_path: Optional[str],
+               frame: Optional[RawFrame] = None):
+        """Enfileira o job; retorna um Future com o dict de resultado."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.parallel)
+            return self._pool.submit(contextvars.copy_context().run, _unless_stopping, self.run,
+                                     img_path, out_mp4, seconds, audio_path, frame)
+
+    def run(self, img_path: Optional[str], out_mp4: str, seconds: int, audio_path: Optional[str],
+            frame: Optional[RawFrame] = None) -> dict:
+        """
+        Executa um encode na thread atual (o ffmpeg é outro processo).
+        Com `frame`, a arte vai crua pelo stdin (img_path é ignorado).
+        """
+        # escreve num .tmp e renomeia no fim: crash/kill nunca deixa MP4 pela
+        # metade com o nome final (que depois seria reaproveitado e enviado)
+        tmp = tmp_path(out_mp4)
+        cmd = build_ffmpeg_cmd(img_path, tmp, seconds, audio_path,
+                               frame_size=frame.size if frame else None)
+        cmd = cmd[:-1] + [
+            "-threads", str(self.threads),
+            "-progress", "pipe:1",
+            "-nostats",
+            "-loglevel", "error",
+        ] + cmd[-1:]
+        res = {"ok": False, "out": out_mp4, "seconds": 0.0, "frames": 0, "fps": 0.0,
+               "speed": None, "error": ""}
+        t0 = time.perf_counter()
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    stdin=subprocess.PIPE if frame else subprocess.DEVNULL,
+                                    text=True, errors="replace")
+        except OSError as e:
+            logging.error("❌ ffmpeg falhou: %s", e)
+            res["error"] = str(e)
+            return res
+        with self._lock:
+            self._procs.add(proc)
+        if frame:
+            # 1 frame só: o ffmpeg lê tudo antes de começar a escrever o -progress
+            # (se ele morrer antes, o rc/stderr abaixo dizem o porquê)
+            with suppress(BrokenPipeError):
+                proc.stdin.buffer.write(frame.data)
+            with suppress(BrokenPipeError):
+                proc.stdin.close()
+
+        # -progress: blocos "chave=valor" terminados em progress=continue|end
+        for line in proc.stdout:
+            key, _, val = line.strip().partition("=")
+            val = val.strip()
+            if key == "frame" and val.isdigit():
+                res["frames"] = int(val)
+            elif key == "speed":
+                res["speed"] = val
+        err = proc.stderr.read()
+        rc = proc.wait()
+        with self._lock:
+            self._procs.discard(proc)
+
+        res["seconds"] = time.perf_counter() - t0
+        res["fps"] = res["frames"] / res["seconds"] if res["seconds"] > 0 else 0.0
+        res["ok"] = rc == 0
+        if res["ok"]:
+            os.replace(tmp, out_mp4)
+        else:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        if res["ok"]:
+            logging.info("🎞️  Reel %s: %d frames em %.1fs (%.0f fps, %s, %d threads)",
+                         os.path.basename(out_mp4), res["frames"], res["seconds"],
+                         res["fps"], res["speed"] or "?", self.threads)
+        else:
+            res["error"] = err.strip()[-500:]
+            logging.error("❌ ffmpeg falhou (rc=%s): %s", rc, res["error"])
+        return res
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def kill(self):
+        """Mata os ffmpeg em andamento (saída imediata; o .tmp fica para a retenção)."""
+        with self._lock:
+            for proc in self._procs:
+                with suppress(OSError):
+                    proc.kill()
+
+encoder = EncoderService()
+
+def make_video_from_image(img_path: str, out_mp4: str, seconds: int, audio_path: Optional[str]) -> bool:
+    """
+    Gera MP4 vertical 9:16, H.264 + AAC, com imagem estática.
+    Se tiver áudio, mixa.
+    """
+    return encoder.run(img_path, out_mp4, seconds, audio_path)["ok"]
 
 # ---------------------- CLOUDINARY (opcional IG) ------------
+def cloudinary_configured() -> bool:
+    return bool(site_env("CLOUD_NAME") and site_env("CLOUD_KEY") and site_env("CLOUD_SEC"))
+
 def cloudinary_upload(local_path: str) -> Optional[str]:
     """
     Sobe o vídeo no Cloudinary e retorna secure_url (pública).
     Se não tiver credenciais, retorna None.
     """
-    if not (CLOUD_NAME and CLOUD_KEY and CLOUD_SEC):
+    if not cloudinary_configured():
         return None
+    cloud_name, api_key, api_secret = site_env("CLOUD_NAME"), site_env("CLOUD_KEY"), site_env("CLOUD_SEC")
     try:
-        import cloudinary
         import cloudinary.uploader
-        cloudinary.config(
-            cloud_name=CLOUD_NAME,
-            api_key=CLOUD_KEY,
-            api_secret=CLOUD_SEC,
-            secure=True
-        )
+        # credenciais por chamada (não no config global): cada site tem a sua conta
         resp = cloudinary.uploader.upload_large(
             local_path,
             resource_type="video",
             folder="auto_reels",
-            overwrite=True
+            overwrite=True,
+            cloud_name=cloud_name,
+            api_key=api_key,
+            api_secret=api_secret,
+            secure=True
         )
+        stage_add(bytes=os.path.getsize(local_path))
         return resp.get("secure_url")
     except Exception as e:
         logging.error("❌ Cloudinary falhou: %s", e)
         return None
 
 # ---------------------- FACEBOOK PUBLISH --------------------
-def publish_video_to_facebook(file_path: str, description: str) -> bool:
-    page_id = FACEBOOK_PAGE_ID
-    token   = USER_ACCESS_TOKEN
-    if not (page_id and token):
-        logging.error("❌ Faltam FACEBOOK_PAGE_ID/USER_ACCESS_TOKEN no .env")
+_fb_sessions_lock = threading.Lock()
+
+def _fb_sessions_path() -> str:
+    return os.path.join(site_dir(), CFG["FB_SESSIONS_FILE"])
+
+def _fb_session_key(file_path: str, post_id=None) -> str:
+    return f"post:{post_id}" if post_id is not None else os.path.abspath(file_path)
+
+def _fb_session_fresh(sess: dict) -> bool:
+    """O arquivo da sessão ainda é o mesmo (não foi apagado nem renderizado de novo)?"""
+    try:
+        st = os.stat(sess["file"])
+    except (KeyError, TypeError, OSError):
         return False
+    return st.st_size == sess.get("size") and st.st_mtime_ns == sess.get("mtime_ns")
 
-    url = f"https://graph.facebook.com/v23.0/{page_id}/videos?access_token={token}"
-    for attempt in (1, 2):
-        try:
-            with open(file_path, "rb") as f:
-                r = http.post(url, data={"description": description[:2200]},
-                              files={"source": f}, timeout=600)
-            r.raise_for_status()
-            vid = r.json().get("id")
-            logging.info("📘 Publicado na Página (vídeo): id=%s", vid)
-            return True
-        except Exception as e:
-            body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
-            logging.error("❌ Facebook falhou (tentativa %s): %s | resp=%s", attempt, e, body)
-            time.sleep(3)
-    return False
+def _fb_sessions_load() -> dict:
+    """Sessões salvas, sem as velhas (arquivo mudou ou sumiu: a sessão não serve mais)."""
+    try:
+        with open(_fb_sessions_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {k: v for k, v in data.items() if _fb_session_fresh(v)} if isinstance(data, dict) else {}
 
-# ---------------------- INSTAGRAM REELS ---------------------
-def publish_reel_to_ig(video_public_url: str, caption: str) -> bool:
+def _fb_session_get(key: str) -> Optional[dict]:
+    with _fb_sessions_lock:
+        return _fb_sessions_load().get(key)
+
+def _fb_session_put(key: str, sess: Optional[dict]):
+    """Grava (ou remove, se sess=None) a sessão de upload de um arquivo."""
+    with _fb_sessions_lock:
+        path = _fb_sessions_path()
+        data = _fb_sessions_load()
+        if sess is None:
+            data.pop(key, None)
+        else:
+            data[key] = sess
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+def _fb_video_published(video_id: str) -> bool:
+    """O vídeo já passou do finish (publicação começou ou terminou)?"""
+    try:
+        r = graph_call("GET", site_env("FACEBOOK_PAGE_ID"), f"{GRAPH_BASE}/{video_id}",
+                       params={"fields": "status", "access_token": site_env("USER_ACCESS_TOKEN")},
+                       timeout=30)
+        if r.status_code != 200:
+            return False
+        phase = ((r.json().get("status") or {}).get("publishing_phase") or {}).get("status")
+        return phase not in (None, "not_started")
+    except Exception as e:
+        logging.warning("⚠️  FB: não consegui conferir o vídeo %s: %s", video_id, e)
+        return False
+
+class _MultipartChunk:
     """
-    Fluxo recomendado:
-      1) POST /{ig-id}/media (media_type=REELS, video_url, caption)
-      2) GET  /{ig-id}/media_publish_status?creation_id=...
-      3) POST /{ig-id}/media_publish {creation_id}
-    Poll até FINISHED. 1 retry se ERROR/TIMEOUT.
+    Corpo multipart/form-data de UM pedaço do upload resumível: os campos e
+    o trecho [start, end) do arquivo como "video_file_chunk". O requests lê
+    em blocos (read) e o trecho sai do disco aos poucos, sem ficar inteiro
+    na memória; len/tell/seek dão o Content-Length e o rewind dos retries.
     """
-    ig_id = INSTAGRAM_ID
-    token = USER_ACCESS_TOKEN
-    if not (ig_id and token):
-        logging.error("❌ Faltam INSTAGRAM_ID/USER_ACCESS_TOKEN no .env")
-        return False
 
-    base = f"https://graph.facebook.com/v23.0/{ig_id}"
-    def _create() -> Optional[str]:
+    def __init__(self, f, start: int, end: int, fields: dict):
+        boundary = hashlib.sha1(os.urandom(16)).hexdigest()
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = "".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'
+                       for k, v in fields.items())
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="video_file_chunk"; '
+                 f'filename="chunk"\r\nContent-Type: application/octet-stream\r\n\r\n')
+        self._head = head.encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+        self._f, self._start, self._size = f, start, end - start
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return len(self._head) + self._size + len(self._tail)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        base = (0, self._pos, len(self))[whence]
+        self._pos = max(0, min(len(self), base + pos))
+        return self._pos
+
+    def read(self, n: int = -1) -> bytes:
+        left = len(self) - self._pos
+        n = left if n is None or n < 0 else min(n, left)
+        out = []
+        while n > 0:
+            head, size = len(self._head), self._size
+            if self._pos < head:
+                part = self._head[self._pos:self._pos + n]
+            elif self._pos < head + size:
+                self._f.seek(self._start + self._pos - head)
+                part = self._f.read(min(n, head + size - self._pos))
+                if not part:
+                    raise IOError("arquivo encolheu durante o upload")
+            else:
+                off = self._pos - head - size
+                part = self._tail[off:off + n]
+            out.append(part)
+            self._pos += len(part)
+            n -= len(part)
+        return b"".join(out)
+
+def fb_resumable_upload(file_path: str, description: str, _restarted: bool = False,
+                        post_id=None) -> Optional[str]:
+    """
+    Upload resumível da Graph API:
+      1) POST /{page}/videos upload_phase=start    (file_size) -> sessão + 1º intervalo
+      2) POST /{page}/videos upload_phase=transfer (start_offset + pedaço) até o fim
+      3) POST /{page}/videos upload_phase=finish   (description)
+    Cada pedaço vai do disco para o socket em blocos (_MultipartChunk). O
+    último offset confirmado fica salvo em OUT_DIR/FB_SESSIONS_FILE (chave =
+    post_id, se veio): falha no meio retoma dali, nunca do byte zero. finish
+    sem resposta fica marcado; na retomada o vídeo é conferido antes de
+    repetir o finish. Arquivo renderizado de novo = sessão nova.
+    Retorna o video_id ou None.
+    """
+    page_id = site_env("FACEBOOK_PAGE_ID")
+    token = site_env("USER_ACCESS_TOKEN")
+    url = f"{GRAPH_BASE}/{page_id}/videos"
+    auth = {"access_token": token}
+    st = os.stat(file_path)
+    key = _fb_session_key(file_path, post_id)
+
+    sess = _fb_session_get(key)
+    if sess and sess.get("finishing") and _fb_video_published(sess["video_id"]):
+        logging.info("📘 FB: vídeo %s já foi publicado (finish sem resposta) — não repito",
+                     sess["video_id"])
+        _fb_session_put(key, None)
+        return sess["video_id"]
+    if sess:
+        logging.info("📘 Retomando upload FB em %s/%s bytes", sess["start_offset"], st.st_size)
+    else:
         try:
-            payload = {
-                "media_type": "REELS",
-                "video_url": video_public_url,
-                "caption": caption[:2200],
-                "access_token": token,
-            }
-            r = http.post(f"{base}/media", data=payload, timeout=60)
+            r = graph_call("POST", page_id, url, params=auth, timeout=60,
+                           data={"upload_phase": "start", "file_size": st.st_size})
             r.raise_for_status()
-            return r.json().get("id")
+            js = r.json()
         except Exception as e:
             body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
-            logging.error("❌ IG /media falhou: %s | %s", e, body)
+            logging.error("❌ Facebook start falhou: %s | resp=%s", e, body)
             return None
+        sess = {
+            "upload_session_id": js.get("upload_session_id"),
+            "video_id": js.get("video_id"),
+            "start_offset": int(js.get("start_offset", 0)),
+            "end_offset": int(js.get("end_offset", 0)),
+            "file": os.path.abspath(file_path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+        _fb_session_put(key, sess)
 
-    def _poll(creation_id: str, max_wait=150) -> str:
-        t0 = time.time()
-        while time.time() - t0 < max_wait:
-            r = http.get(
-                f"{base}/media_publish_status",
-                params={"creation_id": creation_id, "access_token": token},
-                timeout=20
-            )
-            if r.status_code == 200:
+    failures = 0
+    with open(file_path, "rb") as f:
+        while sess["start_offset"] < sess["end_offset"]:
+            body = _MultipartChunk(f, sess["start_offset"], sess["end_offset"], {
+                "upload_phase": "transfer",
+                "upload_session_id": sess["upload_session_id"],
+                "start_offset": sess["start_offset"],
+            })
+            try:
+                r = graph_call("POST", page_id, url, params=auth, timeout=120, data=body,
+                               headers={"Content-Type": body.content_type})
+                r.raise_for_status()
                 js = r.json()
-                st = js.get("status", "")
-                if st in ("FINISHED", "ERROR"):
-                    logging.info("⏳ IG status: %s", st)
-                    return st
-                logging.info("⏳ IG status: %s", st or "IN_PROGRESS")
-            time.sleep(6)
-        return "TIMEOUT"
-
-    def _publish(creation_id: str) -> bool:
+            except GraphThrottled as e:
+                logging.warning("⚠️  FB: %s — retomo no próximo ciclo", e)
+                return None  # sessão fica salva
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status == 400 and not _restarted:
+                    # sessão expirada/inválida: começa uma nova (uma vez)
+                    logging.warning("⚠️  Sessão de upload FB inválida — recomeçando")
+                    _fb_session_put(key, None)
+                    return fb_resumable_upload(file_path, description, _restarted=True,
+                                               post_id=post_id)
+                failures += 1
+                stage_add(retries=1)
+                logging.warning("⚠️  FB pedaço @%s falhou (%s/%s): %s",
+                                sess["start_offset"], failures, CFG["FB_CHUNK_RETRIES"], e)
+                if failures >= CFG["FB_CHUNK_RETRIES"]:
+                    return None  # sessão fica salva p/ o próximo ciclo
+                time.sleep(min(30, 2 ** failures))
+                continue
+            failures = 0
+            stage_add(bytes=sess["end_offset"] - sess["start_offset"])
+            sess["start_offset"] = int(js.get("start_offset", sess["end_offset"]))
+            sess["end_offset"] = int(js.get("end_offset", sess["start_offset"]))
+            _fb_session_put(key, sess)
+
+    # finish publica: se a resposta se perder, a próxima tentativa confere antes
+    sess["finishing"] = True
+    _fb_session_put(key, sess)
+    try:
+        r = graph_call("POST", page_id, url, params=auth, timeout=120,
+                       data={
+                           "upload_phase": "finish",
+                           "upload_session_id": sess["upload_session_id"],
+                           "description": description[:2200],
+                       })
+        r.raise_for_status()
+        if not r.json().get("success"):
+            raise RuntimeError(f"finish sem success: {r.text[:200]}")
+    except Exception as e:
+        body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
+        logging.error("❌ Facebook finish falhou: %s | resp=%s", e, body)
+        if _fb_video_published(sess["video_id"]):
+            _fb_session_put(key, None)
+            return sess["video_id"]
+        return None
+    _fb_session_put(key, None)
+    return sess["video_id"]
+
+def publish_video_to_facebook(file_path: str, description: str, post_id=None) -> bool:
+    page_id = site_env("FACEBOOK_PAGE_ID")
+    token   = site_env("USER_ACCESS_TOKEN")
+    if not (page_id and token):
+        logging.error("❌ Faltam FACEBOOK_PAGE_ID/USER_ACCESS_TOKEN no .env")
+        return False
+
+    if CFG["FB_RESUMABLE"]:
+        vid = fb_resumable_upload(file_path, description, post_id=post_id)
+        if vid:
+            logging.info("📘 Publicado na Página (vídeo): id=%s", vid)
+        return bool(vid)
+
+    # POST único (legado): não há como conferir se publicou, então não repete
+    # aqui em falha ambígua; só graph_call reenvia quando a Graph recusou por limite
+    url = f"{GRAPH_BASE}/{page_id}/videos?access_token={token}"
+    try:
+        with open(file_path, "rb") as f:
+            r = graph_call("POST", page_id, url, data={"description": description[:2200]},
+                           files={"source": f}, timeout=600)
+        r.raise_for_status()
+        vid = r.json().get("id")
+        stage_add(bytes=os.path.getsize(file_path))
+        logging.info("📘 Publicado na Página (vídeo): id=%s", vid)
+        return True
+    except Exception as e:
+        body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
+        logging.error("❌ Facebook falhou: %s | resp=%s", e, body)
+        return False
+
+# ---------------------- INSTAGRAM REELS ---------------------
+def _ig_create(video_public_url: str, caption: str) -> Optional[str]:
+    try:
+        payload = {
+            "media_type": "REELS",
+            "video_url": video_public_url,
+            "caption": caption[:2200],
+            "access_token": site_env("USER_ACCESS_TOKEN"),
+        }
+        ig_id = site_env("INSTAGRAM_ID")
+        r = graph_call("POST", ig_id, f"{GRAPH_BASE}/{ig_id}/media", data=payload, timeout=60)
+        r.raise_for_status()
+        return r.json().get("id")
+    except Exception as e:
+        body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
+        logging.error("❌ IG /media falhou: %s | %s", e, body)
+        return None
+
+def _ig_create_resumable(caption: str) -> Optional[str]:
+    """Container REELS com upload_type=resumable (o vídeo vai depois, pelo rupload)."""
+    try:
+        payload = {
+            "media_type": "REELS",
+            "upload_type": "resumable",
+            "caption": caption[:2200],
+            "access_token": site_env("USER_ACCESS_TOKEN"),
+        }
+        ig_id = site_env("INSTAGRAM_ID")
+        r = graph_call("POST", ig_id, f"{GRAPH_BASE}/{ig_id}/media", data=payload, timeout=60)
+        r.raise_for_status()
+        return r.json().get("id")
+    except Exception as e:
+        body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
+        logging.error("❌ IG /media (resumable) falhou: %s | %s", e, body)
+        return None
+
+def _ig_rupload(creation_id: str, file_path: str) -> bool:
+    """
+    Manda o MP4 do disco direto para rupload.facebook.com (streaming do
+    arquivo, sem carregar na memória). Se cair no meio, pergunta o offset
+    já recebido e continua dali.
+    """
+    url = f"{RUPLOAD_BASE}/{creation_id}"
+    ig_id = site_env("INSTAGRAM_ID")
+    size = os.path.getsize(file_path)
+    auth = {"Authorization": f"OAuth {site_env('USER_ACCESS_TOKEN')}"}
+    offset = 0
+    for attempt in (1, 2, 3):
         try:
-            r = http.post(f"{base}/media_publish",
-                          data={"creation_id": creation_id, "access_token": token},
-                          timeout=60)
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                r = graph_call("POST", ig_id, url, data=f, timeout=600,
+                               headers={**auth, "offset": str(offset), "file_size": str(size)})
             r.raise_for_status()
-            logging.info("🎬 IG Reels publicado!")
             return True
         except Exception as e:
             body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
-            logging.error("❌ IG /media_publish falhou: %s | %s", e, body)
-            return False
+            logging.warning("⚠️  IG rupload falhou (tentativa %s): %s | %s", attempt, e, body)
+            try:
+                st = graph_call("GET", ig_id, url, headers=auth, timeout=30)
+                offset = int((st.json() or {}).get("offset", 0)) if st.ok else 0
+            except Exception:
+                offset = 0
+            time.sleep(3)
+    return False
+
+def _ig_publish(creation_id: str) -> bool:
+    try:
+        ig_id = site_env("INSTAGRAM_ID")
+        r = graph_call("POST", ig_id, f"{GRAPH_BASE}/{ig_id}/media_publish",
+                       data={"creation_id": creation_id, "access_token": site_env("USER_ACCESS_TOKEN")},
+                       timeout=60)
+        r.raise_for_status()
+        logging.info("🎬 IG Reels publicado!")
+        return True
+    except Exception as e:
+        body = getattr(e, "response", None).text if hasattr(e, "response") and e.response else ""
+        logging.error("❌ IG /media_publish falhou: %s | %s", e, body)
+        return False
+
+def _ig_statuses(creation_ids: list) -> dict:
+    """
+    Status de vários containers de uma vez: POST /?batch= (máx. 50 por
+    chamada). Se o batch falhar (ou estiver desligado), cai para GET um a um.
+    Retorna {creation_id: status} só com quem respondeu.
+    """
+    out = {}
+    token = site_env("USER_ACCESS_TOKEN")
+    ig_id = site_env("INSTAGRAM_ID")
+    if CFG["IG_BATCH_STATUS"] and len(creation_ids) > 1:
+        for i in range(0, len(creation_ids), 50):
+            group = creation_ids[i:i + 50]
+            batch = [{"method": "GET",
+                      "relative_url": f"{ig_id}/media_publish_status?creation_id={cid}"}
+                     for cid in group]
+            try:
+                r = graph_call("POST", ig_id, f"{GRAPH_BASE}/", timeout=30,
+                               data={"access_token": token, "batch": json.dumps(batch)})
+                r.raise_for_status()
+                for cid, item in zip(group, r.json()):
+                    if item and item.get("code") == 200:
+                        out[cid] = json.loads(item.get("body") or "{}").get("status", "")
+            except Exception as e:
+                logging.warning("⚠️  IG batch de status falhou: %s", e)
+    for cid in creation_ids:
+        if cid in out:
+            continue
+        try:
+            r = graph_call("GET", ig_id, f"{GRAPH_BASE}/{ig_id}/media_publish_status",
+                           params={"creation_id": cid, "access_token": token}, timeout=20)
+            if r.status_code == 200:
+                out[cid] = r.json().get("status", "")
+        except Exception as e:
+            logging.warning("⚠️  IG status %s falhou: %s", cid, e)
+    return out
+
+class IGPublisher:
+    """
+    Publicador de Reels em asyncio, num event loop em thread própria.
+    Cada reel cria o container assim que chega; UM agendador faz o poll de
+    todos os containers pendentes (em batch), com intervalo crescente por
+    container, e cada um é publicado assim que fica FINISHED — um container
+    lento não segura os outros.
+    Com `post` = (id, modified), o container criado vai para o ledger
+    ("ig_container") e é reaproveitado em qualquer nova tentativa do mesmo
+    post: um container só publica uma vez, e um já PUBLISHED conta como
+    sucesso. Assim um media_publish sem resposta não vira post duplicado.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._waiting = {}      # creation_id -> {"fut", "t0", "next", "delay"}
+        self._scheduler = None
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="ig-publisher",
+                                 daemon=True).start()
+
+    def submit(self, video_public_url: Optional[str], caption: str, file_path: Optional[str] = None,
+               post: Optional[tuple] = None):
+        """
+        Agenda a publicação; retorna concurrent.futures.Future[bool].
+        Com file_path (e sem URL) usa o upload resumable direto no IG.
+        """
+        self._ensure_loop()
+        rec = _stage_ctx.get()  # o loop roda em outra thread: leva a etapa junto
+        return asyncio.run_coroutine_threadsafe(
+            self._publish(video_public_url, caption, file_path, rec, post), self._loop)
+
+    async def _create(self, video_public_url: Optional[str], caption: str,
+                      file_path: Optional[str]) -> Optional[str]:
+        if video_public_url:
+            return await asyncio.to_thread(_ig_create, video_public_url, caption)
+        cid = await asyncio.to_thread(_ig_create_resumable, caption)
+        if cid and await asyncio.to_thread(_ig_rupload, cid, file_path):
+            return cid
+        return None
 
-    # tentativa 1
-    cid = _create()
-    if not cid:
+    async def _publish(self, video_public_url: Optional[str], caption: str,
+                       file_path: Optional[str] = None, rec: Optional[dict] = None,
+                       post: Optional[tuple] = None) -> bool:
+        ledger = get_ledger() if post else None
+        for attempt in (1, 2):
+            if attempt > 1:
+                stage_add(retries=1, rec=rec)
+            cid = ledger.value(*post, "ig_container") if ledger else None
+            if cid:
+                logging.info("♻️  IG: post %s reaproveita o container %s", post[0], cid)
+            else:
+                cid = await self._create(video_public_url, caption, file_path)
+                if not cid:
+                    return False
+                if ledger:
+                    await asyncio.to_thread(ledger.record, *post, "ig_container", True, cid)
+                if file_path and not video_public_url:
+                    stage_add(bytes=os.path.getsize(file_path), rec=rec)
+            st = await self._wait(cid)
+            if st == "PUBLISHED":
+                logging.info("🎬 IG: container %s já estava publicado — não publico de novo", cid)
+                return True
+            if st == "FINISHED":
+                return await asyncio.to_thread(_ig_publish, cid)
+            if ledger and st != "TIMEOUT":
+                # ERROR/EXPIRED: container morto, a próxima tentativa cria outro
+                await asyncio.to_thread(ledger.record, *post, "ig_container", False)
+            if attempt == 1:
+                logging.error("❌ IG status final inesperado: %s", st)
+                await asyncio.sleep(4)
+        logging.error("❌ IG retry: status final inesperado: %s", st)
         return False
-    st = _poll(cid)
-    if st == "FINISHED":
-        return _publish(cid)
-    logging.error("❌ IG status final inesperado: %s", st)
-
-    # retry único
-    time.sleep(4)
-    cid = _create()
-    if not cid:
+
+    async def _wait(self, creation_id: str) -> str:
+        now = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting[creation_id] = {"fut": fut, "t0": now, "site": _site_ctx.get(),
+                                      "next": now + CFG["IG_POLL_MIN"], "delay": CFG["IG_POLL_MIN"]}
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.create_task(self._poll_loop())
+        return await fut
+
+    async def _poll_loop(self):
+        while self._waiting:
+            now = time.monotonic()
+            due = [cid for cid, w in self._waiting.items() if w["next"] <= now]
+            if due:
+                # o batch vai com o token/conta de cada site
+                by_site, statuses = {}, {}
+                for cid in due:
+                    by_site.setdefault(self._waiting[cid]["site"], []).append(cid)
+                for site, cids in by_site.items():
+                    statuses.update(await asyncio.to_thread(call_in_site, site, _ig_statuses, cids))
+                now = time.monotonic()
+                for cid in due:
+                    w = self._waiting[cid]
+                    st = statuses.get(cid, "")
+                    if st in ("FINISHED", "PUBLISHED", "ERROR", "EXPIRED"):
+                        logging.info("⏳ IG status %s: %s", cid, st)
+                    elif now - w["t0"] >= CFG["IG_POLL_MAX_WAIT"]:
+                        st = "TIMEOUT"
+                    else:
+                        w["delay"] = min(w["delay"] * 1.5, CFG["IG_POLL_MAX"])
+                        w["next"] = now + w["delay"]
+                        continue
+                    del self._waiting[cid]
+                    w["fut"].set_result(st)
+                if len(due) > 1:
+                    logging.info("⏳ IG: %d container(s) checados, %d pendentes",
+                                 len(due), len(self._waiting))
+            if self._waiting:
+                nxt = min(w["next"] for w in self._waiting.values())
+                await asyncio.sleep(max(0.05, nxt - time.monotonic()))
+
+ig_publisher = IGPublisher()
+
+def ig_configured() -> bool:
+    return bool(site_env("INSTAGRAM_ID") and site_env("USER_ACCESS_TOKEN"))
+
+def publish_reel_to_ig(video_public_url: Optional[str], caption: str,
+                       file_path: Optional[str] = None, post: Optional[tuple] = None) -> bool:
+    """
+    Fluxo recomendado:
+      1) POST /{ig-id}/media (media_type=REELS, video_url, caption)
+         ou, sem URL pública: upload_type=resumable + bytes no rupload (file_path)
+      2) GET  /{ig-id}/media_publish_status?creation_id=...
+      3) POST /{ig-id}/media_publish {creation_id}
+    Poll até FINISHED (pelo agendador compartilhado do IGPublisher).
+    1 retry se ERROR/TIMEOUT. post = (id, modified) guarda o container no
+    ledger, para uma nova tentativa nunca publicar o mesmo post duas vezes.
+    """
+    if not ig_configured():
+        logging.error("❌ Faltam INSTAGRAM_ID/USER_ACCESS_TOKEN no .env")
         return False
-    st = _poll(cid)
-    if st == "FINISHED":
-        return _publish(cid)
-    logging.error("❌ IG retry: status final inesperado: %s", st)
-    return False
+    return ig_publisher.submit(video_public_url, caption, file_path, post).result()
 
 # ---------------------- CAPTION -----------------------------
 def build_caption(post: dict) -> str:
@@ -542,7 +2777,7 @@ def build_caption(post: dict) -> str:
     """
     title = html.unescape((post.get("title", {}) or {}).get("rendered", "")).strip()
     link  = post.get("link", "")
-    cap = f"{title}\n\nMais em: jornalvozdolitoral.com"
+    cap = f"{title}\n\n{CFG['CAPTION_FOOTER']}"
     if link:
         cap += f"\n{link}"
     return cap[:2200]
@@ -564,63 +2799,476 @@ def get_category_name_from_post(post: dict) -> str:
     return "NOTÍCIAS"
 
 # ---------------------- MAIN LOOP ---------------------------
-def process_once():
-    posts = wp_fetch_posts(CFG["WP_POSTS"])
-    for post in posts:
-        pid = post.get("id")
+class StagePools:
+    """
+    Um executor por etapa, criado só quando a etapa é usada:
+      - download: threads (I/O)
+      - render:   processos (gerar_arte), no máximo 1 por núcleo
+      - publish:  threads (FB/Cloudinary/IG)
+    O ffmpeg tem fila própria (EncoderService), com threads por job.
+    Cada post roda num coordenador próprio que encadeia as etapas; assim o
+    encode do post N+1 acontece enquanto o upload do post N está em curso.
+    Vive o processo inteiro (run_once/run_daemon): os workers de arte e os
+    caches deles (template, fontes, logo, canvas) valem para todos os ciclos.
+    """
+
+    def __init__(self):
+        cores = os.cpu_count() or 1
+        self.sizes = {
+            "download": max(1, CFG["POOL_DOWNLOAD"]),
+            "render": max(1, min(CFG["POOL_RENDER"] or cores, cores)),
+            "publish": max(1, CFG["POOL_PUBLISH"]),
+        }
+        self._pools: dict = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, stage: str):
+        with self._lock:
+            if stage not in self._pools:
+                if stage == "render":
+                    from concurrent.futures import ProcessPoolExecutor as kind
+                else:
+                    kind = ThreadPoolExecutor
+                self._pools[stage] = kind(max_workers=self.sizes[stage])
+            return self._pools[stage]
+
+    def submit(self, stage: str, fn, *args):
+        """Enfileira fn na etapa; retorna o Future."""
+        pool = self._pool(stage)
+        if isinstance(pool, ThreadPoolExecutor):
+            # leva a etapa corrente (métricas) para a thread do worker
+            return pool.submit(contextvars.copy_context().run, _unless_stopping, fn, *args)
+        # processo: contexto não atravessa; o site vai como argumento
+        try:
+            return pool.submit(call_in_site, _site_ctx.get(), fn, *args)
+        except BrokenExecutor:
+            # worker morreu (OOM, sinal): a pool vive entre ciclos, então recria
+            logging.warning("⚠️  Pool de %s quebrada — recriando os workers", stage)
+            with self._lock:
+                if self._pools.get(stage) is pool:
+                    del self._pools[stage]
+            pool.shutdown(wait=False)
+            return self._pool(stage).submit(call_in_site, _site_ctx.get(), fn, *args)
+
+    def run(self, stage: str, fn, *args):
+        """Executa fn na etapa e bloqueia o coordenador até o resultado."""
+        return self.submit(stage, fn, *args).result()
+
+    def shutdown(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=True)
+            self._pools.clear()
+
+def _unless_stopping(fn, *args):
+    """Job da fila: se o SIGTERM chegou enquanto esperava, nem começa (CancelledError)."""
+    if shutdown_requested.is_set():
+        raise CancelledError()
+    return fn(*args)
+
+def _stopping(pid, stage: str) -> bool:
+    """Encerrando (SIGTERM): etapa que ainda não começou fica para a próxima execução."""
+    if not shutdown_requested.is_set():
+        return False
+    logging.info("post %s: encerrando antes de %s — fica para a próxima execução", pid, stage)
+    return True
+
+def process_post(post: dict, pools: StagePools, run: RunMetrics):
+    ledger = get_ledger()
+    pid = post.get("id")
+    modified = post.get("modified_gmt") or post.get("modified") or ""
+    if ledger.all_done(pid, modified):
+        logging.info("post %s: já processado — pulando", pid)
+        return
+
+    # dados
+    raw_title = (post.get("title", {}) or {}).get("rendered", "")
+    titulo = html.unescape(raw_title).strip()
+    categoria = get_category_name_from_post(post)
+    caption = build_caption(post)
+
+    # Gera ARTE (reaproveita se já gerada para esta versão do post)
+    arte_path = ledger.value(pid, modified, "art")
+    video_path = ledger.value(pid, modified, "video")
+    frame = None
+    need_video = not (video_path and os.path.isfile(video_path))
+    if need_video and not (arte_path and os.path.isfile(arte_path)):
         img_url = wp_get_featured_image_url(post)
         if not img_url:
             logging.info("post %s: sem imagem — pulando", pid)
-            continue
+            return
 
         # baixa IMAGEM DESTACADA
-        bg = download_image(img_url)
+        if _stopping(pid, "download"):
+            return
+        bg = run.call(pid, "download", pools.run, "download", download_cover, img_url)
+        # falha conta para LEDGER_MAX_ATTEMPTS: imagem quebrada (404, grande
+        # demais, não decodifica) não segura a marca d'água para sempre
+        ledger.record(pid, modified, "download", bool(bg))
         if not bg:
             logging.info("post %s: falha ao baixar imagem — pulando", pid)
-            continue
+            return
 
-        # dados
-        raw_title = (post.get("title", {}) or {}).get("rendered", "")
-        titulo = html.unescape(raw_title).strip()
-        categoria = get_category_name_from_post(post)
-        caption = build_caption(post)
-
-        # Gera ARTE (sem alterar sua CFG)
-        arte_path = gerar_arte(bg, titulo, categoria, pid)
+        if _stopping(pid, "art"):
+            return
+        try:
+            arts = run.call(pid, "art", render_formats, partial(pools.submit, "render"),
+                            bg, titulo, categoria, pid)
+        except CancelledError:
+            raise
+        except Exception:
+            ledger.record(pid, modified, "art", False)
+            raise
+        arte_path = arts.pop("reel")
+        if isinstance(arte_path, RawFrame):
+            frame, arte_path = arte_path, arte_path.path
+        ledger.record(pid, modified, "art", True, arte_path)
+        for fmt, path in arts.items():
+            ledger.record(pid, modified, f"art_{fmt}", True, path)
 
-        # Gera VÍDEO
-        video_path = os.path.join(OUT_DIR, f"reel_{pid}.mp4")
-        okv = make_video_from_image(
+    # Gera VÍDEO
+    if need_video:
+        if _stopping(pid, "video"):
+            return
+        video_path = os.path.join(site_dir(), f"reel_{pid}.mp4")
+        okv = run.call(pid, "video", lambda: encoder.submit(
             arte_path,
             video_path,
             CFG["VIDEO_SECONDS"],
-            CFG.get("AUDIO_PATH")
-        )
+            CFG.get("AUDIO_PATH"),
+            frame,
+        ).result())["ok"]
+        frame = None  # ~6 MB: não segura durante o upload
+        ledger.record(pid, modified, "video", okv, video_path if okv else None)
         if not okv:
-            continue
+            return
+
+    # Facebook e Instagram sobem o MESMO arquivo: os uploads rodam juntos
+    if _stopping(pid, "publicar"):
+        return
+    fb_fut = None
+    if not (ledger.done(pid, modified, "fb") or ledger.gave_up(pid, modified, "fb")):
+        fb_fut = pools.submit("publish", run.call, pid, "fb",
+                              publish_video_to_facebook, video_path, caption, pid)
+    try:
+        publish_post_to_ig(pid, modified, video_path, caption, pools, run)
+    finally:
+        if fb_fut is not None:
+            ledger.record(pid, modified, "fb", fb_fut.result())
+            if ledger.gave_up(pid, modified, "fb"):
+                _fb_session_put(_fb_session_key(video_path, pid), None)
+
+def publish_post_to_ig(pid, modified, video_path: str, caption: str, pools: StagePools,
+                       run: RunMetrics):
+    ledger = get_ledger()
+    if ledger.done(pid, modified, "ig") or ledger.gave_up(pid, modified, "ig"):
+        return
+    resumable = CFG["IG_UPLOAD_MODE"] == "resumable"
+    if not ig_configured() or not (resumable or cloudinary_configured()):
+        # sem credenciais o IG nunca sai: marca como resolvido, senão o post
+        # fica pendente para sempre (marca d'água parada, arquivos retidos)
+        logging.warning("⚠️  IG sem %s — post %s fica sem Reels.",
+                        "INSTAGRAM_ID/USER_ACCESS_TOKEN" if not ig_configured() else "Cloudinary", pid)
+        ledger.record(pid, modified, "ig", True, "skipped")
+        return
+
+    # modo resumable: bytes direto no rupload do IG, sem Cloudinary
+    if resumable:
+        oki = run.call(pid, "ig", publish_reel_to_ig, None, caption, video_path, (pid, modified))
+        ledger.record(pid, modified, "ig", oki)
+        return
+
+    # modo cloudinary: precisa URL pública
+    video_url = ledger.value(pid, modified, "cloudinary")
+    if not video_url:
+        if ledger.gave_up(pid, modified, "cloudinary"):
+            return
+        video_url = run.call(pid, "cloudinary", pools.run, "publish", cloudinary_upload, video_path)
+        ledger.record(pid, modified, "cloudinary", bool(video_url), video_url)
+    if video_url:
+        # o IGPublisher tem loop próprio; não precisa ocupar um worker de publish
+        oki = run.call(pid, "ig", publish_reel_to_ig, video_url, caption, None, (pid, modified))
+        ledger.record(pid, modified, "ig", oki)
+
+def _post_modified(post: dict) -> str:
+    return post.get("modified_gmt") or post.get("modified") or ""
+
+def _fetch_site_posts(run: RunMetrics) -> list:
+    with run.stage(None, "wp_fetch"):
+        return wp_fetch_posts(CFG["WP_POSTS"])
 
-        # Publica no Facebook
-        publish_video_to_facebook(video_path, caption)
+def _pending_posts(posts: list) -> list:
+    ledger = get_ledger()
+    return [p for p in posts if not ledger.all_done(p.get("id"), _post_modified(p))]
 
-        # Publica no Instagram: precisa URL pública (Cloudinary)
-        video_url = cloudinary_upload(video_path)
-        if video_url:
-            publish_reel_to_ig(video_url, caption)
+def _advance_site(posts: list):
+    ledger = get_ledger()
+
+    def _resolved(post: dict) -> bool:
+        if not wp_get_featured_image_url(post):
+            return True
+        return ledger.all_done(post.get("id"), _post_modified(post))
+    wp_advance_high_water(posts, _resolved)
+
+def _finish_site(run: RunMetrics) -> Optional[dict]:
+    site = current_site()
+    try:
+        summary = run.finish()
+        logging.info("📊 Ciclo%s: %.1fs, %d posts — %s",
+                     f" [{site.name}]" if site else "", summary["seconds"], summary["posts"],
+                     ", ".join(f"{k} {v['seconds']:.1f}s" for k, v in summary["stages"].items()
+                               if v["count"]))
+        return summary
+    except OSError as e:
+        logging.warning("⚠️  Métricas não gravadas: %s", e)
+        return None
+
+_last_pending: set = set()  # (site, post, modified) pendentes no ciclo anterior
+
+def _count_new(order: list) -> int:
+    """
+    Quantos dos pendentes são posts (ou versões) que o ciclo anterior não
+    tinha: é a taxa de chegada do PollScheduler. Retry ou post preso não
+    conta de novo, senão um post travado segura o --daemon em POLL_MIN.
+    """
+    keys = {(site.name if site else None, post.get("id"), _post_modified(post))
+            for site, post in order}
+    new = len(keys - _last_pending)
+    _last_pending.clear()
+    _last_pending.update(keys)
+    return new
+
+def process_once(sites: Optional[list] = None, pools: Optional[StagePools] = None) -> int:
+    """
+    Um ciclo completo; retorna quantos posts novos (não vistos no ciclo
+    anterior) apareceram.
+    Com vários sites, todos dividem as mesmas pools (download/render/publish)
+    e o mesmo ffmpeg, e os posts entram nas filas em rodízio entre os sites.
+    `pools` vem do chamador e sobrevive ao ciclo; sem ela, o ciclo cria e
+    encerra a sua.
+    """
+    sites = sites or [None]  # None = site único da CFG/.env (modo antigo)
+    http0 = http.stats()
+    runs = {site: RunMetrics() for site in sites}
+    fetched, batches = [], []
+    try:
+        for site in sites:
+            try:
+                posts = call_in_site(site, _fetch_site_posts, runs[site])
+            except Exception as e:
+                if site is None:
+                    raise
+                logging.exception("❌ [%s] busca no WP falhou: %s", site.name, e)
+                continue
+            fetched.append((site, posts))
+            batches.append((site, call_in_site(site, _pending_posts, posts)))
+        order = fair_order(batches)
+        new_posts = _count_new(order)
+
+        if not order:
+            logging.info("💤 Nada novo no WP.")
         else:
-            logging.warning("⚠️  Sem Cloudinary configurado — não publiquei no IG.")
+            load_media_libs()
+        own_pools = pools is None
+        pools = pools or StagePools()
+        try:
+            # um coordenador (thread leve) por post; o limite real fica nas etapas
+            with ThreadPoolExecutor(max_workers=max(1, len(order))) as coord:
+                futs = {coord.submit(call_in_site, site, process_post, post, pools, runs[site]):
+                        (site, post.get("id")) for site, post in order}
+                for fut, (site, pid) in futs.items():
+                    try:
+                        fut.result()
+                    except CancelledError:
+                        logging.info("post %s%s: encerrando — fica para a próxima execução",
+                                     f"{site.name}/" if site else "", pid)
+                    except Exception as e:
+                        logging.exception("❌ post %s%s falhou: %s",
+                                          f"{site.name}/" if site else "", pid, e)
+        finally:
+            if own_pools:
+                pools.shutdown()
+
+        for site, posts in fetched:
+            call_in_site(site, _advance_site, posts)
+            call_in_site(site, enforce_retention)
+    finally:
+        summaries = {}
+        for site in sites:
+            summary = call_in_site(site, _finish_site, runs[site])
+            if summary is not None:
+                summaries[site] = summary
+        try:
+            write_prometheus(summaries)
+        except OSError as e:
+            logging.warning("⚠️  Textfile do Prometheus não gravado: %s", e)
 
+    # as Sessions são do processo (todos os sites): um resumo só por ciclo
+    reuse = [f"{name} {st['requests']} req/{st['connections']} conexões (reuso {st['reuse']:.0%})"
+             for name, st in http.stats(http0).items() if st["requests"] and st["reuse"] is not None]
+    if reuse:
+        logging.info("🔌 HTTP: %s", ", ".join(reuse))
     logging.info("⏳ Fim do ciclo.")
+    return new_posts
 
-def main():
-    logging.info("🚀 Auto Reels (WP→FB+IG) iniciado")
-    while True:
-        try:
-            process_once()
-        except KeyboardInterrupt:
-            raise
-        except Exception as e:
-            logging.exception("❌ Erro no ciclo: %s", e)
-        time.sleep(CFG["SLEEP_BETWEEN"])
+# ------------------------ EXECUÇÃO --------------------------
+shutdown_requested = threading.Event()  # SIGTERM/SIGINT: drena e sai
+wake_requested = threading.Event()      # webhook: busca agora
+
+def _on_signal(signum, frame):
+    if shutdown_requested.is_set():
+        # segundo sinal: sai na hora. Um KeyboardInterrupt ficaria preso nos
+        # shutdown(wait=True) das pools/ffmpeg; o ledger e os JSON de estado
+        # são gravados de forma atômica, então cortar aqui não os corrompe
+        logging.warning("🛑 Sinal %s de novo: saindo sem esperar", signum)
+        import multiprocessing
+        for child in multiprocessing.active_children():  # workers de arte
+            child.kill()
+        encoder.kill()
+        logging.shutdown()
+        os._exit(128 + signum)
+    logging.info("🛑 Sinal %s: terminando as etapas em andamento e saindo...", signum)
+    shutdown_requested.set()
+    wake_requested.set()
+
+def install_signal_handlers():
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, _on_signal)
+
+class PollScheduler:
+    """
+    Intervalo do --daemon guiado pela taxa de posts: média móvel (EWMA) de
+    posts novos por segundo; espera o tempo em que se esperam
+    POLL_TARGET_POSTS posts, limitado a [POLL_MIN, POLL_MAX]. Rajada de
+    notícias -> intervalo curto; site parado -> vai dobrando até o máximo.
+    """
+
+    ALPHA = 0.4
+
+    def __init__(self):
+        self.interval = float(CFG["SLEEP_BETWEEN"])
+        self.rate = None  # posts/s
+
+    def update(self, new_posts: int, elapsed: float) -> float:
+        elapsed = max(elapsed, 1.0)
+        sample = new_posts / elapsed
+        self.rate = sample if self.rate is None else self.ALPHA * sample + (1 - self.ALPHA) * self.rate
+        if self.rate > 0:
+            wanted = CFG["POLL_TARGET_POSTS"] / self.rate
+        else:
+            wanted = self.interval * 2
+        # não salta mais que 2x por ciclo (evita oscilar)
+        wanted = min(wanted, self.interval * 2)
+        self.interval = float(min(CFG["POLL_MAX"], max(CFG["POLL_MIN"], wanted)))
+        return self.interval
+
+def start_webhook_listener(host: str, port: int):
+    """
+    POST de qualquer caminho acorda o --daemon (ex.: WP Webhooks em
+    "post publicado"). Com WEBHOOK_SECRET, exige o header X-Webhook-Secret
+    ou ?secret= igual. O corpo é ignorado: a busca no WP é que manda.
+    """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(min(length, 1024 * 1024))
+            given = self.headers.get("X-Webhook-Secret", "")
+            if not given and "secret=" in self.path:
+                given = self.path.split("secret=", 1)[1].split("&", 1)[0]
+            if WEBHOOK_SECRET and not hmac.compare_digest(given, WEBHOOK_SECRET):
+                self.send_response(403)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            logging.info("🔔 Webhook recebido: buscando posts agora")
+            wake_requested.set()
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="webhook", daemon=True).start()
+    logging.info("🔔 Webhook escutando em http://%s:%d/", host, server.server_address[1])
+    return server
+
+def run_daemon(sites: Optional[list] = None):
+    sched = PollScheduler()
+    server = None
+    if CFG["WEBHOOK_PORT"]:
+        server = start_webhook_listener(CFG["WEBHOOK_HOST"], CFG["WEBHOOK_PORT"])
+    # 1º ciclo conta como um intervalo inicial inteiro (não trata o acumulado como rajada)
+    last = time.monotonic() - CFG["SLEEP_BETWEEN"]
+    pools = StagePools()
+    try:
+        while not shutdown_requested.is_set():
+            wake_requested.clear()
+            started = time.monotonic()
+            try:
+                new_posts = process_once(sites, pools)
+            except Exception as e:
+                logging.exception("❌ Erro no ciclo: %s", e)
+                new_posts = 0
+            interval = sched.update(new_posts, started - last)
+            last = started
+            if shutdown_requested.is_set():
+                break
+            logging.info("💤 Próxima busca em %.0fs (%d novo(s) neste ciclo)", interval, new_posts)
+            wake_requested.wait(interval)
+    finally:
+        if server is not None:
+            server.shutdown()
+        pools.shutdown()
+        encoder.shutdown()
+        logging.info("👋 Encerrado.")
+
+def run_once(sites: Optional[list] = None) -> int:
+    pools = StagePools()
+    try:
+        process_once(sites, pools)
+        return 0
+    except Exception as e:
+        logging.exception("❌ Erro no ciclo: %s", e)
+        return 1
+    finally:
+        pools.shutdown()
+        encoder.shutdown()
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Auto Reels (WP→FB+IG)")
+    ap.add_argument("--quality-profile", choices=sorted(QUALITY_PROFILES),
+                    default=CFG["QUALITY_PROFILE"],
+                    help="filtro do resize da capa (padrão: %(default)s)")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--once", action="store_true",
+                      help="roda um ciclo e sai (cron / GitHub Actions)")
+    mode.add_argument("--daemon", action="store_true",
+                      help="fica rodando, com intervalo adaptativo (padrão)")
+    ap.add_argument("--webhook-port", type=int, default=CFG["WEBHOOK_PORT"],
+                    help="porta do webhook do WP no --daemon (0 = desligado)")
+    ap.add_argument("--sites", metavar="ARQUIVO",
+                    help="TOML/YAML com vários sites/marcas (um processo p/ todos)")
+    return ap.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    CFG["QUALITY_PROFILE"] = args.quality_profile
+    CFG["WEBHOOK_PORT"] = args.webhook_port
+    sites = load_sites(args.sites) if args.sites else None
+    install_signal_handlers()
+    logging.info("🚀 Auto Reels (WP→FB+IG) iniciado (%s%s)", "once" if args.once else "daemon",
+                 f", sites: {', '.join(s.name for s in sites)}" if sites else "")
+    if args.once:
+        return run_once(sites)
+    run_daemon(sites)
+    return 0
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
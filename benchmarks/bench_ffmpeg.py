@@ -0,0 +1,70 @@
+# benchmarks/bench_ffmpeg.py
+# -*- coding: utf-8 -*-
+"""
+Compara o encode legado (preset medium, scale/pad sempre, AAC por reel)
+com o modo rápido para imagem parada (VIDEO_FAST), lendo a arte em JPEG, e
+com o rápido recebendo o frame RGB cru no stdin (VIDEO_INPUT="raw").
+
+    python benchmarks/bench_ffmpeg.py --runs 3
+"""
+
+import os, sys, time, argparse, tempfile, subprocess, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # fontes/logo/áudio são caminhos relativos na CFG
+
+import auto_reels_wp_publish as arp
+from PIL import Image
+
+
+def sample_art(out_dir: str) -> arp.RawFrame:
+    """Arte de exemplo: frame cru + o JPEG da mesma arte."""
+    arp.CFG["ART_REEL_JPEG"] = True
+    bg = Image.effect_mandelbrot((1600, 1000), (-2.0, -1.2, 1.0, 1.2), 120).convert("RGB")
+    return arp.gerar_arte(bg, "Prefeitura anuncia novas obras no litoral norte", "Cidades", "bench",
+                          raw=True)
+
+
+def run(cmd: list, data: bytes = None) -> float:
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True, input=data, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--seconds", type=int, default=arp.CFG["VIDEO_SECONDS"])
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arp.OUT_DIR = tmp
+        frame = sample_art(tmp)
+        art = frame.path
+        canvas = Image.frombytes("RGB", frame.size, frame.data)
+        t0 = time.perf_counter()
+        arp.save_jpeg(canvas, os.path.join(tmp, "jpeg_bench.jpg"))
+        jpeg_save = time.perf_counter() - t0
+        audio = arp.CFG.get("AUDIO_PATH")
+
+        # 1ª chamada do modo rápido paga a conversão do áudio (cache frio)
+        t0 = time.perf_counter()
+        arp.cached_audio_aac(audio, args.seconds)
+        audio_cold = time.perf_counter() - t0
+
+        print(f"{'modo':<8} {'mediana (s)':>12} {'min (s)':>9} {'tamanho (KB)':>13}")
+        for name, fast, raw in (("legado", False, False), ("rapido", True, False),
+                                ("raw", True, True)):
+            out = os.path.join(tmp, f"{name}.mp4")
+            cmd = arp.build_ffmpeg_cmd(None if raw else art, out, args.seconds, audio, fast=fast,
+                                       frame_size=frame.size if raw else None)
+            times = [run(cmd, frame.data if raw else None) for _ in range(args.runs)]
+            size_kb = os.path.getsize(out) / 1024
+            print(f"{name:<8} {statistics.median(times):>12.2f} {min(times):>9.2f} {size_kb:>13.0f}")
+        print(f"(conversão única do áudio p/ AAC: {audio_cold:.2f} s; "
+              f"salvar a arte em JPEG, que o modo raw não faz: {jpeg_save * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_import.py
+# -*- coding: utf-8 -*-
+"""
+Tempo de importação e custo de um --once "sem nada novo".
+
+1) `python -X importtime -c "import auto_reels_wp_publish"` (melhor de N):
+   tempo total e os maiores módulos importados na hora.
+2) `auto_reels_wp_publish.py --once` contra um WP local que não tem post
+   novo: tempo de parede, nº de requisições e se PIL/asyncio chegaram a
+   carregar (não deveriam).
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --max-ms 80   # CI: sai com 1 se passar
+"""
+
+import os, sys, json, time, argparse, tempfile, threading, subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "auto_reels_wp_publish.py")
+
+# módulos que um ciclo sem post novo não deve carregar
+HEAVY = ("PIL._imaging", "asyncio.base_events", "cloudinary", "http.server")
+
+
+def parse_importtime(stderr: str) -> list:
+    """Linhas do -X importtime -> [(módulo, self_us, cumulativo_us, nível)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cum_us, name = int(parts[0]), int(parts[1]), parts[2]
+        level = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), self_us, cum_us, level))
+    return rows
+
+
+def measure_import(repeat: int) -> tuple:
+    """Melhor de `repeat`: (total_ms, linhas da melhor rodada)."""
+    best = None
+    for _ in range(repeat):
+        r = subprocess.run([sys.executable, "-X", "importtime", "-c", "import auto_reels_wp_publish"],
+                           cwd=tempfile.gettempdir(), capture_output=True, text=True,
+                           env={**os.environ, "PYTHONPATH": ROOT})
+        rows = parse_importtime(r.stderr)
+        # a saída é pós-ordem: a subárvore do módulo vem logo antes da linha dele
+        end = max(i for i, row in enumerate(rows) if row[0] == "auto_reels_wp_publish")
+        start = end
+        while start > 0 and rows[start - 1][3] > 0:
+            start -= 1
+        total = rows[end][2]
+        if best is None or total < best[0]:
+            best = (total, rows[start:end + 1])
+    return best[0] / 1000, best[1]
+
+
+class _EmptyWP:
+    """WP local sem post novo: conta as requisições recebidas."""
+
+    def __init__(self):
+        self.requests = []
+        outer = self
+
+        class H(BaseHTTPRequestHandler):
+            def do_GET(self):
+                outer.requests.append(self.path)
+                body = b"[]"
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), H)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+
+def measure_idle_once() -> dict:
+    wp = _EmptyWP()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "WP_URL": wp.url}
+        t0 = time.perf_counter()
+        r = subprocess.run([sys.executable, "-X", "importtime", SCRIPT, "--once"],
+                           cwd=tmp, capture_output=True, text=True, env=env)
+        wall = time.perf_counter() - t0
+    wp.server.shutdown()
+    loaded = {name for name, *_ in parse_importtime(r.stderr)}
+    return {"rc": r.returncode, "wall_ms": wall * 1000, "wp_requests": len(wp.requests),
+            "heavy_loaded": [m for m in HEAVY if m in loaded]}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tempo de importação / --once ocioso")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--max-ms", type=float, default=0.0,
+                    help="falha (código 1) se a importação passar disso; 0 = não checa")
+    ap.add_argument("--json", action="store_true", help="saída em JSON")
+    args = ap.parse_args(argv)
+
+    total_ms, rows = measure_import(args.repeat)
+    idle = measure_idle_once()
+    direct = sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])[:args.top]
+
+    if args.json:
+        print(json.dumps({"import_ms": total_ms, "top": [(n, c / 1000) for n, _, c, _ in direct],
+                          "idle_once": idle}, indent=2))
+    else:
+        print(f"import auto_reels_wp_publish: {total_ms:.1f} ms (melhor de {args.repeat})")
+        for name, _, cum, _ in direct:
+            print(f"  {name:<32} {cum / 1000:>8.1f} ms")
+        print(f"--once sem post novo: {idle['wall_ms']:.0f} ms, rc={idle['rc']}, "
+              f"{idle['wp_requests']} requisição(ões) ao WP, "
+              f"pesados carregados: {', '.join(idle['heavy_loaded']) or 'nenhum'}")
+
+    failed = idle["rc"] != 0 or idle["heavy_loaded"] or idle["wp_requests"] != 1
+    if args.max_ms and total_ms > args.max_ms:
+        print(f"REGRESSÃO: importação {total_ms:.1f} ms > {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
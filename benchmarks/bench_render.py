@@ -0,0 +1,293 @@
+# benchmarks/bench_render.py
+# -*- coding: utf-8 -*-
+"""
+Benchmarks offline de imagem/arte/vídeo com as fontes, logo e áudio do repo.
+
+Mede separadamente download_image (servidor HTTP local), download_cover
+(revalidação 304), cover_resize, text_box_size, layout_title (auto-shrink),
+gerar_arte (canvas reaproveitado x cópia da base), draw_rounded_rect e
+make_video_from_image, com imagens sintéticas de vários tamanhos/proporções
+e títulos curtos e longos. Cada benchmark roda num processo próprio para
+medir o pico de memória (RSS) dele; "imagens"/"aloc" = imagens PIL criadas
+por chamada e os bytes de pixel alocados para elas.
+
+    python benchmarks/bench_render.py                         # tabela
+    python benchmarks/bench_render.py --save baseline.json    # grava referência
+    python benchmarks/bench_render.py --check baseline.json --tolerance 0.25
+        # CI: sai com código 1 se alguma mediana piorar mais que 25%
+"""
+
+import os, io, sys, json, time, shutil, argparse, resource, tempfile, statistics, threading
+import multiprocessing as mp
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # fontes/logo/áudio são caminhos relativos na CFG
+
+import auto_reels_wp_publish as arp
+from PIL import Image, ImageDraw, ImageFile
+
+# (largura, altura): paisagem, retrato, quadrada e "câmera" grande
+IMAGE_SIZES = [(800, 600), (1600, 900), (1080, 1920), (3000, 3000), (4000, 3000)]
+
+TITLES = {
+    "curto": "Chuva forte alaga ruas de Ubatuba",
+    "longo": ("Você não vai acreditar no que aconteceu na praia de Caraguatatuba neste "
+              "domingo: moradores se reúnem, prefeitura anuncia medidas emergenciais e "
+              "especialistas alertam para os próximos dias de maré alta no litoral norte"),
+}
+
+
+# ---------------------------------------------------------------- insumos
+def synthetic_jpeg(w: int, h: int) -> bytes:
+    """Gradiente + ruído: comprime parecido com foto (JPEG não fica trivial)."""
+    base = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    noise = Image.effect_noise((w, h), 48).convert("RGB")
+    img = Image.blend(base, noise, 0.35)
+    ImageDraw.Draw(img).ellipse((w // 4, h // 4, w * 3 // 4, h * 3 // 4), fill=(200, 60, 40))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=88)
+    return buf.getvalue()
+
+
+class _ImageServer:
+    """Servidor HTTP local com as imagens sintéticas (ETag fixo p/ 304)."""
+
+    def __init__(self, files: dict):
+        files = dict(files)
+
+        class H(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = files.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = f'"{len(body)}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), H)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+
+# ------------------------------------------------------------- benchmarks
+def build_benchmarks(server: _ImageServer, images: dict, tmp: str) -> dict:
+    """nome -> (função sem argumentos, nº de itens por chamada)."""
+    W, IMG_H = arp.CFG["W"], arp.CFG["IMG_HEIGHT"]
+    decoded = {k: Image.open(io.BytesIO(v)).convert("RGB") for k, v in images.items()}
+    benches = {}
+
+    for (w, h) in IMAGE_SIZES:
+        tag = f"{w}x{h}"
+        url = f"{server.base}/{tag}.jpg"
+        benches[f"download_image[{tag}]"] = (lambda url=url: arp.download_image(url), 1)
+        benches[f"download_cover_304[{tag}]"] = (lambda url=url: arp.download_cover(url), 1)
+        src = decoded[f"/{tag}.jpg"]
+        benches[f"cover_resize[{tag}]"] = (lambda src=src: arp.cover_resize(src, W, IMG_H), 1)
+
+    font = arp.get_template().font_title
+    draw = ImageDraw.Draw(Image.new("RGB", (10, 10)))
+    max_w = (W - 2 * arp.CFG["TITLE_BOX_MARGIN_X"]) - 40
+    bg = decoded["/1600x900.jpg"]
+    for name, title in TITLES.items():
+        benches[f"text_box_size[{name}]"] = (
+            lambda title=title: arp.text_box_size(draw, title, font, max_w), 1)
+        benches[f"layout_title_shrink[{name}]"] = (
+            lambda title=title: _layout_shrink(title, max_w), 1)
+        benches[f"gerar_arte[{name}]"] = (
+            lambda title=title: arp.gerar_arte(bg, title, "Cidades", "bench"), 1)
+        benches[f"gerar_arte_copia[{name}]"] = (
+            lambda title=title: _without_canvas_reuse(arp.gerar_arte, bg, title, "Cidades", "bench"), 1)
+    benches["draw_rounded_rect"] = (
+        lambda canvas=Image.new("RGB", (W, arp.CFG["H"])): arp.draw_rounded_rect(
+            canvas, (60, 1240, W - 60, 1500), arp.CFG["TITLE_BOX_RADIUS"], (255, 255, 255)), 1)
+
+    if shutil.which(arp.CFG["FFMPEG_BIN"]):
+        art = arp.gerar_arte(bg, TITLES["curto"], "Cidades", "bench_video")
+        out = os.path.join(tmp, "bench.mp4")
+        benches["make_video_from_image"] = (
+            lambda: arp.make_video_from_image(art, out, arp.CFG["VIDEO_SECONDS"],
+                                              arp.CFG.get("AUDIO_PATH")), 1)
+    return benches
+
+
+def _layout_shrink(title: str, max_w: int):
+    """layout_title com auto-shrink ligado, a frio (sem larguras memoizadas)."""
+    arp._measurers.clear()
+    old = arp.CFG["TITLE_AUTO_SHRINK"]
+    arp.CFG["TITLE_AUTO_SHRINK"] = True
+    try:
+        tpl = arp.get_template()
+        return arp.layout_title(title, tpl.title_font, arp.CFG["TITLE_FONT_SIZE"],
+                                max_w, arp.CFG["TITLE_BOX_H"])
+    finally:
+        arp.CFG["TITLE_AUTO_SHRINK"] = old
+
+
+def _without_canvas_reuse(fn, *args):
+    """Caminho antigo: cópia da base inteira a cada arte (ART_REUSE_CANVAS=False)."""
+    arp.CFG["ART_REUSE_CANVAS"] = False
+    try:
+        return fn(*args)
+    finally:
+        arp.CFG["ART_REUSE_CANVAS"] = True
+
+
+class _ImageCounter:
+    """Conta imagens PIL criadas (e decodificadas) e os bytes de pixel alocados."""
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self._orig = Image.Image._new
+        self._orig_load = ImageFile.ImageFile.load
+
+    def _add(self, size: tuple, mode: str):
+        self.count += 1
+        self.bytes += size[0] * size[1] * Image.getmodebands(mode)
+
+    def __enter__(self):
+        counter, orig, orig_load = self, self._orig, self._orig_load
+
+        def _new(img, im):
+            counter._add(im.size, im.mode)
+            return orig(img, im)
+
+        def load(img):
+            # o decoder aloca o buffer direto no core, sem passar por _new
+            pending = bool(img.tile)
+            px = orig_load(img)
+            if pending:
+                counter._add(img.size, img.mode)
+            return px
+        Image.Image._new = _new
+        ImageFile.ImageFile.load = load
+        return self
+
+    def __exit__(self, *exc):
+        Image.Image._new = self._orig
+        ImageFile.ImageFile.load = self._orig_load
+
+
+def _child(name: str, fn, items: int, repeat: int, conn):
+    """Roda num processo filho: aquece, mede e devolve tempos + pico de RSS."""
+    try:
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        fn()  # aquecimento (fontes, cache de template, cache de capa...)
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with _ImageCounter() as images:  # fora da medição de tempo
+            fn()
+        conn.send({"name": name, "times": times, "items": items, "images": images.count,
+                   "alloc_mb": images.bytes / 1e6,
+                   "peak_rss_mb": rss1 / 1024, "rss_growth_mb": (rss1 - rss0) / 1024})
+    except Exception as e:  # o relatório mostra o erro em vez de derrubar tudo
+        conn.send({"name": name, "error": repr(e)})
+    finally:
+        conn.close()
+
+
+def run_all(repeat: int, only: str = "") -> list:
+    ctx = mp.get_context("fork")  # filhos herdam servidor, imagens e módulo já importado
+    images = {f"/{w}x{h}.jpg": synthetic_jpeg(w, h) for (w, h) in IMAGE_SIZES}
+    server = _ImageServer(images)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        arp.OUT_DIR = tmp
+        arp.cover_cache = arp.CoverCache(os.path.join(tmp, "cover_cache"),
+                                         arp.CFG["COVER_CACHE_MAX_BYTES"])
+        benches = build_benchmarks(server, images, tmp)
+        for name, (fn, items) in benches.items():
+            if only and only not in name:
+                continue
+            parent, child = ctx.Pipe(duplex=False)
+            p = ctx.Process(target=_child, args=(name, fn, items, repeat, child))
+            p.start()
+            child.close()
+            res = parent.recv()
+            p.join()
+            if "times" in res:
+                med = statistics.median(res["times"])
+                res["median_s"] = med
+                res["per_s"] = res["items"] / med if med > 0 else float("inf")
+            results.append(res)
+    server.server.shutdown()
+    if not shutil.which(arp.CFG["FFMPEG_BIN"]):
+        results.append({"name": "make_video_from_image", "error": "ffmpeg não encontrado (pulado)"})
+    return results
+
+
+def print_table(results: list):
+    print(f"{'benchmark':<34} {'mediana (ms)':>13} {'ops/s':>9} {'imagens':>8} {'aloc (MB)':>10} "
+          f"{'pico RSS (MB)':>14} {'+RSS (MB)':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['name']:<34} {'—':>13}   {r['error']}")
+            continue
+        print(f"{r['name']:<34} {r['median_s'] * 1000:>13.1f} {r['per_s']:>9.1f} "
+              f"{r.get('images', 0):>8} {r.get('alloc_mb', 0):>10.1f} {r['peak_rss_mb']:>14.1f} {r['rss_growth_mb']:>10.1f}")
+
+
+def check(results: list, baseline_path: str, tolerance: float) -> int:
+    """Compara medianas com a referência; retorna 1 se algo piorou além da tolerância."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {r["name"]: r for r in json.load(f)}
+    failed = 0
+    for r in results:
+        ref = base.get(r["name"])
+        if "median_s" not in r or not ref or "median_s" not in ref:
+            continue
+        ratio = r["median_s"] / ref["median_s"] if ref["median_s"] else 1.0
+        if ratio > 1.0 + tolerance:
+            failed += 1
+            print(f"REGRESSÃO {r['name']}: {ref['median_s'] * 1000:.1f} ms -> "
+                  f"{r['median_s'] * 1000:.1f} ms ({ratio:.2f}x)")
+    print("OK: nenhuma regressão acima de %.0f%%" % (tolerance * 100) if not failed
+          else f"{failed} regressão(ões) acima de {tolerance * 100:.0f}%")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks de arte/vídeo (offline)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", default="", help="só benchmarks cujo nome contém este texto")
+    ap.add_argument("--save", metavar="JSON", help="grava os resultados (referência)")
+    ap.add_argument("--check", metavar="JSON", help="compara com uma referência gravada")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="piora máxima aceita no --check (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+
+    results = run_all(args.repeat, args.only)
+    print_table(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.check:
+        sys.exit(check(results, args.check, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
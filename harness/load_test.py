@@ -0,0 +1,584 @@
+# harness/load_test.py
+# -*- coding: utf-8 -*-
+"""
+Carga ponta a ponta, offline: roda o process_once de verdade (download,
+arte, ffmpeg, FB, Cloudinary, IG) contra servidores falsos locais e mede
+posts/min, a distribuição de latência por etapa e o pico de memória.
+
+Stubs (num processo à parte, para não dividir GIL/memória com o pipeline):
+  - WP REST: GET /wp-json/wp/v2/posts (_embed, per_page, modified_after,
+    exclude, orderby/order, ETag/If-None-Match), com `--posts` posts chegando de uma vez (rajada)
+    ou espalhados por `--spread` s
+  - CDN: GET /img/{id}.jpg (imagem destacada, ETag)
+  - Cloudinary: POST /v1_1/{cloud}/video/upload (upload_large do SDK, em
+    pedaços com Content-Range + X-Unique-Upload-Id)
+  - Graph: o GraphStub de stub_graph.py (/videos, /media,
+    /media_publish_status, /media_publish, batch, rupload)
+Cada um com latência fixa e taxa de falha (503) próprias.
+
+Os ciclos rodam em seguida, sem o intervalo do --daemon (só esperam quando
+não há nada pendente e ainda faltam posts chegar): mede o pipeline, não o
+agendador. Precisa do ffmpeg (--ffmpeg) e, no modo cloudinary, do SDK.
+
+    python harness/load_test.py --posts 50                      # rajada de 50
+    python harness/load_test.py --posts 20 --cdn-latency 0.3 --cdn-fail 0.1
+    python harness/load_test.py --posts 30 --ig-mode resumable --set GRAPH_RATE_PER_MIN=600
+    python harness/load_test.py --posts 10 --spread 60 --json
+"""
+
+import os, sys, io, json, time, random, hashlib, logging, argparse, resource, tempfile, threading
+import multiprocessing as mp
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from stub_graph import GraphStub, _parse_form, _setup_module, _text
+
+TITLES = (
+    "Prefeitura anuncia novas obras no litoral norte",
+    "Polícia prende suspeito de furtos em série no centro da cidade após perseguição",
+    "Chuva forte alaga ruas e deixa bairros sem energia",
+    "Time local vence clássico e assume a liderança do campeonato estadual",
+    "Vacinação é ampliada para novas faixas etárias",
+)
+CATEGORIES = ("Cidades", "Polícia", "Clima", "Esportes", "Saúde")
+FIRST_POST = datetime(2026, 1, 1, 10, 0, 0)  # modified do 1º post; o i-ésimo vem i s depois
+
+
+class _HTTPStub:
+    """Servidor falso em thread própria: latência fixa, falha injetada (503) e contagem."""
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.server = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.fail_rate
+
+    def handle(self, method: str, path: str, query: dict, headers, body: bytes) -> tuple:
+        """-> (status, headers, corpo). Cada stub responde as suas rotas; aqui, nenhuma."""
+        return _json(404, {"error": "not found"})
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls)}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method: str):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                u = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(u.query).items()}
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if stub.should_fail():
+                    stub.count("failed")
+                    status, headers, out = 503, {"Content-Type": "application/json"}, \
+                        b'{"error": {"message": "simulated failure"}}'
+                else:
+                    status, headers, out = stub.handle(method, u.path, query, self.headers, body)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _json(status: int, payload) -> tuple:
+    return status, {"Content-Type": "application/json"}, json.dumps(payload).encode("utf-8")
+
+
+class WPStub(_HTTPStub):
+    """
+    WP REST falso: `posts` posts com imagem destacada no CDN. O post i fica
+    visível em i * spread / posts segundos depois do go() (0 = todos juntos).
+    """
+
+    def __init__(self, posts: int, cdn_url: str, spread: float = 0.0, **kw):
+        super().__init__(**kw)
+        self.spread = spread
+        self.posts = []
+        for i in range(posts):
+            ts = (FIRST_POST + timedelta(seconds=i)).isoformat()
+            self.posts.append({
+                "id": i + 1, "date_gmt": ts, "modified": ts, "modified_gmt": ts,
+                "title": {"rendered": f"{TITLES[i % len(TITLES)]} ({i + 1})"},
+                "link": f"{cdn_url}/noticia/{i + 1}",
+                "_embedded": {
+                    "wp:featuredmedia": [{"source_url": f"{cdn_url}/img/{i + 1}.jpg"}],
+                    "wp:term": [[{"taxonomy": "category", "name": CATEGORIES[i % len(CATEGORIES)]}]],
+                },
+            })
+        self.t0 = time.monotonic()
+
+    def go(self):
+        self.t0 = time.monotonic()
+
+    def arrival(self, i: int) -> float:
+        """Segundos após o go() em que o post de índice i aparece."""
+        return i * self.spread / max(1, len(self.posts))
+
+    def handle(self, method, path, query, headers, body):
+        if method != "GET" or path.rstrip("/") != "/wp-json/wp/v2/posts":
+            return _json(404, {"code": "rest_no_route"})
+        self.count("posts")
+        now = time.monotonic() - self.t0
+        after = query.get("modified_after") or ""
+        exclude = set((query.get("exclude") or "").split(","))
+        per_page = max(1, min(100, int(query.get("per_page") or 10)))
+        visible = [p for i, p in enumerate(self.posts) if self.arrival(i) <= now
+                   and p["modified"] > after and str(p["id"]) not in exclude]
+        key = "modified" if query.get("orderby") == "modified" else "date_gmt"
+        # empate no mesmo segundo: desempata pelo id
+        visible.sort(key=lambda p: (p[key], p["id"]), reverse=query.get("order", "desc") != "asc")
+        out = json.dumps(visible[:per_page], ensure_ascii=False).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(out).hexdigest()[:16]
+        if headers.get("If-None-Match") == etag:
+            self.count("posts:304")
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": "application/json", "ETag": etag}, out
+
+
+class CdnStub(_HTTPStub):
+    """Imagens destacadas: GET /img/{id}.jpg (uma de `variants` imagens, por id)."""
+
+    def __init__(self, size: tuple = (1600, 1000), variants: int = 4, **kw):
+        super().__init__(**kw)
+        from PIL import Image
+        self.images = []
+        for v in range(variants):
+            im = Image.effect_mandelbrot(size, (-2.0 + v * 0.1, -1.2, 1.0, 1.2 - v * 0.1), 60 + v * 20)
+            buf = io.BytesIO()
+            im.convert("RGB").save(buf, "JPEG", quality=85)
+            self.images.append(buf.getvalue())
+        self.bytes_sent = 0
+
+    def handle(self, method, path, query, headers, body):
+        parts = [p for p in path.split("/") if p]
+        if method != "GET" or len(parts) != 2 or parts[0] != "img":
+            return _json(404, {"error": "not found"})
+        pid = parts[1].split(".")[0]
+        etag = f'"img-{pid}"'
+        if headers.get("If-None-Match") == etag:
+            self.count("img:304")
+            return 304, {"ETag": etag}, b""
+        self.count("img")
+        data = self.images[(int(pid) if pid.isdigit() else 0) % len(self.images)]
+        with self.lock:
+            self.bytes_sent += len(data)
+        return 200, {"Content-Type": "image/jpeg", "ETag": etag}, data
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "bytes": self.bytes_sent}
+
+
+class CloudinaryStub(_HTTPStub):
+    """
+    Upload API do Cloudinary: POST /v1_1/{cloud}/{tipo}/upload, assinado,
+    arquivo inteiro ou em pedaços (Content-Range + X-Unique-Upload-Id).
+    Guarda só os tamanhos — o conteúdo não interessa aqui.
+    """
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.partial = {}    # upload id -> bytes recebidos
+        self.uploads = {}    # public_id -> tamanho
+
+    def handle(self, method, path, query, headers, body):
+        parts = [p for p in path.split("/") if p]
+        if method != "POST" or len(parts) != 4 or parts[0] != "v1_1" or parts[3] != "upload":
+            return _json(404, {"error": {"message": "unsupported endpoint"}})
+        self.count("upload")
+        form = _parse_form(headers.get("Content-Type", ""), body)
+        if not (_text(form.get("api_key")) and _text(form.get("signature"))):
+            return _json(401, {"error": {"message": "Missing required parameter - api_key"}})
+        chunk = form.get("file") or b""
+        uid = headers.get("X-Unique-Upload-Id") or hashlib.sha1(os.urandom(8)).hexdigest()[:16]
+        public_id = _text(form.get("public_id")) or "/".join(
+            p for p in (_text(form.get("folder")), uid) if p)
+        rng = (headers.get("Content-Range") or "").replace("bytes ", "")
+        with self.lock:
+            got = self.partial.get(uid, 0) + len(chunk)
+            total = int(rng.split("/")[-1]) if "/" in rng else got
+            if got < total:
+                self.partial[uid] = got
+                return _json(200, {"done": False, "public_id": public_id, "bytes": got})
+            self.partial.pop(uid, None)
+            self.uploads[public_id] = got
+        version = int(time.time())
+        return _json(200, {
+            "public_id": public_id, "version": version, "resource_type": parts[2],
+            "format": "mp4", "bytes": got,
+            "secure_url": f"{self.url}/{parts[1]}/{parts[2]}/upload/v{version}/{public_id}.mp4",
+        })
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "uploads": len(self.uploads),
+                "bytes": sum(self.uploads.values())}
+
+
+# ------------------------------------------------------------- stubs (proc)
+def _serve_stubs(conn, opts: dict):
+    """Processo dos stubs: manda as URLs, responde 'go' / 'stats' e sai em 'stop'."""
+    graph = GraphStub(latency=opts["graph_latency"], drop_rate=opts["graph_drop"],
+                      seed=opts["seed"], ig_processing=tuple(opts["ig_processing"]),
+                      ig_error_rate=opts["ig_error_rate"], quota=opts["graph_quota"],
+                      quota_window=opts["graph_quota_window"],
+                      ambiguous_rate=opts["ambiguous_rate"]).start()
+    cdn = CdnStub(size=tuple(opts["img_size"]), latency=opts["cdn_latency"],
+                  fail_rate=opts["cdn_fail"], seed=opts["seed"]).start()
+    wp = WPStub(opts["posts"], cdn.url, opts["spread"], latency=opts["wp_latency"],
+                fail_rate=opts["wp_fail"], seed=opts["seed"]).start()
+    cloud = CloudinaryStub(latency=opts["cloud_latency"], fail_rate=opts["cloud_fail"],
+                           seed=opts["seed"]).start()
+    conn.send({"wp": wp.url, "cdn": cdn.url, "cloud": cloud.url,
+               "graph": graph.base_url, "rupload": graph.rupload_url})
+    while True:
+        cmd = conn.recv()
+        if cmd == "go":
+            wp.go()
+            conn.send(True)
+        elif cmd == "stats":
+            with graph.lock:
+                fb = Counter(v["description"] for v in graph.videos.values())
+                ig = Counter(graph.containers[cid]["caption"] for cid in graph.ig_media.values())
+                calls = dict(graph.calls)
+            conn.send({
+                "wp": wp.stats(), "cdn": cdn.stats(), "cloudinary": cloud.stats(),
+                "graph": {"calls": calls,
+                          "fb_published": len(fb), "fb_duplicates": sum(n - 1 for n in fb.values()),
+                          "ig_published": len(ig), "ig_duplicates": sum(n - 1 for n in ig.values())},
+            })
+        else:
+            break
+    for stub in (wp, cdn, cloud, graph):
+        stub.stop()
+
+
+# ------------------------------------------------------------------ memória
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _proc_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _tree_rss(root: int, skip: set) -> int:
+    """RSS do processo + descendentes (workers de arte, ffmpeg), menos `skip`."""
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat[stat.rfind(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(name))
+    total, todo = 0, [root]
+    while todo:
+        pid = todo.pop()
+        if pid in skip:
+            continue
+        total += _proc_rss(pid)
+        todo.extend(children.get(pid, ()))
+    return total
+
+
+class MemorySampler:
+    """Pico de RSS (processo + filhos) amostrado em thread; só Linux (/proc)."""
+
+    def __init__(self, skip: set, interval: float = 0.2):
+        self.skip = skip
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "MemorySampler":
+        if os.path.isdir("/proc"):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        me = os.getpid()
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _tree_rss(me, self.skip))
+            self._stop.wait(self.interval)
+
+    def stop(self) -> int:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.peak
+
+
+# ------------------------------------------------------------------- carga
+def _distribution(values: list, percentile) -> dict:
+    if not values:
+        return {"n": 0}
+    return {"n": len(values), "mean": round(sum(values) / len(values), 3),
+            "p50": round(percentile(values, 0.50), 3), "p90": round(percentile(values, 0.90), 3),
+            "p99": round(percentile(values, 0.99), 3), "max": round(max(values), 3)}
+
+
+def _read_ledger(path: str) -> list:
+    recs = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    recs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return recs
+
+
+def _pending(arp, args, elapsed: float) -> bool:
+    """Algum post já chegado ainda sem todas as etapas resolvidas no ledger?"""
+    ledger = arp.get_ledger()
+    for i in range(args.posts):
+        if i * args.spread / max(1, args.posts) > elapsed:
+            break
+        if not ledger.all_done(i + 1, (FIRST_POST + timedelta(seconds=i)).isoformat()):
+            return True
+    return False
+
+
+def run_load(args, urls: dict, control, out_dir: str) -> dict:
+    os.chdir(ROOT)  # fontes/logo/áudio são caminhos relativos na CFG
+    arp = _setup_module(out_dir, SimpleNamespace(base_url=urls["graph"], rupload_url=urls["rupload"]))
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)  # o módulo loga em INFO
+    arp.WP_URL = urls["wp"]
+    arp.cover_cache.root = os.path.join(out_dir, arp.CFG["COVER_CACHE_DIR"])
+    arp.CFG["IG_UPLOAD_MODE"] = args.ig_mode
+    # bot já rodando quando a rajada chega: marca d'água logo antes do 1º post
+    arp.wp_save_state({"modified_after": (FIRST_POST - timedelta(seconds=1)).isoformat()})
+    if args.ffmpeg:
+        arp.CFG["FFMPEG_BIN"] = args.ffmpeg
+    for item in args.set:
+        key, _, raw = item.partition("=")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        arp.CFG[key] = arp._cfg_value(key, value)
+    if args.ig_mode == "cloudinary":
+        import cloudinary  # SDK de verdade; só o endereço da API aponta para o stub
+        cloudinary.config(upload_prefix=urls["cloud"])
+        arp.CLOUD_NAME, arp.CLOUD_KEY, arp.CLOUD_SEC = "loadtest", "key", "secret"
+    arp.load_media_libs()
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    sampler = MemorySampler(skip={args.stub_pid}).start()
+    control.send("go")
+    control.recv()
+    t0, t0_wall = time.perf_counter(), time.time()
+    records, http_stats, graph_usage, cycles = [], {}, {}, 0
+    summary_path = os.path.join(out_dir, arp.CFG["METRICS_DIR"], "run_summary.json")
+    pools = arp.StagePools()  # como no --daemon: uma por processo, não por ciclo
+    while cycles < args.max_cycles and time.perf_counter() - t0 < args.timeout:
+        cycles += 1
+        arp.process_once(None, pools)
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        records.extend(summary["records"])
+        graph_usage = summary.get("graph") or {}
+        for name, st in (summary.get("http") or {}).items():
+            acc = http_stats.setdefault(name, {"requests": 0, "connections": 0})
+            acc["requests"] += st["requests"]
+            acc["connections"] += st["connections"] or 0
+        if _pending(arp, args, time.perf_counter() - t0):
+            continue  # falhas voltam no ciclo seguinte (como no --daemon)
+        if time.perf_counter() - t0 >= args.spread:
+            break
+        time.sleep(args.interval)
+    wall = time.perf_counter() - t0
+    pools.shutdown()
+    peak_tree = sampler.stop()
+
+    # chegada -> FB e IG ok, pelo ledger (ts em segundos inteiros)
+    done_at, published = {}, {}
+    for rec in _read_ledger(os.path.join(out_dir, arp.CFG["LEDGER_FILE"])):
+        if rec.get("ok") and rec.get("stage") in ("fb", "ig"):
+            got = published.setdefault(rec["post"], set())
+            got.add(rec["stage"])
+            if len(got) == 2 and rec["post"] not in done_at:
+                done_at[rec["post"]] = rec["ts"]
+    arrival = lambda pid: (pid - 1) * args.spread / max(1, args.posts)
+    e2e = [max(0.0, ts - t0_wall - arrival(pid)) for pid, ts in done_at.items()]
+
+    stages = {}
+    for rec in records:
+        st = stages.setdefault(rec["stage"], {"seconds": [], "failed": 0, "retries": 0})
+        st["seconds"].append(rec["seconds"])
+        st["failed"] += not rec["ok"]
+        st["retries"] += rec["retries"]
+    stage_report = {}
+    for name in list(arp.METRIC_STAGES) + sorted(set(stages) - set(arp.METRIC_STAGES)):
+        if name in stages:
+            st = stages[name]
+            stage_report[name] = {**_distribution(st["seconds"], arp._percentile),
+                                  "failed": st["failed"], "retries": st["retries"]}
+    for st in http_stats.values():
+        st["reuse"] = round(1 - st["connections"] / st["requests"], 3) if st["requests"] else None
+
+    return {
+        "posts": args.posts, "spread_s": args.spread, "ig_mode": args.ig_mode,
+        "cycles": cycles, "wall_s": round(wall, 2),
+        "completed": len(done_at),
+        "posts_per_min": round(len(done_at) / wall * 60, 2) if wall else 0.0,
+        "publish_latency_s": _distribution(e2e, arp._percentile),
+        "stages": stage_report,
+        "memory_mb": {
+            "baseline_rss": round(base_rss / 2 ** 20, 1),
+            "peak_rss": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "peak_tree_rss": round(peak_tree / 2 ** 20, 1) if peak_tree else None,
+        },
+        "http": http_stats,
+        "graph_usage": graph_usage,
+    }
+
+
+def print_report(rep: dict):
+    mode = f"espalhados em {rep['spread_s']:.0f} s" if rep["spread_s"] else "rajada"
+    stubs = rep["stubs"]
+    g = stubs["graph"]
+    print(f"Carga: {rep['posts']} posts ({mode}), IG via {rep['ig_mode']}, "
+          f"{rep['cycles']} ciclo(s), {rep['wall_s']:.1f} s")
+    print(f"  concluídos (FB + IG): {rep['completed']}/{rep['posts']} -> {rep['posts_per_min']:.1f} posts/min")
+    print(f"  no stub: FB {g['fb_published']} (duplicados {g['fb_duplicates']}), "
+          f"IG {g['ig_published']} (duplicados {g['ig_duplicates']})")
+    lat = rep["publish_latency_s"]
+    if lat["n"]:
+        print(f"  chegada -> publicado: p50 {lat['p50']:.0f} s, p90 {lat['p90']:.0f} s, "
+              f"máx {lat['max']:.0f} s (resolução de 1 s)")
+    print(f"\n{'etapa':<11} {'n':>4} {'falhas':>7} {'retries':>8} {'média':>7} {'p50':>7} "
+          f"{'p90':>7} {'p99':>7} {'máx':>7}   (s)")
+    for name, st in rep["stages"].items():
+        print(f"{name:<11} {st['n']:>4} {st['failed']:>7} {st['retries']:>8} {st['mean']:>7.2f} "
+              f"{st['p50']:>7.2f} {st['p90']:>7.2f} {st['p99']:>7.2f} {st['max']:>7.2f}")
+    mem = rep["memory_mb"]
+    tree = f", processo + workers + ffmpeg {mem['peak_tree_rss']:.0f} MB" if mem["peak_tree_rss"] else ""
+    print(f"\nmemória: pico RSS {mem['peak_rss']:.0f} MB (antes da carga {mem['baseline_rss']:.0f} MB){tree}")
+    print("HTTP: " + ", ".join(f"{k} {v['requests']} req/{v['connections']} conexões"
+                               for k, v in rep["http"].items() if v["requests"]))
+    print("stubs: " + "; ".join(f"{k} {v['calls']}" for k, v in stubs.items()))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Carga offline do pipeline contra stubs locais")
+    ap.add_argument("--posts", type=int, default=50, help="posts novos no WP")
+    ap.add_argument("--spread", type=float, default=0.0,
+                    help="chegada espalhada em N s (0 = rajada: todos de uma vez)")
+    ap.add_argument("--interval", type=float, default=5.0,
+                    help="pausa entre ciclos enquanto ainda faltam posts chegar")
+    ap.add_argument("--ig-mode", choices=("cloudinary", "resumable"), default="cloudinary")
+    ap.add_argument("--ffmpeg", default="", help="binário do ffmpeg (padrão: CFG FFMPEG_BIN)")
+    ap.add_argument("--img-size", type=int, nargs=2, default=(1600, 1000), metavar=("W", "H"))
+    for name in ("wp", "cdn", "cloud", "graph"):
+        ap.add_argument(f"--{name}-latency", type=float, default=0.0, help="s por requisição")
+    for name in ("wp", "cdn", "cloud"):
+        ap.add_argument(f"--{name}-fail", type=float, default=0.0, help="fração respondida com 503")
+    ap.add_argument("--graph-drop", type=float, default=0.0, help="pedaços do FB perdidos (ver stub_graph)")
+    ap.add_argument("--ig-error-rate", type=float, default=0.0)
+    ap.add_argument("--ig-processing", type=float, nargs=2, default=(2.0, 6.0), metavar=("MIN", "MAX"))
+    ap.add_argument("--graph-quota", type=int, default=0, help="chamadas por objeto por janela (0 = sem limite)")
+    ap.add_argument("--graph-quota-window", type=float, default=60.0)
+    ap.add_argument("--ambiguous-rate", type=float, default=0.0)
+    ap.add_argument("--set", action="append", default=[], metavar="CHAVE=VALOR",
+                    help="sobrepõe a CFG (valor em JSON), ex.: --set POOL_PUBLISH=6")
+    ap.add_argument("--max-cycles", type=int, default=10)
+    ap.add_argument("--timeout", type=float, default=1800.0, help="não começa ciclo novo depois de N s")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="OUT_DIR (padrão: temporário, apagado no fim)")
+    ap.add_argument("--json", action="store_true", help="saída em JSON")
+    ap.add_argument("-v", "--verbose", action="store_true", help="mostra os logs do pipeline")
+    args = ap.parse_args(argv)
+
+    opts = dict(vars(args))
+    control, child = mp.Pipe()
+    proc = mp.get_context("spawn").Process(target=_serve_stubs, args=(child, opts), daemon=True)
+    proc.start()
+    urls = control.recv()
+    args.stub_pid = proc.pid
+
+    tmp = None if args.out else tempfile.TemporaryDirectory()
+    try:
+        out_dir = args.out or tmp.name
+        os.makedirs(out_dir, exist_ok=True)
+        rep = run_load(args, urls, control, out_dir)
+        control.send("stats")
+        rep["stubs"] = control.recv()
+    finally:
+        control.send("stop")
+        proc.join(5)
+        if tmp:
+            tmp.cleanup()
+
+    if args.json:
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+    else:
+        print_report(rep)
+    g = rep["stubs"]["graph"]
+    ok = (rep["completed"] == args.posts and not g["fb_duplicates"] and not g["ig_duplicates"])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,554 @@
+# harness/stub_graph.py
+# -*- coding: utf-8 -*-
+"""
+Graph API falsa (local) para testar o upload de vídeo sem tocar no Facebook.
+
+Cobre POST /{versão}/{page}/videos nos dois formatos:
+  - legado: multipart com "source" (arquivo inteiro)
+  - resumível: upload_phase=start | transfer | finish
+e simula pedaços perdidos (drop_rate): antes de gravar (500) ou depois de
+gravar sem responder (conexão cai e o cliente não recebe a confirmação).
+
+Instagram: POST /{ig}/media (container que fica pronto após ig_processing
+segundos, ou vira ERROR com ig_error_rate), GET /{ig}/media_publish_status,
+POST /{ig}/media_publish, o endpoint de batch (POST /{versão}/?batch=) e o
+upload resumable (upload_type=resumable + /ig-api-upload/{versão}/{container}).
+
+Limites de uso: com quota > 0, cada objeto (página / conta IG) aceita
+`quota` chamadas por `quota_window` s; toda resposta leva o
+X-Business-Use-Case-Usage do objeto e, estourado, a Graph responde com o
+erro 80001/80002 (estimated_time_to_regain_access em minutos fracionários,
+para janelas curtas de teste). ambiguous_rate: media_publish / finish
+publicam, mas a resposta se perde (testa a idempotência pelo post).
+
+    python harness/stub_graph.py --port 8999 --drop-rate 0.2   # só servir
+    python harness/stub_graph.py --selftest                    # FB + IG reais contra o stub
+"""
+
+import os, sys, json, time, random, argparse, threading, tempfile, email.policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class GraphStub:
+    """Estado do servidor falso + ThreadingHTTPServer em thread própria."""
+
+    def __init__(self, chunk_size: int = 1024 * 1024, drop_rate: float = 0.0,
+                 drop_mode: str = "mixed", latency: float = 0.0, seed: int = 0,
+                 ig_processing: tuple = (2.0, 6.0), ig_error_rate: float = 0.0,
+                 quota: int = 0, quota_window: float = 60.0, ambiguous_rate: float = 0.0):
+        self.chunk_size = chunk_size
+        self.quota = quota              # chamadas por objeto por janela (0 = sem limite)
+        self.quota_window = quota_window
+        self.ambiguous_rate = ambiguous_rate
+        self._hits = {}                 # objeto -> instantes das chamadas na janela
+        self.ig_processing = ig_processing  # (mín, máx) segundos até FINISHED
+        self.ig_error_rate = ig_error_rate
+        self.drop_rate = drop_rate
+        self.drop_mode = drop_mode      # before | after | mixed
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = {}              # upload_session_id -> {"size", "data", "video_id"}
+        self.videos = {}                # video_id -> {"size", "data", "description"}
+        self.containers = {}            # creation_id -> {"ready_at", "error", "video_url", "caption"}
+        self.ig_media = {}              # media_id -> creation_id
+        self._failed_urls = set()
+        self.calls = {}                 # "videos:start" -> n
+        self._next_id = 1000
+        self.server = None
+
+    # ----------------------------------------------------------------- infra
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "GraphStub":
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v23.0"
+
+    def new_id(self) -> str:
+        with self.lock:
+            self._next_id += 1
+            return str(self._next_id)
+
+    def count(self, name: str):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def should_drop(self) -> str:
+        """'' = não derruba; 'before' / 'after' = onde derrubar."""
+        with self.lock:
+            if self.rng.random() >= self.drop_rate:
+                return ""
+            if self.drop_mode == "mixed":
+                return self.rng.choice(("before", "after"))
+            return self.drop_mode
+
+    def take_quota(self, obj: str) -> tuple:
+        """Conta a chamada no objeto -> (uso %, segundos até liberar; > 0 = estourou)."""
+        if not (self.quota and obj):
+            return 0, 0.0
+        now = time.monotonic()
+        with self.lock:
+            hits = [t for t in self._hits.get(obj, []) if now - t < self.quota_window]
+            over = len(hits) >= self.quota
+            if not over:
+                hits.append(now)
+            self._hits[obj] = hits
+        pct = min(100, len(hits) * 100 // self.quota)
+        return pct, (hits[0] + self.quota_window - now) if over else 0.0
+
+    def lose_response(self) -> bool:
+        with self.lock:
+            lost = self.rng.random() < self.ambiguous_rate
+        if lost:
+            self.count("ambiguous")
+        return lost
+
+    # ------------------------------------------------------------- endpoints
+    def post_videos(self, form: dict) -> tuple:
+        phase = _text(form.get("upload_phase"))
+        if not phase:
+            data = form.get("source") or b""
+            vid = self.new_id()
+            self.count("videos:legacy")
+            with self.lock:
+                self.videos[vid] = {"size": len(data), "data": data,
+                                    "description": _text(form.get("description"))}
+            return 200, {"id": vid}
+
+        self.count(f"videos:{phase}")
+        if phase == "start":
+            size = int(_text(form.get("file_size")) or 0)
+            sid, vid = self.new_id(), self.new_id()
+            with self.lock:
+                self.sessions[sid] = {"size": size, "data": bytearray(), "video_id": vid}
+            return 200, {"upload_session_id": sid, "video_id": vid,
+                         "start_offset": "0", "end_offset": str(min(size, self.chunk_size))}
+
+        sid = _text(form.get("upload_session_id"))
+        with self.lock:
+            sess = self.sessions.get(sid)
+        if sess is None:
+            return 400, {"error": {"message": "invalid upload session", "code": 6000}}
+
+        if phase == "transfer":
+            drop = self.should_drop()
+            if drop == "before":
+                return 500, {"error": {"message": "simulated chunk drop", "code": 1}}
+            start = int(_text(form.get("start_offset")) or 0)
+            chunk = form.get("video_file_chunk") or b""
+            with self.lock:
+                have = len(sess["data"])
+                if start == have:
+                    sess["data"] += chunk
+                elif start > have:
+                    return 400, {"error": {"message": "offset ahead of upload", "code": 1363037}}
+                # start < have: pedaço repetido (confirmação perdida) — só reconfirma
+                new_start = len(sess["data"])
+            if drop == "after":
+                return None, None  # gravou, mas a resposta "se perde"
+            return 200, {"start_offset": str(new_start),
+                         "end_offset": str(min(sess["size"], new_start + self.chunk_size))}
+
+        if phase == "finish":
+            with self.lock:
+                if len(sess["data"]) != sess["size"]:
+                    return 400, {"error": {"message": "upload incomplete", "code": 1363019}}
+                self.videos[sess["video_id"]] = {
+                    "size": sess["size"], "data": bytes(sess["data"]),
+                    "description": _text(form.get("description")),
+                }
+                del self.sessions[sid]
+            if self.lose_response():
+                return None, None  # publicou, mas o cliente não fica sabendo
+            return 200, {"success": True}
+
+        return 400, {"error": {"message": f"unknown upload_phase {phase}"}}
+
+    def post_media(self, form: dict) -> tuple:
+        self.count("ig:media")
+        url = _text(form.get("video_url"))
+        resumable = _text(form.get("upload_type")) == "resumable"
+        with self.lock:
+            wait = self.rng.uniform(*self.ig_processing)
+            # erro transitório: o mesmo vídeo não falha duas vezes
+            error = url not in self._failed_urls and self.rng.random() < self.ig_error_rate
+            if error:
+                self._failed_urls.add(url)
+        cid = self.new_id()
+        with self.lock:
+            self.containers[cid] = {
+                # resumable: só começa a processar quando os bytes chegarem
+                "ready_at": float("inf") if resumable else time.monotonic() + wait,
+                "wait": wait, "error": error, "video_url": url,
+                "caption": _text(form.get("caption")), "data": bytearray(),
+            }
+        if resumable:
+            return 200, {"id": cid, "uri": f"{self.rupload_url}/{cid}"}
+        return 200, {"id": cid}
+
+    def rupload(self, method: str, parts: list, headers, body: bytes) -> tuple:
+        """rupload.facebook.com/ig-api-upload/{versão}/{container}: bytes crus."""
+        cid = parts[-1]
+        with self.lock:
+            c = self.containers.get(cid)
+        if c is None:
+            return 404, {"error": {"message": "unknown container"}}
+        if not (headers.get("Authorization") or "").startswith("OAuth "):
+            return 401, {"error": {"message": "missing OAuth header"}}
+        if method == "GET":
+            return 200, {"offset": len(c["data"])}
+        self.count("ig:rupload")
+        offset = int(headers.get("offset") or 0)
+        size = int(headers.get("file_size") or 0)
+        with self.lock:
+            if offset != len(c["data"]):
+                return 400, {"error": {"message": "offset mismatch", "offset": len(c["data"])}}
+            c["data"] += body
+            if len(c["data"]) >= size:
+                c["ready_at"] = time.monotonic() + c["wait"]
+        return 200, {"success": True}
+
+    @property
+    def rupload_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/ig-api-upload/v23.0"
+
+    def container_status(self, cid: str) -> str:
+        with self.lock:
+            c = self.containers.get(cid)
+        if c is None:
+            return ""
+        if c.get("published"):
+            return "PUBLISHED"
+        if time.monotonic() < c["ready_at"]:
+            return "IN_PROGRESS"
+        return "ERROR" if c["error"] else "FINISHED"
+
+    def get_publish_status(self, query: dict) -> tuple:
+        self.count("ig:status")
+        st = self.container_status(query.get("creation_id", ""))
+        if not st:
+            return 400, {"error": {"message": "unknown container"}}
+        return 200, {"status": st}
+
+    def post_media_publish(self, form: dict) -> tuple:
+        self.count("ig:publish")
+        cid = _text(form.get("creation_id"))
+        if self.container_status(cid) != "FINISHED":
+            return 400, {"error": {"message": "media not ready", "code": 9007}}
+        mid = self.new_id()
+        with self.lock:
+            self.ig_media[mid] = cid
+            self.containers[cid]["published"] = True
+        if self.lose_response():
+            return None, None
+        return 200, {"id": mid}
+
+    def get_video(self, vid: str) -> tuple:
+        """GET /{video_id}?fields=status: publishing_phase diz se o finish aconteceu."""
+        self.count("videos:get")
+        with self.lock:
+            done = vid in self.videos
+            pending = any(sess["video_id"] == vid for sess in self.sessions.values())
+        if not (done or pending):
+            return 404, {"error": {"message": "unknown video", "code": 100}}
+        phase = "complete" if done else "not_started"
+        return 200, {"id": vid, "status": {"video_status": "ready" if done else "upload_complete",
+                                           "publishing_phase": {"status": phase}}}
+
+    def post_batch(self, form: dict) -> tuple:
+        self.count("batch")
+        try:
+            reqs = json.loads(_text(form.get("batch")) or "[]")
+        except ValueError:
+            return 400, {"error": {"message": "invalid batch"}}
+        out = []
+        for req in reqs[:50]:
+            self.count("batch:items")
+            u = urlparse("/" + req.get("relative_url", "").lstrip("/"))
+            query = {k: v[0] for k, v in parse_qs(u.query).items()}
+            parts = ["v23.0"] + [p for p in u.path.split("/") if p]
+            status, payload = self.route(req.get("method", "GET").upper(), parts, query, {})
+            out.append({"code": status, "headers": [], "body": json.dumps(payload)})
+        return 200, out
+
+    def route(self, method: str, parts: list, query: dict, form: dict) -> tuple:
+        if method == "POST" and len(parts) == 1:
+            return self.post_batch(form)
+        if method == "POST" and len(parts) == 3 and parts[2] == "videos":
+            return self.post_videos(form)
+        if method == "POST" and len(parts) == 3 and parts[2] == "media":
+            return self.post_media(form)
+        if method == "GET" and len(parts) == 3 and parts[2] == "media_publish_status":
+            return self.get_publish_status(query)
+        if method == "POST" and len(parts) == 3 and parts[2] == "media_publish":
+            return self.post_media_publish(form)
+        if method == "GET" and len(parts) == 2:
+            return self.get_video(parts[1])
+        return 404, {"error": {"message": "unsupported endpoint"}}
+
+    # --------------------------------------------------------------- handler
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method: str):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                u = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(u.query).items()}
+                parts = [p for p in u.path.split("/") if p]
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                # quota por página / conta IG: só rotas /{versão}/{objeto}/{aresta}
+                obj = parts[1] if len(parts) > 2 and parts[0] != "ig-api-upload" else ""
+                pct, regain = stub.take_quota(obj)
+                ig = parts[-1].startswith("media") if parts else False
+                if regain:
+                    stub.count("throttled")
+                    status, payload = 400, {"error": {"code": 80002 if ig else 80001,
+                                                      "message": "too many calls to this object"}}
+                elif parts and parts[0] == "ig-api-upload":
+                    status, payload = stub.rupload(method, parts, self.headers, body)
+                else:
+                    form = _parse_form(self.headers.get("Content-Type", ""), body) \
+                        if method == "POST" else {}
+                    status, payload = stub.route(method, parts, query, form)
+                if status is None:
+                    self.close_connection = True
+                    return
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                if stub.quota and obj:
+                    self.send_header("X-Business-Use-Case-Usage", json.dumps({obj: [{
+                        "type": "instagram" if ig else "pages",
+                        "call_count": pct, "total_cputime": pct // 2, "total_time": pct // 2,
+                        "estimated_time_to_regain_access": round(regain / 60, 4)}]}))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _text(v) -> str:
+    if v is None:
+        return ""
+    return v.decode("utf-8", "replace") if isinstance(v, bytes) else str(v)
+
+
+def _parse_form(ctype: str, body: bytes) -> dict:
+    """Form urlencoded ou multipart -> dict (arquivos ficam em bytes)."""
+    if ctype.startswith("multipart/form-data"):
+        msg = BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + ctype.encode("latin-1") + b"\r\n\r\n" + body)
+        form = {}
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            form[name] = part.get_payload(decode=True)
+        return form
+    return {k: v[0] for k, v in parse_qs(body.decode("utf-8", "replace")).items()}
+
+
+# ------------------------------------------------------------------ selftest
+def _setup_module(tmp: str, stub: "GraphStub"):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    import auto_reels_wp_publish as arp
+    arp.OUT_DIR = tmp
+    arp.GRAPH_BASE = stub.base_url
+    arp.RUPLOAD_BASE = stub.rupload_url
+    arp.FACEBOOK_PAGE_ID, arp.INSTAGRAM_ID, arp.USER_ACCESS_TOKEN = "123", "456", "tok"
+    return arp
+
+
+def selftest_fb() -> bool:
+    """Sobe o stub com perdas, faz upload real e confere byte a byte."""
+    stub = GraphStub(chunk_size=256 * 1024, drop_rate=0.3, seed=7).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        arp = _setup_module(tmp, stub)
+        arp.CFG["FB_CHUNK_RETRIES"] = 2
+        path = os.path.join(tmp, "reel.mp4")
+        payload = os.urandom(3 * 1024 * 1024 + 123)
+        with open(path, "wb") as f:
+            f.write(payload)
+
+        # com só 2 tentativas por pedaço pode parar no meio: cada nova chamada
+        # tem que retomar a MESMA sessão, nunca reiniciar do zero
+        vid = None
+        for _ in range(20):
+            vid = arp.fb_resumable_upload(path, "legenda")
+            if vid:
+                break
+    stub.stop()
+
+    ok = bool(vid) and stub.videos.get(vid, {}).get("data") == payload
+    ok = ok and stub.calls.get("videos:start") == 1
+    print(json.dumps({"test": "fb", "ok": ok, "video_id": vid, "calls": stub.calls}, indent=2))
+    return ok
+
+
+def selftest_ig(n: int = 6) -> bool:
+    """
+    n reels ao mesmo tempo, containers com tempos diferentes e 1 em cada 4
+    dando ERROR (transitório): todos têm que publicar (retry), bem antes de
+    n x o mais lento, e com menos requisições de status do que consultas.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    stub = GraphStub(seed=3, ig_processing=(1.0, 5.0), ig_error_rate=0.25).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        arp = _setup_module(tmp, stub)
+        arp.CFG["IG_POLL_MIN"], arp.CFG["IG_POLL_MAX"] = 1, 3
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(n) as ex:
+            results = list(ex.map(lambda i: arp.publish_reel_to_ig(f"http://cdn/{i}.mp4", f"reel {i}"),
+                                  range(n)))
+        elapsed = time.monotonic() - t0
+    stub.stop()
+
+    published = len(stub.ig_media)
+    lookups = stub.calls.get("ig:status", 0)
+    status_requests = stub.calls.get("batch", 0) + lookups - stub.calls.get("batch:items", 0)
+    ok = all(results) and published == n and elapsed < n * 5.0 and status_requests < lookups
+    print(json.dumps({"test": "ig", "ok": ok, "published": published, "results": results,
+                      "elapsed_s": round(elapsed, 1), "status_requests": status_requests,
+                      "calls": stub.calls}, indent=2))
+    return ok
+
+
+def selftest_ig_resumable(n: int = 3) -> bool:
+    """Modo IG_UPLOAD_MODE=resumable: bytes do disco direto no rupload, sem URL."""
+    from concurrent.futures import ThreadPoolExecutor
+    stub = GraphStub(seed=5, ig_processing=(0.5, 2.0)).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        arp = _setup_module(tmp, stub)
+        arp.CFG["IG_POLL_MIN"], arp.CFG["IG_POLL_MAX"] = 1, 2
+        payloads = []
+        for i in range(n):
+            payloads.append(os.urandom(512 * 1024 + i))
+            with open(os.path.join(tmp, f"r{i}.mp4"), "wb") as f:
+                f.write(payloads[-1])
+        with ThreadPoolExecutor(n) as ex:
+            results = list(ex.map(
+                lambda i: arp.publish_reel_to_ig(None, f"reel {i}", file_path=os.path.join(tmp, f"r{i}.mp4")),
+                range(n)))
+    stub.stop()
+
+    stored = sorted(bytes(stub.containers[cid]["data"]) for cid in stub.ig_media.values())
+    ok = all(results) and stored == sorted(payloads)
+    print(json.dumps({"test": "ig-resumable", "ok": ok, "results": results,
+                      "calls": stub.calls}, indent=2))
+    return ok
+
+
+def selftest_limits(n: int = 6) -> bool:
+    """
+    Quota apertada por objeto + respostas perdidas depois de publicar
+    (finish / media_publish): cada post sai UMA vez no FB e no IG (o
+    ledger/sessão guardam o que já foi criado para o post) e o limitador
+    segura o ritmo pelos headers de uso, com poucos erros de limite.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    stub = GraphStub(chunk_size=256 * 1024, seed=11, ig_processing=(0.3, 1.0),
+                     quota=12, quota_window=3.0, ambiguous_rate=0.5).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        arp = _setup_module(tmp, stub)
+        arp.CFG.update(IG_POLL_MIN=0.5, IG_POLL_MAX=1, GRAPH_RATE_PER_MIN=600, GRAPH_BURST=5,
+                       GRAPH_THROTTLE_COOLDOWN=1)
+        path = os.path.join(tmp, "reel.mp4")
+        with open(path, "wb") as f:
+            f.write(os.urandom(600 * 1024))
+
+        def post(i: int) -> bool:
+            # cada volta = um ciclo do loop principal, que tenta de novo o que falhou
+            fb = ig = False
+            for _ in range(6):
+                fb = fb or arp.publish_video_to_facebook(path, f"post {i}", i)
+                ig = ig or arp.publish_reel_to_ig(f"http://cdn/{i}.mp4", f"reel {i}", None, (i, "m"))
+                if fb and ig:
+                    break
+            return fb and ig
+
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(n) as ex:
+            results = list(ex.map(post, range(n)))
+        elapsed = time.monotonic() - t0
+        usage = arp.graph_limiter.snapshot()
+    stub.stop()
+
+    ig_posts = sorted(stub.containers[cid]["caption"] for cid in stub.ig_media.values())
+    fb_posts = sorted(v["description"] for v in stub.videos.values())
+    ok = (all(results) and ig_posts == sorted(f"reel {i}" for i in range(n))
+          and fb_posts == sorted(f"post {i}" for i in range(n))
+          and stub.calls.get("throttled", 0) <= n)
+    print(json.dumps({"test": "limits", "ok": ok, "results": results, "elapsed_s": round(elapsed, 1),
+                      "ig_published": len(ig_posts), "fb_published": len(fb_posts),
+                      "usage": usage, "calls": stub.calls}, indent=2))
+    return ok
+
+
+def selftest() -> int:
+    ok = selftest_fb()
+    ok = selftest_ig() and ok
+    ok = selftest_ig_resumable() and ok
+    ok = selftest_limits() and ok
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Graph API falsa para testes locais")
+    ap.add_argument("--port", type=int, default=8999)
+    ap.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--drop-mode", choices=("before", "after", "mixed"), default="mixed")
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--ig-processing", type=float, nargs=2, default=(2.0, 6.0),
+                    metavar=("MIN", "MAX"), help="segundos até o container ficar FINISHED")
+    ap.add_argument("--ig-error-rate", type=float, default=0.0)
+    ap.add_argument("--quota", type=int, default=0, help="chamadas por objeto por janela (0 = sem limite)")
+    ap.add_argument("--quota-window", type=float, default=60.0)
+    ap.add_argument("--ambiguous-rate", type=float, default=0.0,
+                    help="fração de finish/media_publish que publica e perde a resposta")
+    ap.add_argument("--selftest", action="store_true")
+    args = ap.parse_args(argv)
+    if args.selftest:
+        sys.exit(selftest())
+    stub = GraphStub(args.chunk_size, args.drop_rate, args.drop_mode, args.latency,
+                     ig_processing=tuple(args.ig_processing), ig_error_rate=args.ig_error_rate,
+                     quota=args.quota, quota_window=args.quota_window,
+                     ambiguous_rate=args.ambiguous_rate)
+    stub.start(port=args.port)
+    print(f"Graph stub em {stub.base_url}  (GRAPH_BASE={stub.base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
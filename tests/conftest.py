@@ -0,0 +1,26 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+import os, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "harness")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# globais que os testes (e os _setup_module dos stubs) sobrepõem
+MODULE_GLOBALS = ("OUT_DIR", "WP_URL", "GRAPH_BASE", "RUPLOAD_BASE", "FACEBOOK_PAGE_ID",
+                  "INSTAGRAM_ID", "USER_ACCESS_TOKEN", "CLOUD_NAME", "CLOUD_KEY", "CLOUD_SEC")
+
+
+@pytest.fixture
+def arp(tmp_path, monkeypatch):
+    """O módulo com OUT_DIR temporário; CFG e globais voltam ao fim do teste."""
+    import auto_reels_wp_publish as arp
+    monkeypatch.setattr(arp, "CFG", dict(arp.CFG))
+    for name in MODULE_GLOBALS:
+        monkeypatch.setattr(arp, name, getattr(arp, name))
+    monkeypatch.setattr(arp, "graph_limiter", arp.GraphRateLimiter())
+    arp.OUT_DIR = str(tmp_path)
+    return arp
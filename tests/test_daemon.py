@@ -0,0 +1,22 @@
+# tests/test_daemon.py
+# -*- coding: utf-8 -*-
+"""--daemon: o intervalo segue só os posts novos, não os retries."""
+
+
+def test_retries_and_stuck_posts_are_not_new(arp, monkeypatch):
+    monkeypatch.setattr(arp, "_last_pending", set())
+    a, b = {"id": 1, "modified": "m1"}, {"id": 2, "modified": "m1"}
+    assert arp._count_new([(None, a)]) == 1
+    assert arp._count_new([(None, a)]) == 0           # retry do mesmo post
+    assert arp._count_new([(None, a), (None, b)]) == 1
+    assert arp._count_new([(None, dict(a, modified="m2"))]) == 1  # post editado
+
+
+def test_stuck_post_lets_the_interval_back_off(arp, monkeypatch):
+    monkeypatch.setattr(arp, "_last_pending", set())
+    arp.CFG.update(SLEEP_BETWEEN=60, POLL_MIN=30, POLL_MAX=900)
+    sched = arp.PollScheduler()
+    stuck = [(None, {"id": 1, "modified": "m1"})]
+    for _ in range(10):
+        interval = sched.update(arp._count_new(stuck), sched.interval)
+    assert interval == 900
@@ -0,0 +1,94 @@
+# tests/test_fb_upload.py
+# -*- coding: utf-8 -*-
+"""Upload resumível do Facebook contra o stub da Graph."""
+
+import io, os, json, time
+
+import pytest
+
+import stub_graph
+from stub_graph import GraphStub, _setup_module
+
+
+@pytest.fixture
+def graph(arp):
+    stub = GraphStub(chunk_size=256 * 1024, seed=7).start()
+    _setup_module(arp.OUT_DIR, stub)
+    yield stub
+    stub.stop()
+
+
+def test_chunk_body_streams_the_file_slice(arp):
+    f = io.BytesIO(bytes(range(256)) * 64)
+    body = arp._MultipartChunk(f, 1000, 9000, {"start_offset": 1000})
+    raw = b"".join(iter(lambda: body.read(512), b""))
+    assert len(raw) == len(body)
+    assert f.getvalue()[1000:9000] in raw
+    body.seek(0)
+    assert body.read() == raw
+
+
+def test_stale_session_is_dropped(arp, graph):
+    path = os.path.join(arp.OUT_DIR, "reel_1.mp4")
+    with open(path, "wb") as f:
+        f.write(os.urandom(600 * 1024))
+    arp.CFG["FB_CHUNK_RETRIES"] = 1
+    graph.drop_rate, graph.drop_mode = 1.0, "before"  # 1º pedaço falha: a sessão fica salva
+    assert arp.fb_resumable_upload(path, "legenda", post_id=1) is None
+    assert arp._fb_session_get("post:1")
+
+    with open(path, "ab") as f:  # renderizado de novo
+        f.write(b"x")
+    assert arp._fb_session_get("post:1") is None
+    graph.drop_rate = 0.0
+    vid = arp.fb_resumable_upload(path, "legenda", post_id=1)
+    with open(path, "rb") as f:
+        assert graph.videos[vid]["data"] == f.read()
+    assert graph.calls["videos:start"] == 2
+    with open(arp._fb_sessions_path(), encoding="utf-8") as f:
+        assert json.load(f) == {}
+
+
+def test_selftest_chunk_retry_resumes_the_same_session(arp):
+    """30% dos pedaços perdidos (antes/depois de gravar), 2 tentativas por vez."""
+    assert stub_graph.selftest_fb()
+
+
+def _stalled_upload(arp, graph, size: int = 600 * 1024) -> str:
+    """Upload que para no 1º pedaço com a sessão salva; retorna o caminho do vídeo."""
+    path = os.path.join(arp.OUT_DIR, "reel_1.mp4")
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    arp.CFG["FB_CHUNK_RETRIES"] = 1
+    graph.drop_rate, graph.drop_mode = 1.0, "before"
+    assert arp.fb_resumable_upload(path, "legenda", post_id=1) is None
+    assert arp._fb_session_get("post:1")
+    graph.drop_rate = 0.0
+    return path
+
+
+def test_expired_session_restarts_once(arp, graph):
+    path = _stalled_upload(arp, graph)
+    graph.sessions.clear()  # a Graph esqueceu a sessão: transfer volta 400
+    vid = arp.fb_resumable_upload(path, "legenda", post_id=1)
+    with open(path, "rb") as f:
+        assert graph.videos[vid]["data"] == f.read()
+    assert graph.calls["videos:start"] == 2
+
+
+def test_throttle_keeps_the_session(arp, graph, monkeypatch):
+    path = _stalled_upload(arp, graph)
+    # quota da página já gasta: o próximo transfer volta 400 com código de limite
+    arp.CFG.update(GRAPH_THROTTLE_RETRIES=0, GRAPH_MAX_WAIT=5)
+    graph.quota, graph._hits["123"] = 1, [time.monotonic()]
+    monkeypatch.setattr(arp, "graph_limiter", arp.GraphRateLimiter())
+    assert arp.fb_resumable_upload(path, "legenda", post_id=1) is None
+    assert graph.calls.get("throttled") == 1
+    assert arp._fb_session_get("post:1"), "limite de uso não é sessão expirada"
+
+    graph.quota = 0
+    monkeypatch.setattr(arp, "graph_limiter", arp.GraphRateLimiter())
+    vid = arp.fb_resumable_upload(path, "legenda", post_id=1)
+    with open(path, "rb") as f:
+        assert graph.videos[vid]["data"] == f.read()
+    assert graph.calls["videos:start"] == 1
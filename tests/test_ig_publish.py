@@ -0,0 +1,19 @@
+# tests/test_ig_publish.py
+# -*- coding: utf-8 -*-
+"""Publicação de Reels contra o stub da Graph (selftests do stub_graph)."""
+
+import stub_graph
+
+
+def test_concurrent_reels_share_the_batched_poll(arp):
+    """Containers com tempos diferentes e ERROR transitório: todos publicam, poll em batch."""
+    assert stub_graph.selftest_ig()
+
+
+def test_resumable_upload_streams_from_disk(arp):
+    assert stub_graph.selftest_ig_resumable()
+
+
+def test_rate_limits_and_lost_responses_publish_once(arp):
+    """Quota apertada + finish/media_publish sem resposta: cada post sai uma vez."""
+    assert stub_graph.selftest_limits()
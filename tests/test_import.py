@@ -0,0 +1,25 @@
+# tests/test_import.py
+# -*- coding: utf-8 -*-
+"""Importar o módulo e um --once sem post novo não carregam o que não usam."""
+
+import os, sys, json, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_import import measure_idle_once
+
+
+def test_import_loads_no_heavy_modules(tmp_path):
+    code = "import sys, json, auto_reels_wp_publish; print(json.dumps(sorted(sys.modules)))"
+    r = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                       env={**os.environ, "PYTHONPATH": ROOT}, check=True)
+    loaded = set(json.loads(r.stdout))
+    assert not {"PIL", "cloudinary", "requests.adapters", "asyncio"} & loaded
+
+
+def test_idle_once_makes_one_wp_request():
+    idle = measure_idle_once()
+    assert idle["rc"] == 0
+    assert idle["wp_requests"] == 1
+    assert idle["heavy_loaded"] == []
@@ -0,0 +1,19 @@
+# tests/test_layout.py
+# -*- coding: utf-8 -*-
+"""Medição do título: larguras por palavra, memo limitado."""
+
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_line_width_matches_font_and_memo_keeps_only_words(arp, monkeypatch):
+    arp.load_media_libs()
+    font = arp.load_font(os.path.join(ROOT, arp.CFG["TITLE_FONT"]), 64)
+    m = arp.TextMeasurer(font)
+    monkeypatch.setattr(m, "WORDS_MAX", 8)
+    for i in range(50):
+        line = f"Manchete número {i} do dia"
+        assert m.line(line) == font.getlength(line)
+    assert len(m._words) <= 8
+    assert not any(" " in w for w in m._words)
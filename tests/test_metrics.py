@@ -0,0 +1,22 @@
+# tests/test_metrics.py
+# -*- coding: utf-8 -*-
+"""Percentis das métricas por etapa (nearest rank)."""
+
+import pytest
+
+
+@pytest.mark.parametrize("values, q, expected", [
+    ([], 0.50, 0.0),
+    ([7], 0.99, 7),
+    ([1, 2], 0.50, 1),
+    ([1, 2, 3, 4, 5, 6], 0.50, 3),
+    ([6, 1, 5, 2, 4, 3], 0.50, 3),
+    (list(range(1, 11)), 0.70, 7),
+    (list(range(1, 11)), 0.90, 9),
+    (list(range(1, 11)), 0.99, 10),
+    (list(range(1, 101)), 0.50, 50),
+    (list(range(1, 101)), 0.90, 90),
+    (list(range(1, 101)), 0.99, 99),
+])
+def test_percentile_nearest_rank(arp, values, q, expected):
+    assert arp._percentile(values, q) == expected
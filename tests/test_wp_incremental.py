@@ -0,0 +1,99 @@
+# tests/test_wp_incremental.py
+# -*- coding: utf-8 -*-
+"""Busca incremental no WP: marca d'água e posts que falham de vez."""
+
+import os
+from concurrent.futures import Future
+from datetime import timedelta
+
+import pytest
+from PIL import Image
+
+from load_test import FIRST_POST, WPStub
+
+
+class _Encoder:
+    """ffmpeg falso: grava um MP4 vazio e conclui na hora."""
+
+    def submit(self, image_path, out_path, *args):
+        open(out_path, "wb").close()
+        fut = Future()
+        fut.set_result({"ok": True})
+        return fut
+
+
+def _fake_pipeline(arp, monkeypatch, broken: set, stage: str):
+    """Download/arte/encode/FB locais; os posts em `broken` falham sempre em `stage`."""
+    published = []
+
+    def download_cover(url):
+        pid = int(url.rsplit("/", 1)[-1].split(".")[0])
+        return None if stage == "download" and pid in broken else Image.new("RGB", (8, 8))
+
+    def render_formats(submit, bg, titulo, categoria, post_id):
+        if stage == "art" and post_id in broken:
+            raise OSError("capa corrompida")
+        path = os.path.join(arp.site_dir(), f"arte_{post_id}.jpg")
+        bg.save(path)
+        return {"reel": path}
+
+    def publish_fb(path, caption, post_id=None):
+        published.append(post_id)
+        return True
+
+    monkeypatch.setattr(arp, "download_cover", download_cover)
+    monkeypatch.setattr(arp, "render_formats", render_formats)
+    monkeypatch.setattr(arp, "encoder", _Encoder())
+    monkeypatch.setattr(arp, "publish_video_to_facebook", publish_fb)
+    arp.FACEBOOK_PAGE_ID, arp.USER_ACCESS_TOKEN, arp.INSTAGRAM_ID = "123", "tok", ""  # IG fica "skipped"
+    return published
+
+
+@pytest.mark.parametrize("stage", ["download", "art"])
+def test_broken_post_does_not_stall_the_feed(arp, monkeypatch, stage):
+    wp = WPStub(9, "http://cdn.invalid").start()
+    try:
+        arp.WP_URL = wp.url
+        arp.CFG["WP_POSTS"] = 5
+        published = _fake_pipeline(arp, monkeypatch, broken={1}, stage=stage)
+        arp.wp_save_state({"modified_after": (FIRST_POST - timedelta(seconds=1)).isoformat()})
+
+        pools = arp.StagePools()
+        try:
+            for _ in range(arp.CFG["LEDGER_MAX_ATTEMPTS"] + 2):
+                arp.process_once(None, pools)
+        finally:
+            pools.shutdown()
+    finally:
+        wp.stop()
+
+    assert sorted(published) == list(range(2, 10))
+    ledger = arp.get_ledger()
+    first = FIRST_POST.isoformat()
+    assert ledger.gave_up(1, first, stage)
+    assert ledger.all_done(1, first)
+    assert arp.wp_load_state()["high_water"] == (FIRST_POST + timedelta(seconds=8)).isoformat()
+
+
+def test_posts_sharing_the_boundary_second_are_not_skipped(arp, monkeypatch):
+    wp = WPStub(5, "http://cdn.invalid").start()
+    try:
+        same = (FIRST_POST + timedelta(seconds=1)).isoformat()
+        for p in wp.posts[1:4]:  # ids 2, 3, 4 no mesmo segundo
+            p["modified"] = p["modified_gmt"] = same
+        arp.WP_URL = wp.url
+        arp.CFG["WP_POSTS"] = 2
+        published = _fake_pipeline(arp, monkeypatch, broken=set(), stage="download")
+        arp.wp_save_state({"modified_after": (FIRST_POST - timedelta(seconds=1)).isoformat()})
+
+        pools = arp.StagePools()
+        try:
+            for _ in range(4):
+                arp.process_once(None, pools)
+        finally:
+            pools.shutdown()
+    finally:
+        wp.stop()
+
+    assert sorted(published) == [1, 2, 3, 4, 5]
+    assert len(published) == 5  # os já resolvidos do segundo da marca não voltam